@@ -0,0 +1,152 @@
+from fastapi import APIRouter, HTTPException
+from typing import Dict, Any
+
+from app.services.http_client_registry import http_registry
+from app.services.research_cache import get_research_cache
+from app.services.page_cache import get_page_cache
+from app.services.local_index import get_local_index
+from app.services.generation_cache import get_generation_cache
+from app.services.semantic_cache import get_semantic_cache
+from app.services.router_service import router_stats
+from app.utils.metrics import metrics
+
+# Create router
+router = APIRouter(tags=["admin"])
+
+@router.get("/stats")
+async def get_stats() -> Dict[str, Any]:
+    """
+    Get runtime metrics and HTTP connection pool statistics.
+    """
+    return {
+        "metrics": metrics.snapshot(),
+        "http_pools": http_registry.stats()
+    }
+
+@router.get("/router")
+async def get_router_stats() -> Dict[str, Any]:
+    """
+    Get EWMA latency, p90 latency and error rate of each provider used by the router.
+    """
+    return {"providers": router_stats()}
+
+@router.get("/research-cache")
+async def get_research_cache_stats() -> Dict[str, Any]:
+    """
+    Get research cache hit, miss and staleness counters.
+    """
+    cache = get_research_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+@router.delete("/research-cache")
+async def purge_research_cache() -> Dict[str, Any]:
+    """
+    Remove every entry from the research cache.
+    """
+    cache = get_research_cache()
+    if cache is None:
+        raise HTTPException(status_code=404, detail="Research cache is disabled")
+    try:
+        removed = cache.purge()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to purge research cache: {str(e)}")
+    return {"purged": removed}
+
+@router.get("/page-cache")
+async def get_page_cache_stats() -> Dict[str, Any]:
+    """
+    Get page content cache size and revalidation counters.
+    """
+    cache = get_page_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+@router.delete("/page-cache")
+async def purge_page_cache() -> Dict[str, Any]:
+    """
+    Remove every page from the page content cache.
+    """
+    cache = get_page_cache()
+    if cache is None:
+        raise HTTPException(status_code=404, detail="Page cache is disabled")
+    try:
+        removed = cache.purge()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to purge page cache: {str(e)}")
+    return {"purged": removed}
+
+@router.get("/local-index")
+async def get_local_index_stats() -> Dict[str, Any]:
+    """
+    Get the number of documents, terms and postings in the local research index.
+    """
+    index = get_local_index()
+    if index is None:
+        return {"enabled": False}
+    return {"enabled": True, **index.stats()}
+
+@router.delete("/local-index")
+async def purge_local_index() -> Dict[str, Any]:
+    """
+    Remove every document from the local research index.
+    """
+    index = get_local_index()
+    if index is None:
+        raise HTTPException(status_code=404, detail="Local index is disabled")
+    try:
+        removed = index.purge()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to purge local index: {str(e)}")
+    return {"purged": removed}
+
+@router.get("/generation-cache")
+async def get_generation_cache_stats() -> Dict[str, Any]:
+    """
+    Get LLM generation cache sizes and hit rates per provider.
+    """
+    cache = get_generation_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+@router.delete("/generation-cache")
+async def purge_generation_cache() -> Dict[str, Any]:
+    """
+    Remove every response from the LLM generation cache.
+    """
+    cache = get_generation_cache()
+    if cache is None:
+        raise HTTPException(status_code=404, detail="Generation cache is disabled")
+    try:
+        removed = cache.purge()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to purge generation cache: {str(e)}")
+    return {"purged": removed}
+
+
+@router.get("/semantic-cache")
+async def get_semantic_cache_stats() -> Dict[str, Any]:
+    """
+    Get semantic plan cache sizes per embedder and the hit rate.
+    """
+    cache = get_semantic_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+@router.delete("/semantic-cache")
+async def purge_semantic_cache() -> Dict[str, Any]:
+    """
+    Remove every plan and vector from the semantic plan cache.
+    """
+    cache = get_semantic_cache()
+    if cache is None:
+        raise HTTPException(status_code=404, detail="Semantic cache is disabled")
+    try:
+        removed = cache.purge()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to purge semantic cache: {str(e)}")
+    return {"purged": removed}
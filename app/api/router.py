@@ -1,10 +1,15 @@
+import json
+import time
 from fastapi import APIRouter, HTTPException, Depends, Query
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional, Any, Literal
 
+from app.models import ResourceItem, MilestoneItem, StudyPlanResponse
 from app.services.research_service import ResearchService
 from app.services.study_plan_service import StudyPlanService
 from app.services.ai_service_factory import get_ai_service
+from app.utils.metrics import metrics
 
 # Create router
 router = APIRouter(tags=["studyplanner"])
@@ -20,29 +25,7 @@ class StudyPlanRequest(BaseModel):
     goals: Optional[List[str]] = None
     generate_goals: bool = False
     additional_context: Optional[str] = None
-
-class ResourceItem(BaseModel):
-    title: str
-    url: Optional[str] = None
-    type: str  # book, article, video, course, etc.
-    description: Optional[str] = None
-
-class MilestoneItem(BaseModel):
-    title: str
-    description: str
-    week: int
-    tasks: List[str]
-    estimated_hours: int
-
-class StudyPlanResponse(BaseModel):
-    topic: str
-    summary: str
-    duration_weeks: int
-    learning_objectives: List[str]
-    key_concepts: List[str]
-    milestones: List[MilestoneItem]
-    resources: Optional[List[ResourceItem]] = None
-    recommendations: Optional[str] = None
+    research_mode: Optional[Literal["local", "web", "hybrid"]] = None  # defaults to RESEARCH_MODE
 
 # Dependencies
 def get_research_service():
@@ -63,8 +46,29 @@ async def generate_study_plan(
     Generate a study plan based on research and user requirements.
     """
     try:
-        # 1. Research the topic
-        research_results = await research_service.research_topic(request.topic)
+        # 0. Reuse the plan of an earlier request that means the same thing
+        cached_plan, cache_handle = await study_plan_service.find_similar_plan(
+            ai_service=ai_service,
+            topic=request.topic,
+            depth_level=request.depth_level,
+            duration_weeks=request.duration_weeks,
+            include_resources=request.include_resources,
+            learning_style=request.learning_style,
+            prior_knowledge=request.prior_knowledge,
+            goals=request.goals,
+            generate_goals=request.generate_goals,
+            additional_context=request.additional_context,
+            research_mode=request.research_mode
+        )
+        if cached_plan is not None:
+            return cached_plan
+        
+        # 1. Research the topic; the number of sources scales with the requested depth
+        research_results = await research_service.research_topic(
+            request.topic,
+            depth=request.depth_level,
+            mode=request.research_mode
+        )
         
         # 2. Generate the study plan using the selected AI service
         study_plan = await study_plan_service.generate_plan(
@@ -80,11 +84,123 @@ async def generate_study_plan(
             generate_goals=request.generate_goals,
             additional_context=request.additional_context
         )
+        await study_plan_service.remember_plan(cache_handle, study_plan)
+        
+        # Report how much of the research finished within its time budget
+        study_plan["research_completeness"] = research_results.get("research_completeness")
         
         return study_plan
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate study plan: {str(e)}")
 
+def _sse(event: str, data: Any) -> str:
+    """
+    Format one Server-Sent Event
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/generate-study-plan/stream")
+async def stream_study_plan(
+    request: StudyPlanRequest,
+    research_service: ResearchService = Depends(get_research_service),
+    study_plan_service: StudyPlanService = Depends(get_study_plan_service),
+    ai_service = Depends(get_ai_service),
+):
+    """
+    Generate a study plan, streaming progress as Server-Sent Events.
+    
+    Emits "progress" events (research_started, research_done, generation_started,
+    or cache_hit when a semantically equivalent plan is cached),
+    a "milestone" or "resource" event for each milestone or resource and a "field"
+    event for each scalar field as soon as the model has written it, and finally
+    a "plan" event with the validated study plan, or an "error" event.
+    """
+    async def events():
+        started = time.perf_counter()
+        milestones_sent = 0
+        try:
+            cached_plan, cache_handle = await study_plan_service.find_similar_plan(
+                ai_service=ai_service,
+                topic=request.topic,
+                depth_level=request.depth_level,
+                duration_weeks=request.duration_weeks,
+                include_resources=request.include_resources,
+                learning_style=request.learning_style,
+                prior_knowledge=request.prior_knowledge,
+                goals=request.goals,
+                generate_goals=request.generate_goals,
+                additional_context=request.additional_context,
+                research_mode=request.research_mode
+            )
+            if cached_plan is not None:
+                yield _sse("progress", {"stage": "cache_hit"})
+                for milestone in cached_plan.get("milestones", []):
+                    yield _sse("milestone", milestone)
+                for resource in cached_plan.get("resources") or []:
+                    yield _sse("resource", resource)
+                yield _sse("plan", StudyPlanResponse(**cached_plan).model_dump())
+                return
+            
+            yield _sse("progress", {"stage": "research_started"})
+            research_results = await research_service.research_topic(
+                request.topic,
+                depth=request.depth_level,
+                mode=request.research_mode
+            )
+            yield _sse("progress", {
+                "stage": "research_done",
+                "sources": len(research_results.get("sources", [])),
+                "research_completeness": research_results.get("research_completeness")
+            })
+            
+            yield _sse("progress", {"stage": "generation_started"})
+            async for event, data in study_plan_service.stream_plan(
+                ai_service=ai_service,
+                topic=request.topic,
+                research_data=research_results,
+                depth_level=request.depth_level,
+                duration_weeks=request.duration_weeks,
+                include_resources=request.include_resources,
+                learning_style=request.learning_style,
+                prior_knowledge=request.prior_knowledge,
+                goals=request.goals,
+                generate_goals=request.generate_goals,
+                additional_context=request.additional_context
+            ):
+                if event == "milestone":
+                    try:
+                        milestone = MilestoneItem(**data).model_dump()
+                    except ValidationError:
+                        # Incomplete milestones are still part of the final plan event
+                        continue
+                    if milestones_sent == 0:
+                        metrics.observe("study_plan.stream.time_to_first_milestone_seconds", time.perf_counter() - started)
+                    milestones_sent += 1
+                    yield _sse("milestone", milestone)
+                elif event == "resource":
+                    try:
+                        yield _sse("resource", ResourceItem(**data).model_dump())
+                    except ValidationError:
+                        continue
+                elif event == "field":
+                    yield _sse("field", data)
+                else:
+                    data["research_completeness"] = research_results.get("research_completeness")
+                    plan = StudyPlanResponse(**data).model_dump()
+                    # Only a plan that validated is cached for later requests
+                    await study_plan_service.remember_plan(cache_handle, plan)
+                    metrics.observe("study_plan.stream.total_seconds", time.perf_counter() - started)
+                    yield _sse("plan", plan)
+        except Exception as e:
+            metrics.increment("study_plan.stream.errors")
+            yield _sse("error", {"detail": f"Failed to generate study plan: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/topics/trending", response_model=List[str])
 async def get_trending_topics(
     research_service: ResearchService = Depends(get_research_service),
@@ -1 +1,3 @@
+from app.models.study_plan import ResourceItem, MilestoneItem, StudyPlanResponse
 
+__all__ = ["ResourceItem", "MilestoneItem", "StudyPlanResponse"]
@@ -0,0 +1,33 @@
+"""
+Pydantic models of a generated study plan.
+Shared by the API (request validation and responses) and the LLM providers
+(JSON schema for structured output).
+"""
+from typing import List, Optional, Dict, Any
+
+from pydantic import BaseModel
+
+
+class ResourceItem(BaseModel):
+    title: str
+    url: Optional[str] = None
+    type: str  # book, article, video, course, etc.
+    description: Optional[str] = None
+
+class MilestoneItem(BaseModel):
+    title: str
+    description: str
+    week: int
+    tasks: List[str]
+    estimated_hours: int
+
+class StudyPlanResponse(BaseModel):
+    topic: str
+    summary: str
+    duration_weeks: int
+    learning_objectives: List[str]
+    key_concepts: List[str]
+    milestones: List[MilestoneItem]
+    resources: Optional[List[ResourceItem]] = None
+    recommendations: Optional[str] = None
+    research_completeness: Optional[Dict[str, Any]] = None
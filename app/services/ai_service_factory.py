@@ -3,6 +3,7 @@ import logging
 from app.services.ollama_service import OllamaService
 from app.services.openrouter_service import OpenRouterService
 from app.services.gemini_service import GeminiService
+from app.services.router_service import RouterService
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +20,9 @@ def get_ai_service():
     elif ai_provider == "gemini":
         logger.info("Returning GeminiService")
         return GeminiService()
+    elif ai_provider == "router":
+        logger.info("Returning RouterService")
+        return RouterService()
     elif ai_provider == "ollama":
         logger.info("Returning OllamaService")
         return OllamaService()
@@ -0,0 +1,250 @@
+"""
+Chunked (map-reduce) generation of long study plans for StudyplannerAI.
+A single response cannot hold the milestones of a 26- or 52-week plan, so a
+short outline call first produces the plan's fields and one theme per week;
+groups of weeks are then generated in parallel with bounded concurrency, and
+the chunks are merged and checked so every week appears exactly once.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
+
+from app.models import MilestoneItem, ResourceItem
+from app.services.generation_session import follow_up
+from app.services.plan_repair import valid_items
+from app.utils.json_repair import repair_json
+from app.utils.metrics import metrics
+from app.utils.prompt_templates import build_chunk_prompt, build_outline_prompt
+from app.utils.structured_output import milestones_schema
+from app.utils.token_budget import (DEFAULT_CONTEXT_WINDOWS, estimate_milestone_tokens, estimate_outline_tokens,
+                                    fit_research_data)
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A plan with more weeks than this filled from outline themes is a failed generation, not a generated plan
+_MAX_FILLED_SHARE = 0.5
+
+
+def chunked_generation_applies(duration_weeks: int) -> bool:
+    """
+    Whether a plan of this length is generated in chunks (CHUNKED_GENERATION_MIN_WEEKS, 0 disables)
+    """
+    min_weeks = int(os.getenv("CHUNKED_GENERATION_MIN_WEEKS", "12"))
+    return min_weeks > 0 and duration_weeks >= min_weeks
+
+
+def week_chunks(duration_weeks: int, weeks_per_chunk: int) -> List[List[int]]:
+    """
+    Split weeks 1..duration_weeks into consecutive groups of at most `weeks_per_chunk`
+    """
+    weeks = list(range(1, duration_weeks + 1))
+    size = max(1, weeks_per_chunk)
+    return [weeks[start:start + size] for start in range(0, len(weeks), size)]
+
+
+def parse_outline(text: str, topic: str, duration_weeks: int,
+                  include_goals: bool = False) -> Tuple[Dict[str, Any], Dict[int, str]]:
+    """
+    Parse the outline response into the plan's fields and a theme for every week
+
+    Weeks the outline skipped get a generic theme so every chunk still has context.
+
+    Raises:
+        ValueError: If the response has no summary or no week themes
+    """
+    if not text or text.startswith("Error"):
+        raise ValueError(text or "Empty outline response")
+    data = repair_json(text)
+    if not isinstance(data, dict) or not isinstance(data.get("summary"), str):
+        raise ValueError("Outline has no summary")
+
+    themes: Dict[int, str] = {}
+    for entry in data.get("weeks") or []:
+        if isinstance(entry, dict) and isinstance(entry.get("week"), int) and 1 <= entry["week"] <= duration_weeks:
+            themes.setdefault(entry["week"], str(entry.get("theme") or "").strip() or f"{topic} practice")
+    if not themes:
+        raise ValueError("Outline has no week themes")
+    for week in range(1, duration_weeks + 1):
+        themes.setdefault(week, f"{topic} review and practice")
+
+    plan: Dict[str, Any] = {
+        "topic": data.get("topic") if isinstance(data.get("topic"), str) else topic,
+        "summary": data["summary"],
+        "duration_weeks": duration_weeks,
+        "learning_objectives": [str(item) for item in data.get("learning_objectives") or []],
+        "key_concepts": [str(item) for item in data.get("key_concepts") or []],
+        "resources": valid_items(data.get("resources"), ResourceItem)[0],
+    }
+    if isinstance(data.get("recommendations"), str):
+        plan["recommendations"] = data["recommendations"]
+    if include_goals and isinstance(data.get("goals"), list):
+        plan["goals"] = [str(goal) for goal in data["goals"]]
+    return plan, themes
+
+
+def placeholder_milestone(topic: str, week: int, theme: str) -> Dict[str, Any]:
+    """
+    Milestone built from the outline theme for a week no chunk produced
+    """
+    return {
+        "title": f"Week {week}: {theme}",
+        "description": f"Study {theme} as part of your {topic} plan.",
+        "week": week,
+        "tasks": [f"Study {theme}", f"Practice exercises on {theme}", "Review the previous weeks"],
+        "estimated_hours": 8
+    }
+
+
+def merge_milestones(chunks: List[List[Dict[str, Any]]], duration_weeks: int) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    Merge chunk milestones into one ordered list with each week at most once
+
+    Returns:
+        (milestones ordered by week, weeks that no chunk produced)
+    """
+    by_week: Dict[int, Dict[str, Any]] = {}
+    for milestones in chunks:
+        for milestone in milestones:
+            if 1 <= milestone["week"] <= duration_weeks:
+                by_week.setdefault(milestone["week"], milestone)
+    missing = [week for week in range(1, duration_weeks + 1) if week not in by_week]
+    return [by_week[week] for week in sorted(by_week)], missing
+
+
+async def _generate_chunk(ai_service: Any,
+                          semaphore: asyncio.Semaphore,
+                          topic: str,
+                          themes: Dict[int, str],
+                          weeks: List[int],
+                          depth_level: int,
+                          learning_style: Optional[str],
+                          prior_knowledge: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Generate the milestones of one group of weeks, keeping only valid ones for weeks in the group
+    """
+    prompt = build_chunk_prompt(topic, themes, weeks, depth_level, learning_style, prior_knowledge)
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            response = await ai_service.generate_content(prompt, schema=milestones_schema(),
+                                                         max_tokens=estimate_milestone_tokens(len(weeks), depth_level))
+            if not response or response.startswith("Error"):
+                raise ValueError(response or "Empty chunk response")
+            data = repair_json(response)
+        except Exception as e:
+            metrics.increment("chunked_generation.chunks_failed")
+            logger.warning(f"Chunk for weeks {weeks[0]}-{weeks[-1]} of {topic} failed: {str(e)}")
+            return []
+        finally:
+            metrics.observe("chunked_generation.chunk_seconds", time.perf_counter() - started)
+    milestones, _ = valid_items(data.get("milestones") if isinstance(data, dict) else data, MilestoneItem)
+    return [milestone for milestone in milestones if milestone["week"] in weeks]
+
+
+async def iter_chunked_plan(ai_service: Any,
+                            topic: str,
+                            research_data: Dict[str, Any],
+                            duration_weeks: int,
+                            depth_level: int = 3,
+                            learning_style: Optional[str] = None,
+                            prior_knowledge: Optional[str] = None,
+                            include_goals: bool = False,
+                            include_resources: bool = True) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Generate a plan in chunks, yielding events as parts become available
+
+    Yields ("field", {"name", "value"}) and ("resource", resource) events from the
+    outline, ("milestone", milestone) as each chunk finishes, then ("plan", plan)
+    with the merged plan.
+
+    Raises:
+        ValueError: If the outline call fails (nothing has been yielded yet), or if
+            more than half of the weeks would be outline placeholders
+    """
+    started = time.perf_counter()
+    max_tokens = estimate_outline_tokens(duration_weeks, depth_level, include_resources, include_goals)
+    outline_prompt, _ = fit_research_data(
+        lambda data: build_outline_prompt(topic, data, duration_weeks, depth_level, learning_style, prior_knowledge,
+                                          include_goals, include_resources),
+        research_data,
+        getattr(ai_service, "context_window", DEFAULT_CONTEXT_WINDOWS["ollama"]) - max_tokens
+    )
+    response = await ai_service.generate_content(outline_prompt, max_tokens=max_tokens)
+    plan, themes = parse_outline(response, topic, duration_weeks, include_goals)
+    metrics.observe("chunked_generation.outline_seconds", time.perf_counter() - started)
+    for name in ("topic", "summary", "duration_weeks", "recommendations"):
+        if name in plan:
+            yield "field", {"name": name, "value": plan[name]}
+    for resource in plan["resources"]:
+        yield "resource", resource
+
+    semaphore = asyncio.Semaphore(max(1, int(os.getenv("CHUNKED_GENERATION_CONCURRENCY", "4"))))
+    groups = week_chunks(duration_weeks, int(os.getenv("CHUNKED_GENERATION_WEEKS_PER_CHUNK", "4")))
+    tasks = [asyncio.ensure_future(_generate_chunk(ai_service, semaphore, topic, themes, weeks, depth_level,
+                                                   learning_style, prior_knowledge))
+             for weeks in groups]
+    chunks: List[List[Dict[str, Any]]] = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            milestones = await next_done
+            chunks.append(milestones)
+            for milestone in milestones:
+                yield "milestone", milestone
+    finally:
+        # Don't leave chunk calls running if the consumer stops early
+        for task in tasks:
+            task.cancel()
+
+    milestones, missing = merge_milestones(chunks, duration_weeks)
+    if missing:
+        # One retry for the weeks every chunk missed, then the outline themes fill the rest;
+        # the retry continues the outline call where the provider keeps its evaluated prompt
+        with follow_up():
+            retried = await _generate_chunk(ai_service, semaphore, topic, themes, missing, depth_level,
+                                            learning_style, prior_knowledge)
+        still_missing = set(missing) - {milestone["week"] for milestone in retried}
+        if len(still_missing) > duration_weeks * _MAX_FILLED_SHARE:
+            metrics.increment("chunked_generation.chunks_failed")
+            raise ValueError(f"Chunk calls failed for {len(still_missing)} of {duration_weeks} weeks")
+        filled = [placeholder_milestone(topic, week, themes[week]) for week in sorted(still_missing)]
+        for milestone in retried + filled:
+            yield "milestone", milestone
+        milestones, _ = merge_milestones([milestones, retried, filled], duration_weeks)
+        metrics.increment("chunked_generation.weeks_filled", len(filled))
+        logger.info(f"Chunked plan for {topic}: retried weeks {missing}, filled {len(filled)} from the outline")
+
+    plan["milestones"] = milestones
+    metrics.increment("chunked_generation.plans")
+    metrics.observe("chunked_generation.plan_seconds", time.perf_counter() - started)
+    logger.info(f"Generated {duration_weeks}-week plan for {topic} in {len(groups)} chunks")
+    yield "plan", plan
+
+
+async def generate_chunked_plan(ai_service: Any,
+                                topic: str,
+                                research_data: Dict[str, Any],
+                                duration_weeks: int,
+                                depth_level: int = 3,
+                                learning_style: Optional[str] = None,
+                                prior_knowledge: Optional[str] = None,
+                                include_goals: bool = False,
+                                include_resources: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Generate a plan in chunks
+
+    Returns:
+        The merged plan, or None when the outline call or most chunk calls failed
+    """
+    try:
+        async for kind, value in iter_chunked_plan(ai_service, topic, research_data, duration_weeks, depth_level,
+                                                   learning_style, prior_knowledge, include_goals, include_resources):
+            if kind == "plan":
+                return value
+    except ValueError as e:
+        metrics.increment("chunked_generation.failed")
+        logger.warning(f"Chunked generation failed for {topic}: {str(e)}")
+    return None
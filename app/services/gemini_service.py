@@ -1,8 +1,18 @@
 import os
 import json
+import time
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator
 import google.generativeai as genai
+import httpx
+
+from app.services.http_client_registry import http_registry
+from app.services.generation_cache import cached_generation, cached_stream
+from app.services.plan_repair import complete_study_plan
+from app.utils.circuit_breaker import guarded_generation, guarded_stream
+from app.utils.token_budget import budget_study_plan_prompt, context_window, estimate_goals_tokens, record_usage
+from app.utils import prompt_templates
+from app.utils.structured_output import gemini_generation_config, study_plan_schema
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -22,14 +32,49 @@ class GeminiService:
         else:
             genai.configure(api_key=self.api_key)
 
+        # The pinned SDK predates responseMimeType/responseSchema, so structured calls use the REST API
+        self.api_base = "https://generativelanguage.googleapis.com/v1beta"
+        # Default output limit; plan calls pass a limit sized to the plan
+        self.max_tokens = 4000
+        self.context_window = context_window("gemini")
+
         logger.info(f"Initialized Gemini service with model: {self.model}")
 
-    async def generate_content(self, prompt: str) -> str:
+    async def generate_content(self, prompt: str, schema: Optional[Dict[str, Any]] = None,
+                               max_tokens: Optional[int] = None) -> str:
+        """
+        Generate content, served from the generation cache when the same prompt was answered before
+        and failing fast while the provider's circuit breaker is open
+
+        Args:
+            prompt: The prompt to send to the model
+            schema: JSON schema the response must follow when STRUCTURED_OUTPUT is enabled
+            max_tokens: Output token limit for this call (defaults to `self.max_tokens`)
+
+        Returns:
+            Generated text from the model
+        """
+        generation_config = gemini_generation_config(schema)
+        max_tokens = max_tokens or self.max_tokens
+        return await cached_generation("gemini", self.model, prompt, self._sampling_params(generation_config, max_tokens),
+                                       lambda: guarded_generation("gemini", lambda: self._generate_content(prompt, generation_config, max_tokens)))
+
+    def _sampling_params(self, generation_config: Optional[Dict[str, Any]] = None,
+                         max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        params: Dict[str, Any] = {"max_output_tokens": max_tokens or self.max_tokens}
+        if generation_config is not None:
+            params["generation_config"] = generation_config
+        return params
+
+    async def _generate_content(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                                max_tokens: Optional[int] = None) -> str:
         """
         Generate content using the Gemini API
 
         Args:
             prompt: The prompt to send to the model
+            generation_config: REST generationConfig for structured output; None uses the SDK
+            max_tokens: Output token limit for this call
 
         Returns:
             Generated text from the model
@@ -37,14 +82,137 @@ class GeminiService:
         if not self.api_key:
             return "Error: GEMINI_API_KEY is not set."
 
+        max_tokens = max_tokens or self.max_tokens
+        if generation_config is not None:
+            return await self._generate_structured(prompt, {**generation_config, "maxOutputTokens": max_tokens})
+
         try:
             model = genai.GenerativeModel(self.model)
-            response = await model.generate_content_async(prompt)
+            response = await model.generate_content_async(prompt, generation_config={"max_output_tokens": max_tokens})
+            usage = getattr(response, "usage_metadata", None)
+            finish_reason = getattr(response.candidates[0], "finish_reason", None) if response.candidates else None
+            record_usage("gemini", prompt, max_tokens, getattr(usage, "prompt_token_count", None),
+                         getattr(usage, "candidates_token_count", None),
+                         getattr(finish_reason, "name", finish_reason) == "MAX_TOKENS")
             return response.text
         except Exception as e:
             logger.error(f"Error generating content with Gemini: {str(e)}")
             return f"Error: {str(e)}"
 
+    async def _generate_structured(self, prompt: str, generation_config: Dict[str, Any]) -> str:
+        """
+        Generate JSON through the REST generateContent endpoint with responseMimeType/responseSchema
+        """
+        client = http_registry.get_client("gemini")
+        try:
+            response = await client.post(
+                f"{self.api_base}/models/{self.model}:generateContent",
+                params={"key": self.api_key},
+                json=self._request_body(prompt, generation_config),
+                timeout=60.0
+            )
+        except httpx.TimeoutException:
+            logger.error("Connection to Gemini API timed out")
+            return "Error: Connection to Gemini API timed out"
+        except Exception as e:
+            logger.error(f"Error generating content with Gemini: {str(e)}")
+            return f"Error: {str(e)}"
+        if response.status_code != 200:
+            logger.error(f"Error from Gemini API: {response.status_code} - {response.text[:200]}")
+            return f"Error generating content: {response.status_code}"
+        try:
+            result = response.json()
+            self._record_usage(prompt, generation_config, result)
+            return self._candidate_text(result)
+        except Exception as e:
+            logger.error(f"Error parsing Gemini response: {e}")
+            return f"Error parsing response: {e}"
+
+    @staticmethod
+    def _request_body(prompt: str, generation_config: Dict[str, Any]) -> Dict[str, Any]:
+        # The prompt starts with its static prefix, which Gemini's implicit caching reuses across requests
+        return {"contents": [{"parts": [{"text": prompt}]}], "generationConfig": generation_config}
+
+    @staticmethod
+    def _record_usage(prompt: str, generation_config: Dict[str, Any], result: Dict[str, Any],
+                      first_token_seconds: Optional[float] = None) -> None:
+        usage = result.get("usageMetadata") or {}
+        finish_reason = (result.get("candidates") or [{}])[0].get("finishReason")
+        record_usage("gemini", prompt, generation_config.get("maxOutputTokens"), usage.get("promptTokenCount"),
+                     usage.get("candidatesTokenCount"), finish_reason == "MAX_TOKENS",
+                     usage.get("cachedContentTokenCount", 0), first_token_seconds)
+
+    @staticmethod
+    def _candidate_text(result: Dict[str, Any]) -> str:
+        parts = result["candidates"][0]["content"]["parts"]
+        return "".join(part.get("text", "") for part in parts)
+
+    async def stream_content(self, prompt: str, schema: Optional[Dict[str, Any]] = None,
+                             max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Stream generated text; a cached response is yielded as a single chunk
+        """
+        generation_config = gemini_generation_config(schema)
+        max_tokens = max_tokens or self.max_tokens
+        async for chunk in cached_stream("gemini", self.model, prompt, self._sampling_params(generation_config, max_tokens),
+                                         lambda: guarded_stream("gemini", lambda: self._stream_content(prompt, generation_config, max_tokens))):
+            yield chunk
+
+    async def _stream_content(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                              max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Generate content with the Gemini API, yielding text as it is produced
+
+        Structured calls stream Server-Sent Events from the REST
+        streamGenerateContent endpoint; others use the SDK.
+
+        Args:
+            prompt: The prompt to send to the model
+            generation_config: REST generationConfig for structured output; None uses the SDK
+
+        Yields:
+            Chunks of generated text
+        """
+        if not self.api_key:
+            raise RuntimeError("GEMINI_API_KEY is not set.")
+
+        max_tokens = max_tokens or self.max_tokens
+        if generation_config is not None:
+            generation_config = {**generation_config, "maxOutputTokens": max_tokens}
+            client = http_registry.get_client("gemini")
+            started = time.perf_counter()
+            async with client.stream(
+                "POST",
+                f"{self.api_base}/models/{self.model}:streamGenerateContent",
+                params={"key": self.api_key, "alt": "sse"},
+                json=self._request_body(prompt, generation_config),
+                timeout=httpx.Timeout(60.0, read=120.0)
+            ) as response:
+                if response.status_code != 200:
+                    body = await response.aread()
+                    raise RuntimeError(f"Error from Gemini API: {response.status_code} - {body[:200]!r}")
+                result: Dict[str, Any] = {}
+                first_token_seconds = None
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    result = json.loads(line[len("data:"):])
+                    text = self._candidate_text(result)
+                    if text:
+                        if first_token_seconds is None:
+                            # Time to first token stands in for prefill time
+                            first_token_seconds = time.perf_counter() - started
+                        yield text
+                # The last event carries the usage totals
+                self._record_usage(prompt, generation_config, result, first_token_seconds)
+            return
+
+        model = genai.GenerativeModel(self.model)
+        response = await model.generate_content_async(prompt, stream=True, generation_config={"max_output_tokens": max_tokens})
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
     async def create_study_plan(self,
                               topic: str,
                               research_data: Dict[str, Any],
@@ -52,7 +220,8 @@ class GeminiService:
                               depth_level: int = 3,
                               learning_style: Optional[str] = None,
                               prior_knowledge: Optional[str] = None,
-                              generate_goals: bool = False) -> Dict[str, Any]:
+                              generate_goals: bool = False,
+                              include_resources: bool = True) -> Dict[str, Any]:
         """
         Generate a complete study plan using Gemini
 
@@ -63,94 +232,56 @@ class GeminiService:
             depth_level: Level of detail (1-5)
             learning_style: Preferred learning style
             prior_knowledge: Level of prior knowledge
+            generate_goals: Ask for the learning goals in the plan's "goals" field instead of a separate call
+            include_resources: Ask for a list of learning resources
 
         Returns:
             Structured study plan
         """
         try:
-            # Extract key information from research data to include in prompt
-            sources_info = ""
-            for idx, source in enumerate(research_data.get('sources', [])[:5]):
-                sources_info += f"Source {idx+1}: {source.get('title', 'Unknown')} - {source.get('summary', '')[:300]}...\n\n"
-
-            key_concepts = ", ".join(research_data.get('key_concepts', [])[:8])
-            related_topics = ", ".join(research_data.get('related_topics', []))
-
-            # Build the prompt
-            prompt = f"""
-You are an expert educational consultant creating a comprehensive study plan for the topic: {topic}.
-
-RESEARCH DATA:
-{sources_info}
-
-KEY CONCEPTS: {key_concepts}
-
-RELATED TOPICS: {related_topics}
-
-PARAMETERS:
-- Duration: {duration_weeks} weeks
-- Depth Level: {depth_level}/5
-- Learning Style: {learning_style if learning_style else 'Not specified'}
-- Prior Knowledge: {prior_knowledge if prior_knowledge else 'Not specified'}
-
-Create a detailed, structured study plan following this JSON format:
-{{
-  "topic": "The main topic",
-  "summary": "A concise summary of what will be studied and why it's valuable",
-  "duration_weeks": {duration_weeks},
-  "learning_objectives": ["Objective 1", "Objective 2", "Objective 3", ...],
-  "key_concepts": ["Concept 1", "Concept 2", "Concept 3", ...],
-  "milestones": [
-    {{
-      "title": "Week 1: Foundation",
-      "description": "Description of what will be covered",
-      "week": 1,
-      "tasks": ["Task 1", "Task 2", "Task 3", ...],
-      "estimated_hours": 10
-    }},
-    ...more milestones for each week...
-  ],
-  "resources": [
-    {{
-      "title": "Resource Title",
-      "url": "https://example.com/resource",
-      "type": "article/book/video/course",
-      "description": "Brief description of the resource"
-    }},
-    ...more resources...
-  ],
-  "recommendations": "Additional personalized recommendations based on learning style and prior knowledge. For instance, suggest hands-on projects for kinesthetic learners or foundational books for beginners."
-}}
-
-Return ONLY the valid JSON object, nothing else. Ensure all JSON is properly formatted and valid.
-"""
+            # Output limit sized to the plan; research context trimmed to the context window
+            prompt, max_tokens = budget_study_plan_prompt(
+                self, topic, research_data, duration_weeks, depth_level, learning_style, prior_knowledge,
+                include_goals=generate_goals, include_resources=include_resources
+            )
+
             # Generate the study plan
-            result = await self.generate_content(prompt)
-
-            # Parse the JSON response
-            try:
-                # Find JSON content (in case there's additional text)
-                json_start = result.find('{')
-                json_end = result.rfind('}') + 1
-
-                if json_start >= 0 and json_end > json_start:
-                    json_content = result[json_start:json_end]
-                    study_plan = json.loads(json_content)
-                    logger.info(f"Successfully parsed AI-generated study plan for topic: {topic}")
-                    return study_plan
-                else:
-                    logger.error("Could not find valid JSON in Gemini response")
-                    return self._generate_fallback_plan(topic, duration_weeks)
-
-            except json.JSONDecodeError as e:
-                logger.error(f"Error parsing JSON from Gemini response: {str(e)}")
+            result = await self.generate_content(prompt, schema=study_plan_schema(generate_goals), max_tokens=max_tokens)
+
+            # Parse the JSON response, repairing it and regenerating only the parts that are missing
+            study_plan = await complete_study_plan(self, result, topic, duration_weeks, generate_goals, "gemini")
+            if study_plan is None:
+                logger.error(f"Could not parse or salvage a study plan from the Gemini response")
                 logger.error(f"Raw response: {result}")
                 return self._generate_fallback_plan(topic, duration_weeks)
+            logger.info(f"Successfully parsed AI-generated study plan for topic: {topic}")
+            return study_plan
 
         except Exception as e:
             logger.error(f"Error creating study plan: {str(e)}")
             return self._generate_fallback_plan(topic, duration_weeks)
 
+    def build_study_plan_prompt(self,
+                                topic: str,
+                                research_data: Dict[str, Any],
+                                duration_weeks: int,
+                                depth_level: int,
+                                learning_style: Optional[str],
+                                prior_knowledge: Optional[str],
+                                include_goals: bool = False,
+                                include_resources: bool = True) -> str:
+        """
+        Build the study plan prompt: the shared static prefix, then the research data and user preferences
+
+        With `include_goals`, the JSON format also asks for a "goals" list so
+        learning goals come back with the plan in a single call. Without
+        `include_resources` the resources list is left out of the format.
+        """
+        return prompt_templates.build_study_plan_prompt(
+            topic, research_data, duration_weeks, depth_level, learning_style, prior_knowledge,
+            include_goals=include_goals, include_resources=include_resources
+        )
+
     async def generate_learning_goals(self, topic: str, duration_weeks: int, prior_knowledge: Optional[str]) -> List[str]:
         """
         Generate a list of learning goals using Gemini.
@@ -164,7 +295,7 @@ Prior Knowledge: {prior_knowledge or 'None'}
 
 Return a JSON list of strings. For example: ["goal 1", "goal 2", "goal 3"]
 """
-        response = await self.generate_content(prompt)
+        response = await self.generate_content(prompt, max_tokens=estimate_goals_tokens())
         try:
             # Extract JSON from the response
             json_start = response.find('[')
@@ -0,0 +1,315 @@
+"""
+LLM generation cache for StudyplannerAI.
+Caches model responses keyed by provider, model, the hash of the canonical
+prompt and the sampling parameters. A small in-memory LRU tier sits in front
+of an SQLite tier shared by every worker; each entry carries its own TTL.
+Lookups and stores run in worker threads so SQLite never blocks the event loop.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Callable, Awaitable, AsyncIterator, Mapping, Tuple
+
+from app.utils.metrics import metrics
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Set per request (see `wants_cache_bypass`) to force a fresh generation
+bypass_generation_cache: ContextVar[bool] = ContextVar("bypass_generation_cache", default=False)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def wants_cache_bypass(headers: Mapping[str, str]) -> bool:
+    """
+    Whether request headers ask for a fresh generation ("X-Bypass-Cache: true" or "Cache-Control: no-cache")
+    """
+    if headers.get("x-bypass-cache", "").lower() in ["true", "1", "yes"]:
+        return True
+    cache_control = headers.get("cache-control", "").lower()
+    return "no-cache" in cache_control or "no-store" in cache_control
+
+
+class GenerationCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of LLM responses with per-entry TTL
+    """
+
+    def __init__(self,
+                 data_dir: str = "data",
+                 ttl: Optional[float] = None,
+                 memory_entries: Optional[int] = None,
+                 max_entries: Optional[int] = None):
+        self.data_dir = data_dir
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.db_path = os.path.join(self.data_dir, "generation_cache.sqlite3")
+        self.ttl = ttl if ttl is not None else float(os.getenv("GENERATION_CACHE_TTL", "86400"))
+        self.memory_entries = memory_entries if memory_entries is not None else int(os.getenv("GENERATION_CACHE_MEMORY_ENTRIES", "128"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "1000"))
+        # key -> (response, expires_at)
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        # The memory tier is shared by the worker threads running lookups and stores
+        self._memory_lock = threading.Lock()
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10.0)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self) -> None:
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS generation_cache (
+                    key TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_generation_cache_accessed ON generation_cache (last_accessed)")
+
+    @staticmethod
+    def make_key(provider: str, model: Optional[str], prompt: str, params: Dict[str, Any]) -> str:
+        """
+        Build the cache key from provider, model, canonical prompt hash and sampling parameters
+
+        The canonical prompt has its whitespace collapsed, so formatting-only
+        differences in prompt templates share an entry.
+        """
+        canonical_prompt = _WHITESPACE_RE.sub(" ", prompt).strip()
+        prompt_hash = hashlib.sha256(canonical_prompt.encode("utf-8")).hexdigest()
+        fingerprint = json.dumps([provider, model, prompt_hash, params], sort_keys=True, default=str)
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    def get(self, provider: str, key: str) -> Optional[str]:
+        """
+        Look up a response, first in memory and then on disk
+
+        Returns:
+            The cached response, or None if missing or expired
+        """
+        now = time.time()
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._record(provider, "memory_hits")
+                    return response
+                del self._memory[key]
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response, expires_at FROM generation_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] > now:
+                conn.execute("UPDATE generation_cache SET last_accessed = ? WHERE key = ?", (now, key))
+            elif row is not None:
+                conn.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+                row = None
+        if row is None:
+            self._record(provider, "misses")
+            return None
+
+        response, expires_at = row
+        self._remember(key, response, expires_at)
+        self._record(provider, "disk_hits")
+        return response
+
+    def set(self, provider: str, model: Optional[str], key: str, response: str, ttl: Optional[float] = None) -> None:
+        """
+        Store a response in both tiers
+
+        Args:
+            ttl: Seconds the entry stays valid; defaults to GENERATION_CACHE_TTL
+        """
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        self._remember(key, response, expires_at)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO generation_cache (key, provider, model, response, created_at, expires_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, response, now, expires_at, now)
+            )
+            self._evict(conn)
+        metrics.increment(f"generation_cache.{provider}.stored")
+
+    def _remember(self, key: str, response: str, expires_at: float) -> None:
+        with self._memory_lock:
+            self._memory[key] = (response, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM generation_cache WHERE expires_at <= ?", (time.time(),))
+        count = conn.execute("SELECT COUNT(*) FROM generation_cache").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM generation_cache WHERE key IN "
+                "(SELECT key FROM generation_cache ORDER BY last_accessed ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+            logger.info(f"Evicted {count - self.max_entries} entries from the generation cache")
+
+    @staticmethod
+    def _record(provider: str, outcome: str) -> None:
+        metrics.increment(f"generation_cache.{provider}.{outcome}")
+
+    def purge(self) -> int:
+        """
+        Remove every cached response
+
+        Returns:
+            Number of entries removed from disk
+        """
+        with self._memory_lock:
+            self._memory.clear()
+        with self._connect() as conn:
+            removed = conn.execute("DELETE FROM generation_cache").rowcount
+        logger.info(f"Purged {removed} entries from the generation cache")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return cache sizes and hit rates per provider
+        """
+        with self._connect() as conn:
+            per_provider = dict(conn.execute(
+                "SELECT provider, COUNT(*) FROM generation_cache GROUP BY provider"
+            ).fetchall())
+        counters = metrics.snapshot()["counters"]
+        providers = set(per_provider) | {
+            name.split(".")[1] for name in counters if name.startswith("generation_cache.")
+        }
+        report = {}
+        for provider in sorted(providers):
+            memory_hits = counters.get(f"generation_cache.{provider}.memory_hits", 0)
+            disk_hits = counters.get(f"generation_cache.{provider}.disk_hits", 0)
+            misses = counters.get(f"generation_cache.{provider}.misses", 0)
+            lookups = memory_hits + disk_hits + misses
+            report[provider] = {
+                "entries": per_provider.get(provider, 0),
+                "memory_hits": memory_hits,
+                "disk_hits": disk_hits,
+                "misses": misses,
+                "bypassed": counters.get(f"generation_cache.{provider}.bypassed", 0),
+                "hit_rate": round((memory_hits + disk_hits) / lookups, 3) if lookups else 0.0
+            }
+        return {
+            "memory_entries": len(self._memory),
+            "disk_entries": sum(per_provider.values()),
+            "ttl": self.ttl,
+            "providers": report
+        }
+
+
+_generation_cache: Optional[GenerationCache] = None
+
+
+def get_generation_cache() -> Optional[GenerationCache]:
+    """
+    Get the shared generation cache, or None when it is disabled
+    """
+    global _generation_cache
+    if os.getenv("GENERATION_CACHE_ENABLED", "true").lower() not in ["true", "1", "yes"]:
+        return None
+    if _generation_cache is None:
+        _generation_cache = GenerationCache(data_dir=os.getenv("DATA_DIR", "data"))
+    return _generation_cache
+
+
+def _is_cacheable(response: str) -> bool:
+    # Providers report failures as "Error..." strings instead of raising
+    return bool(response) and not response.startswith("Error")
+
+
+async def _lookup(provider: str, model: Optional[str], prompt: str,
+                  params: Dict[str, Any]) -> Tuple[Optional[GenerationCache], Optional[str], Optional[str]]:
+    """
+    Returns (cache, key, cached response); cache is None when caching does not apply
+    """
+    cache = get_generation_cache()
+    if cache is None:
+        return None, None, None
+    if bypass_generation_cache.get():
+        metrics.increment(f"generation_cache.{provider}.bypassed")
+        # Still store the fresh response so later requests benefit
+        return cache, GenerationCache.make_key(provider, model, prompt, params), None
+    key = GenerationCache.make_key(provider, model, prompt, params)
+    try:
+        return cache, key, await asyncio.to_thread(cache.get, provider, key)
+    except Exception as e:
+        logger.error(f"Generation cache lookup failed: {str(e)}")
+        return cache, key, None
+
+
+async def _store(cache: GenerationCache, provider: str, model: Optional[str], key: str, response: str) -> None:
+    if not _is_cacheable(response):
+        return
+    try:
+        await asyncio.to_thread(cache.set, provider, model, key, response)
+    except Exception as e:
+        logger.error(f"Failed to store generation in cache: {str(e)}")
+
+
+async def cached_generation(provider: str,
+                            model: Optional[str],
+                            prompt: str,
+                            params: Dict[str, Any],
+                            generate: Callable[[], Awaitable[str]]) -> str:
+    """
+    Return the cached response for this prompt, or call `generate()` and cache its result
+    """
+    cache, key, cached = await _lookup(provider, model, prompt, params)
+    if cached is not None:
+        logger.info(f"Generation cache hit for {provider} model {model}")
+        return cached
+    response = await generate()
+    if cache is not None:
+        await _store(cache, provider, model, key, response)
+    return response
+
+
+async def cached_stream(provider: str,
+                        model: Optional[str],
+                        prompt: str,
+                        params: Dict[str, Any],
+                        stream: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+    """
+    Streaming counterpart of `cached_generation`: a hit is yielded as one chunk,
+    and a fully streamed miss is stored
+    """
+    cache, key, cached = await _lookup(provider, model, prompt, params)
+    if cached is not None:
+        logger.info(f"Generation cache hit for streamed {provider} model {model}")
+        yield cached
+        return
+    chunks = []
+    async for chunk in stream():
+        chunks.append(chunk)
+        yield chunk
+    if cache is not None:
+        await _store(cache, provider, model, key, "".join(chunks))
@@ -0,0 +1,85 @@
+"""
+Generation sessions for StudyplannerAI.
+The calls generating one plan share a session: the first call's prompt and
+response become its base, and follow-up calls that need the plan as context
+(regenerated weeks, repairs) can be sent as a continuation of that exchange.
+Providers that keep evaluated prompts on the server (Ollama's KV cache) then
+only prefill the new message; other providers ignore the session.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, Optional
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationSession:
+    """
+    State shared by the calls generating one plan
+    """
+
+    def __init__(self):
+        # Provider, prompt, response and provider-specific state of the first completed call
+        self.base: Optional[Dict[str, Any]] = None
+        self.follow_ups = 0
+        # Prompt tokens saved compared with sending each follow-up prompt on its own
+        self.prefill_tokens_saved = 0
+
+    def set_base(self, provider: str, prompt: str, response: str, **state: Any) -> None:
+        """
+        Record the first completed call; later calls keep the existing base
+        """
+        if self.base is None and response:
+            self.base = {"provider": provider, "prompt": prompt, "response": response, **state}
+
+    def record_follow_up(self, prefill_tokens_saved: int) -> None:
+        self.follow_ups += 1
+        self.prefill_tokens_saved += prefill_tokens_saved
+
+
+_current_session: ContextVar[Optional[GenerationSession]] = ContextVar("generation_session", default=None)
+_follow_up: ContextVar[bool] = ContextVar("generation_follow_up", default=False)
+
+
+def current_session() -> Optional[GenerationSession]:
+    return _current_session.get()
+
+
+def is_follow_up() -> bool:
+    return _follow_up.get()
+
+
+@contextmanager
+def generation_session() -> Iterator[GenerationSession]:
+    """
+    Scope the calls for one plan to a new session and record what its follow-ups saved
+    """
+    session = GenerationSession()
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        try:
+            _current_session.reset(token)
+        except ValueError:
+            # A streaming response abandoned by its client is closed from another context
+            pass
+        if session.follow_ups:
+            metrics.observe("generation_session.prefill_tokens_saved", session.prefill_tokens_saved)
+            logger.info(f"Generation session saved {session.prefill_tokens_saved} prompt tokens "
+                        f"across {session.follow_ups} follow-up calls")
+
+
+@contextmanager
+def follow_up() -> Iterator[None]:
+    """
+    Mark the calls made inside the block as follow-ups of the session's first call
+    """
+    token = _follow_up.set(True)
+    try:
+        yield
+    finally:
+        _follow_up.reset(token)
@@ -0,0 +1,165 @@
+"""
+Shared HTTP transport for StudyplannerAI.
+Keeps one keep-alive connection pool per upstream so research scraping and
+LLM provider calls reuse TCP/TLS connections instead of opening a new client
+for every request.
+"""
+import os
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, Set, Tuple
+
+import httpx
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401 - only needed to enable HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HttpClientRegistry:
+    """
+    Registry of pooled `httpx.AsyncClient` instances, one per upstream
+    """
+
+    def __init__(self):
+        self.max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+        self.max_keepalive_connections = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+        self.keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+        self.http2_enabled = os.getenv("HTTP_ENABLE_HTTP2", "true").lower() in ["true", "1", "yes"] and HTTP2_AVAILABLE
+        self._clients: Dict[str, Tuple[httpx.AsyncClient, asyncio.AbstractEventLoop]] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        # Close tasks for replaced clients, referenced until they finish
+        self._closing: Set[asyncio.Future] = set()
+
+    def get_client(self, upstream: str, http2: bool = True) -> httpx.AsyncClient:
+        """
+        Get the pooled client for an upstream, creating it on first use
+
+        Args:
+            upstream: Name of the upstream (e.g. "ollama", "openrouter", "search")
+            http2: Whether this upstream may negotiate HTTP/2 (via ALPN over TLS)
+
+        Returns:
+            Shared AsyncClient for the upstream
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._clients.get(upstream)
+            if entry is not None:
+                client, client_loop = entry
+                # A client cannot be shared across event loops (e.g. separate asyncio.run calls)
+                if client_loop is loop and not client.is_closed:
+                    return client
+                logger.info(f"Recreating HTTP client for upstream '{upstream}' on the current event loop")
+                if not client.is_closed:
+                    self._close_replaced(upstream, client, client_loop, loop)
+
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry
+                ),
+                http2=http2 and self.http2_enabled,
+                timeout=30.0,
+                event_hooks={"request": [self._make_request_hook(upstream)]}
+            )
+            self._clients[upstream] = (client, loop)
+            self._stats.setdefault(upstream, {
+                "requests": 0,
+                "connections_opened": 0,
+                "connections_reused": 0,
+                "clients_created": 0
+            })
+            self._stats[upstream]["clients_created"] += 1
+            logger.info(f"Created pooled HTTP client for upstream '{upstream}' (http2={http2 and self.http2_enabled})")
+            return client
+
+    def _close_replaced(self, upstream: str, client: httpx.AsyncClient,
+                        client_loop: asyncio.AbstractEventLoop, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Close a replaced client so its pooled connections are released
+
+        A loop still running (in another thread) closes its own client; the
+        client of a finished loop is closed from the current one, which still
+        shuts its sockets even though the old loop can no longer be scheduled on.
+        """
+        if client_loop.is_running() and not client_loop.is_closed():
+            future = asyncio.run_coroutine_threadsafe(self._aclose_quietly(upstream, client), client_loop)
+        else:
+            future = loop.create_task(self._aclose_quietly(upstream, client))
+        self._closing.add(future)
+        future.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _aclose_quietly(upstream: str, client: httpx.AsyncClient) -> None:
+        try:
+            await client.aclose()
+        except Exception as e:
+            # Raised once the sockets are closed, when the client's own loop is already closed
+            logger.debug(f"Closing replaced HTTP client for upstream '{upstream}': {str(e)}")
+        logger.info(f"Closed replaced HTTP client for upstream '{upstream}'")
+
+    def _make_request_hook(self, upstream: str):
+        """
+        Build an event hook that attaches a connection tracer to each request
+        """
+        async def on_request(request: httpx.Request) -> None:
+            state = {"connected": False}
+
+            async def trace(event_name: str, info: Dict[str, Any]) -> None:
+                if event_name == "connection.connect_tcp.complete":
+                    state["connected"] = True
+                    self._record(upstream, "connections_opened")
+                elif event_name.endswith(".send_request_headers.started"):
+                    self._record(upstream, "requests")
+                    if not state["connected"]:
+                        self._record(upstream, "connections_reused")
+
+            request.extensions["trace"] = trace
+
+        return on_request
+
+    def _record(self, upstream: str, key: str) -> None:
+        with self._lock:
+            self._stats[upstream][key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return pool statistics per upstream
+        """
+        with self._lock:
+            return {
+                "http2_enabled": self.http2_enabled,
+                "limits": {
+                    "max_connections": self.max_connections,
+                    "max_keepalive_connections": self.max_keepalive_connections,
+                    "keepalive_expiry": self.keepalive_expiry
+                },
+                "upstreams": {name: dict(stats) for name, stats in self._stats.items()}
+            }
+
+    async def aclose(self) -> None:
+        """
+        Close every pooled client owned by the current event loop
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entries = list(self._clients.items())
+            self._clients.clear()
+        for upstream, (client, client_loop) in entries:
+            if client_loop is loop and not client.is_closed:
+                await client.aclose()
+                logger.info(f"Closed pooled HTTP client for upstream '{upstream}'")
+
+
+# Application-wide registry, managed by the FastAPI lifespan in main.py
+http_registry = HttpClientRegistry()
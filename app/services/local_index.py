@@ -0,0 +1,282 @@
+"""
+Local full-text index over previously fetched research content.
+Pages extracted by ResearchService are added to an SQLite-backed inverted
+index as they are fetched, and ranked with BM25 so research can be answered
+without going to the web.
+
+Usage:
+    python -m app.services.local_index rebuild
+    python -m app.services.local_index stats
+"""
+import os
+import sys
+import json
+import math
+import time
+import hashlib
+import sqlite3
+import logging
+import argparse
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+from app.utils.metrics import metrics
+from app.utils.text_extraction import ENGLISH_STOPWORDS, tokenize
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def index_terms(text: str) -> List[str]:
+    """
+    Tokens of a text as they are stored in and looked up from the index
+    """
+    return [token for token in tokenize(text) if token not in ENGLISH_STOPWORDS]
+
+
+class LocalSearchIndex:
+    """
+    Inverted index with BM25 ranking, stored in SQLite
+    """
+
+    def __init__(self, data_dir: str = "data", k1: float = 1.5, b: float = 0.75):
+        self.data_dir = data_dir
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.db_path = os.path.join(self.data_dir, "local_index.sqlite3")
+        self.k1 = k1
+        self.b = b
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10.0)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self) -> None:
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id INTEGER PRIMARY KEY,
+                    url TEXT UNIQUE NOT NULL,
+                    title TEXT NOT NULL,
+                    source TEXT,
+                    content TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    length INTEGER NOT NULL,
+                    indexed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL,
+                    doc_id INTEGER NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, doc_id)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings (doc_id)")
+
+    def add_document(self, url: str, title: str, content: str, source: Optional[str] = None) -> bool:
+        """
+        Index a page, replacing any earlier version of the same URL
+
+        Returns:
+            True if the page was (re)indexed, False if it was empty or unchanged
+        """
+        if not content:
+            return False
+        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        with self._connect() as conn:
+            row = conn.execute("SELECT doc_id, content_hash FROM documents WHERE url = ?", (url,)).fetchone()
+            if row is not None and row[1] == content_hash:
+                return False
+            self._index(conn, url, title, content, source, content_hash, row[0] if row else None)
+        metrics.increment("local_index.documents_indexed")
+        return True
+
+    def _index(self, conn: sqlite3.Connection, url: str, title: str, content: str,
+               source: Optional[str], content_hash: str, doc_id: Optional[int]) -> None:
+        # The title is indexed along with the body so it counts towards matching
+        counts = Counter(index_terms(f"{title}\n{content}"))
+        length = sum(counts.values())
+        if doc_id is not None:
+            conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+            conn.execute(
+                "UPDATE documents SET title = ?, source = ?, content = ?, content_hash = ?, length = ?, indexed_at = ? "
+                "WHERE doc_id = ?",
+                (title, source, content, content_hash, length, time.time(), doc_id)
+            )
+        else:
+            doc_id = conn.execute(
+                "INSERT INTO documents (url, title, source, content, content_hash, length, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, title, source, content, content_hash, length, time.time())
+            ).lastrowid
+        conn.executemany(
+            "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+            ((term, doc_id, tf) for term, tf in counts.items())
+        )
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Rank indexed pages against a query with BM25
+
+        Returns:
+            Best matches first, each with title, url, snippet, source, content,
+            score and coverage (the fraction of query terms the page contains)
+        """
+        terms = sorted(set(index_terms(query)))
+        if not terms:
+            return []
+        started = time.perf_counter()
+        placeholders = ",".join("?" * len(terms))
+        with self._connect() as conn:
+            total_docs, avg_length = conn.execute("SELECT COUNT(*), AVG(length) FROM documents").fetchone()
+            if not total_docs:
+                return []
+            document_frequency = dict(conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term", terms
+            ).fetchall())
+            rows = conn.execute(
+                f"SELECT p.term, p.doc_id, p.tf, d.length FROM postings p JOIN documents d ON d.doc_id = p.doc_id "
+                f"WHERE p.term IN ({placeholders})", terms
+            ).fetchall()
+
+            scores: Dict[int, float] = {}
+            matched: Dict[int, int] = {}
+            for term, doc_id, tf, length in rows:
+                df = document_frequency[term]
+                idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+                norm = tf + self.k1 * (1 - self.b + self.b * length / (avg_length or 1))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+                matched[doc_id] = matched.get(doc_id, 0) + 1
+
+            ranked = sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))[:limit]
+            documents = {}
+            if ranked:
+                documents = {
+                    row[0]: row[1:] for row in conn.execute(
+                        f"SELECT doc_id, url, title, source, content FROM documents "
+                        f"WHERE doc_id IN ({','.join('?' * len(ranked))})", ranked
+                    ).fetchall()
+                }
+
+        results = []
+        for doc_id in ranked:
+            url, title, source, content = documents[doc_id]
+            results.append({
+                'title': title,
+                'url': url,
+                'snippet': content[:200],
+                'source': source or 'local',
+                'content': content,
+                'score': round(scores[doc_id], 4),
+                'coverage': matched[doc_id] / len(terms)
+            })
+        metrics.observe("local_index.search_seconds", time.perf_counter() - started)
+        return results
+
+    def rebuild(self, page_cache: Any = None) -> int:
+        """
+        Re-tokenize every indexed page, and index pages from the page cache that are missing
+
+        Returns:
+            Number of documents in the rebuilt index
+        """
+        with self._connect() as conn:
+            documents = conn.execute("SELECT url, title, source, content FROM documents").fetchall()
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM documents")
+            indexed_urls = set()
+            for url, title, source, content in documents:
+                content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+                self._index(conn, url, title, content, source, content_hash, None)
+                indexed_urls.add(url)
+            if page_cache is not None:
+                for url, content in page_cache.iter_pages():
+                    if url in indexed_urls or not content:
+                        continue
+                    content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+                    # Cached pages carry no title; the first line of text is usually the page heading
+                    title = content.split('\n', 1)[0][:200] or url
+                    self._index(conn, url, title, content, 'page_cache', content_hash, None)
+                    indexed_urls.add(url)
+        logger.info(f"Rebuilt local index with {len(indexed_urls)} documents")
+        return len(indexed_urls)
+
+    def purge(self) -> int:
+        """
+        Remove every document from the index
+
+        Returns:
+            Number of documents removed
+        """
+        with self._connect() as conn:
+            conn.execute("DELETE FROM postings")
+            removed = conn.execute("DELETE FROM documents").rowcount
+        logger.info(f"Purged {removed} documents from the local index")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the size of the index
+        """
+        with self._connect() as conn:
+            documents, total_length = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM documents"
+            ).fetchone()
+            terms, postings = conn.execute("SELECT COUNT(DISTINCT term), COUNT(*) FROM postings").fetchone()
+        disk_bytes = sum(
+            os.path.getsize(path)
+            for path in (self.db_path, self.db_path + "-wal")
+            if os.path.exists(path)
+        )
+        return {
+            "documents": documents,
+            "terms": terms,
+            "postings": postings,
+            "avg_document_length": round(total_length / documents, 1) if documents else 0.0,
+            "disk_bytes": disk_bytes,
+            "documents_indexed": metrics.get_counter("local_index.documents_indexed")
+        }
+
+
+_local_index: Optional[LocalSearchIndex] = None
+
+
+def get_local_index() -> Optional[LocalSearchIndex]:
+    """
+    Get the shared local search index, or None when it is disabled
+    """
+    global _local_index
+    if os.getenv("LOCAL_INDEX_ENABLED", "true").lower() not in ["true", "1", "yes"]:
+        return None
+    if _local_index is None:
+        _local_index = LocalSearchIndex(data_dir=os.getenv("DATA_DIR", "data"))
+    return _local_index
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage the local research index")
+    parser.add_argument("command", choices=["rebuild", "stats"])
+    args = parser.parse_args(argv)
+
+    index = LocalSearchIndex(data_dir=os.getenv("DATA_DIR", "data"))
+    if args.command == "rebuild":
+        from app.services.page_cache import get_page_cache
+        started = time.perf_counter()
+        documents = index.rebuild(page_cache=get_page_cache())
+        print(f"Indexed {documents} documents in {time.perf_counter() - started:.2f}s")
+    print(json.dumps(index.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,19 @@
 import os
 import json
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator
 import httpx
 
+from app.services.http_client_registry import http_registry
+from app.services.generation_cache import cached_generation, cached_stream
+from app.services.generation_session import GenerationSession, current_session, is_follow_up
+from app.services.plan_repair import complete_study_plan
+from app.utils.circuit_breaker import guarded_generation, guarded_stream
+from app.utils.token_budget import (budget_study_plan_prompt, context_window, count_tokens, estimate_goals_tokens,
+                                    record_usage)
+from app.utils import prompt_templates
+from app.utils.structured_output import ollama_format, study_plan_schema
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,8 +26,14 @@ class OllamaService:
     def __init__(self):
         self.ollama_host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
         self.model = os.getenv("OLLAMA_MODEL", "llama3")
+        # Default output limit; plan calls pass a limit sized to the plan
         self.max_tokens = 4000
+        self.context_window = context_window("ollama")
         self.temperature = 0.7
+        # Keeps the model, and with it the KV cache of recent prompts, loaded between calls
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "10m")
+        # How follow-up calls reuse the plan call's evaluated prompt: "chat", "context" or "off"
+        self.session_reuse = os.getenv("OLLAMA_SESSION_REUSE", "chat").lower()
         self.use_ai = os.getenv("USE_AI_GENERATION", "true").lower() in ["true", "1", "yes"]
         
         if self.use_ai:
@@ -26,13 +42,72 @@ class OllamaService:
         else:
             logger.warning(f"AI DISABLED: Using PLACEHOLDER content generation instead of Ollama AI")
     
-    async def generate_content(self, prompt: str) -> str:
+    async def generate_content(self, prompt: str, schema: Optional[Dict[str, Any]] = None,
+                               max_tokens: Optional[int] = None) -> str:
+        """
+        Generate content, served from the generation cache when the same prompt was answered before
+        and failing fast while the provider's circuit breaker is open
+        
+        Args:
+            prompt: The prompt to send to the model
+            schema: JSON schema the response must follow when STRUCTURED_OUTPUT is enabled
+            max_tokens: Output token limit for this call (defaults to `self.max_tokens`)
+        
+        Returns:
+            Generated text from the model
+        """
+        response_format = ollama_format(schema)
+        max_tokens = max_tokens or self.max_tokens
+        session = self._follow_up_session()
+        if session is not None:
+            # The answer depends on the conversation so far, which becomes part of the cache key
+            params = {**self._sampling_params(response_format, max_tokens),
+                      "session": [session.base["prompt"], session.base["response"]]}
+            return await cached_generation("ollama", self.model, prompt, params,
+                                           lambda: guarded_generation("ollama", lambda: self._generate_follow_up(session, prompt, response_format, max_tokens)))
+        return await cached_generation("ollama", self.model, prompt, self._sampling_params(response_format, max_tokens),
+                                       lambda: guarded_generation("ollama", lambda: self._generate_content(prompt, response_format, max_tokens)))
+    
+    def _follow_up_session(self) -> Optional[GenerationSession]:
+        """
+        The current session when this call continues its plan call on this server
+        """
+        session = current_session()
+        if self.session_reuse not in ["chat", "context"] or session is None or not is_follow_up():
+            return None
+        base = session.base
+        if base is None or base["provider"] != "ollama":
+            return None
+        if self.session_reuse == "context" and not base.get("context"):
+            return None
+        return session
+    
+    def _set_session_base(self, prompt: str, response: str, context: Optional[List[int]]) -> None:
+        session = current_session()
+        if session is not None and not is_follow_up():
+            session.set_base("ollama", prompt, response, context=context)
+    
+    def _options(self, max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        # num_ctx matches the window the research context was trimmed to; Ollama's default is smaller
+        return {
+            "temperature": self.temperature,
+            "num_predict": max_tokens or self.max_tokens,
+            "num_ctx": self.context_window
+        }
+    
+    def _sampling_params(self, response_format: Any = None, max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        params = self._options(max_tokens)
+        if response_format is not None:
+            params["format"] = response_format
+        return params
+    
+    async def _generate_content(self, prompt: str, response_format: Any = None, max_tokens: Optional[int] = None) -> str:
         """
         Generate content using the Ollama API
         
         Args:
             prompt: The prompt to send to the model
-            
+        
         Returns:
             Generated text from the model
         """
@@ -56,51 +131,185 @@ class OllamaService:
                 "model": self.model,
                 "prompt": prompt,
                 "stream": False,
-                "options": {
-                    "temperature": self.temperature,
-                    "num_predict": self.max_tokens
-                }
+                "options": self._options(max_tokens),
+                "keep_alive": self.keep_alive
             }
+            if response_format is not None:
+                # "json" or a JSON schema constrains decoding to valid JSON
+                payload["format"] = response_format
             
             # Reduced timeout from 120 to 30 seconds for faster feedback
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                logger.info(f"Sending request to Ollama API at {url}")
-                logger.info(f"Request payload: {json.dumps(payload)[:200]}...")
-                
-                # Attempt to connect to the Ollama API
-                try:
-                    response = await client.post(url, json=payload, timeout=30.0)
-                except httpx.TimeoutException:
-                    logger.error(f"Connection to Ollama API timed out after 30 seconds")
-                    return "Error: Connection to Ollama timed out"
-                
-                # Check response status code
-                if response.status_code != 200:
-                    logger.error(f"Error from Ollama API: {response.status_code} - {response.text}")
-                    return f"Error generating content: {response.status_code}"
-                
-                logger.info("Successfully received response from Ollama API")
-                
-                # Try to parse the JSON response
-                try:
-                    result = response.json()
-                    logger.info(f"Response type: {type(result)}")
-                    logger.info(f"Response keys: {result.keys() if isinstance(result, dict) else 'Not a dict'}")
-                    
-                    if 'response' in result:
-                        logger.info(f"Response length: {len(result.get('response', ''))}")
-                        return result.get("response", "")
-                    else:
-                        logger.error(f"Unexpected response format: {result}")
-                        return f"Error: Unexpected response format"
-                except Exception as e:
-                    logger.error(f"Error parsing response: {e}")
-                    return f"Error parsing response: {e}"
+            client = http_registry.get_client("ollama")
+            logger.info(f"Sending request to Ollama API at {url}")
+            logger.info(f"Request payload: {json.dumps(payload)[:200]}...")
+            
+            # Attempt to connect to the Ollama API
+            try:
+                response = await client.post(url, json=payload, timeout=30.0)
+            except httpx.TimeoutException:
+                logger.error(f"Connection to Ollama API timed out after 30 seconds")
+                return "Error: Connection to Ollama timed out"
+            
+            # Check response status code
+            if response.status_code != 200:
+                logger.error(f"Error from Ollama API: {response.status_code} - {response.text}")
+                return f"Error generating content: {response.status_code}"
+            
+            logger.info("Successfully received response from Ollama API")
+            
+            # Try to parse the JSON response
+            try:
+                result = response.json()
+                logger.info(f"Response type: {type(result)}")
+                logger.info(f"Response keys: {result.keys() if isinstance(result, dict) else 'Not a dict'}")
                 
+                if 'response' in result:
+                    logger.info(f"Response length: {len(result.get('response', ''))}")
+                    self._record_usage(prompt, max_tokens or self.max_tokens, result)
+                    self._set_session_base(prompt, result.get("response", ""), result.get("context"))
+                    return result.get("response", "")
+                else:
+                    logger.error(f"Unexpected response format: {result}")
+                    return f"Error: Unexpected response format"
+            except Exception as e:
+                logger.error(f"Error parsing response: {e}")
+                return f"Error parsing response: {e}"
+        
         except Exception as e:
             logger.error(f"Error generating content with Ollama: {str(e)}")
             return f"Error: {str(e)}"
     
+    @staticmethod
+    def _record_usage(prompt: str, max_tokens: int, result: Dict[str, Any]) -> int:
+        """
+        Record a call's token usage and prefill time; returns the prompt tokens reused from the KV cache
+        """
+        evaluated = result.get("prompt_eval_count")
+        duration = result.get("prompt_eval_duration")
+        # Ollama only evaluates the part of the prompt not already in the KV cache;
+        # differences within the token estimate's error are not counted as reuse
+        reused = None
+        if evaluated is not None:
+            estimated = count_tokens(prompt)
+            reused = estimated - evaluated if estimated - evaluated > estimated * 0.1 else 0
+        record_usage("ollama", prompt, max_tokens, evaluated, result.get("eval_count"),
+                     result.get("done_reason") == "length", reused,
+                     duration / 1e9 if duration is not None else None)
+        return reused or 0
+    
+    async def _generate_follow_up(self, session: GenerationSession, prompt: str, response_format: Any = None,
+                                  max_tokens: Optional[int] = None) -> str:
+        """
+        Generate content as a continuation of the session's plan call
+        
+        With "chat" the plan prompt and response are sent as /api/chat history;
+        with "context" the token context returned by /api/generate is sent back.
+        Either way the conversation starts with what the server has just
+        evaluated, so it only prefills the new prompt from its KV cache.
+        """
+        base = session.base
+        host = self.ollama_host if self.ollama_host.startswith("http") else f"http://{self.ollama_host}"
+        payload: Dict[str, Any] = {"model": self.model, "stream": False, "options": self._options(max_tokens),
+                                   "keep_alive": self.keep_alive}
+        if self.session_reuse == "context":
+            url = f"{host.rstrip('/')}/api/generate"
+            payload.update(prompt=prompt, context=base["context"])
+        else:
+            url = f"{host.rstrip('/')}/api/chat"
+            payload["messages"] = [
+                {"role": "user", "content": base["prompt"]},
+                {"role": "assistant", "content": base["response"]},
+                {"role": "user", "content": prompt}
+            ]
+        if response_format is not None:
+            payload["format"] = response_format
+        
+        logger.info(f"Generating follow-up content with Ollama model: {self.model}")
+        client = http_registry.get_client("ollama")
+        try:
+            response = await client.post(url, json=payload, timeout=30.0)
+        except httpx.TimeoutException:
+            logger.error(f"Connection to Ollama API timed out after 30 seconds")
+            return "Error: Connection to Ollama timed out"
+        except Exception as e:
+            logger.error(f"Error generating follow-up content with Ollama: {str(e)}")
+            return f"Error: {str(e)}"
+        if response.status_code != 200:
+            logger.error(f"Error from Ollama API: {response.status_code} - {response.text}")
+            return f"Error generating content: {response.status_code}"
+        try:
+            result = response.json()
+            text = result["response"] if self.session_reuse == "context" else result["message"]["content"]
+        except Exception as e:
+            logger.error(f"Error parsing response: {e}")
+            return f"Error parsing response: {e}"
+        # The whole conversation is the prompt; whatever Ollama did not evaluate came from its KV cache
+        conversation = base["prompt"] + base["response"] + prompt
+        self._record_usage(conversation, max_tokens or self.max_tokens, result)
+        # Saved relative to the stateless call this replaces, which would have evaluated just the new prompt;
+        # negative when the KV cache was evicted and the whole conversation had to be evaluated again
+        evaluated = result.get("prompt_eval_count")
+        session.record_follow_up(count_tokens(prompt) - evaluated if evaluated is not None else 0)
+        return text
+    
+    async def stream_content(self, prompt: str, schema: Optional[Dict[str, Any]] = None,
+                             max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Stream generated text; a cached response is yielded as a single chunk
+        """
+        response_format = ollama_format(schema)
+        max_tokens = max_tokens or self.max_tokens
+        async for chunk in cached_stream("ollama", self.model, prompt, self._sampling_params(response_format, max_tokens),
+                                         lambda: guarded_stream("ollama", lambda: self._stream_content(prompt, response_format, max_tokens))):
+            yield chunk
+    
+    async def _stream_content(self, prompt: str, response_format: Any = None,
+                              max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Generate content with the Ollama API, yielding text as it is produced
+        
+        Ollama streams newline-delimited JSON objects, each carrying the next
+        piece of the response; the last one has "done": true.
+        
+        Args:
+            prompt: The prompt to send to the model
+        
+        Yields:
+            Chunks of generated text
+        """
+        host = self.ollama_host if self.ollama_host.startswith("http") else f"http://{self.ollama_host}"
+        url = f"{host.rstrip('/')}/api/generate"
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True,
+            "options": self._options(max_tokens),
+            "keep_alive": self.keep_alive
+        }
+        if response_format is not None:
+            payload["format"] = response_format
+        
+        logger.info(f"Streaming content from Ollama model: {self.model}")
+        client = http_registry.get_client("ollama")
+        chunks: List[str] = []
+        async with client.stream("POST", url, json=payload, timeout=httpx.Timeout(30.0, read=120.0)) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                raise RuntimeError(f"Error from Ollama API: {response.status_code} - {body[:200]!r}")
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(f"Error from Ollama API: {data['error']}")
+                if data.get("response"):
+                    chunks.append(data["response"])
+                    yield data["response"]
+                if data.get("done"):
+                    self._record_usage(prompt, max_tokens or self.max_tokens, data)
+                    self._set_session_base(prompt, "".join(chunks), data.get("context"))
+                    break
+    
     async def create_study_plan(self, 
                               topic: str, 
                               research_data: Dict[str, Any],
@@ -108,7 +317,8 @@ class OllamaService:
                               depth_level: int = 3,
                               learning_style: Optional[str] = None,
                               prior_knowledge: Optional[str] = None,
-                              generate_goals: bool = False) -> Dict[str, Any]:
+                              generate_goals: bool = False,
+                              include_resources: bool = True) -> Dict[str, Any]:
         # Check if AI is disabled at the start
         if not self.use_ai:
             logger.warning(f"AI GENERATION DISABLED: Using placeholder content for topic {topic}")
@@ -123,94 +333,56 @@ class OllamaService:
             depth_level: Level of detail (1-5)
             learning_style: Preferred learning style
             prior_knowledge: Level of prior knowledge
-            
+            generate_goals: Ask for the learning goals in the plan's "goals" field instead of a separate call
+            include_resources: Ask for a list of learning resources
+        
         Returns:
             Structured study plan
         """
         try:
-            # Extract key information from research data to include in prompt
-            sources_info = ""
-            for idx, source in enumerate(research_data.get('sources', [])[:5]):
-                sources_info += f"Source {idx+1}: {source.get('title', 'Unknown')} - {source.get('summary', '')[:300]}...\n\n"
-            
-            key_concepts = ", ".join(research_data.get('key_concepts', [])[:8])
-            related_topics = ", ".join(research_data.get('related_topics', []))
+            # Output limit sized to the plan; research context trimmed to the context window
+            prompt, max_tokens = budget_study_plan_prompt(
+                self, topic, research_data, duration_weeks, depth_level, learning_style, prior_knowledge,
+                include_goals=generate_goals, include_resources=include_resources
+            )
             
-            # Build the prompt
-            prompt = f"""
-You are an expert educational consultant creating a comprehensive study plan for the topic: {topic}.
-
-RESEARCH DATA:
-{sources_info}
-
-KEY CONCEPTS: {key_concepts}
-
-RELATED TOPICS: {related_topics}
-
-PARAMETERS:
-- Duration: {duration_weeks} weeks
-- Depth Level: {depth_level}/5
-- Learning Style: {learning_style if learning_style else 'Not specified'}
-- Prior Knowledge: {prior_knowledge if prior_knowledge else 'Not specified'}
-
-Create a detailed, structured study plan following this exact JSON format:
-{{
-  "topic": "The main topic",
-  "summary": "A concise summary of what will be studied and why it's valuable",
-  "duration_weeks": {duration_weeks},
-  "learning_objectives": ["Objective 1", "Objective 2", "Objective 3", ...],
-  "key_concepts": ["Concept 1", "Concept 2", "Concept 3", ...],
-  "milestones": [
-    {{
-      "title": "Week 1: Foundation",
-      "description": "Description of what will be covered",
-      "week": 1,
-      "tasks": ["Task 1", "Task 2", "Task 3", ...],
-      "estimated_hours": 10
-    }},
-    ...more milestones for each week...
-  ],
-  "resources": [
-    {{
-      "title": "Resource Title",
-      "url": "https://example.com/resource",
-      "type": "article/book/video/course",
-      "description": "Brief description of the resource"
-    }},
-    ...more resources...
-  ],
-  "recommendations": "Additional personalized recommendations based on learning style and prior knowledge. For instance, suggest hands-on projects for kinesthetic learners or foundational books for beginners."
-}}
-
-Return ONLY the valid JSON object, nothing else. Ensure all JSON is properly formatted and valid.
-"""
             # Generate the study plan
-            result = await self.generate_content(prompt)
+            result = await self.generate_content(prompt, schema=study_plan_schema(generate_goals), max_tokens=max_tokens)
             
-            # Parse the JSON response
-            try:
-                # Find JSON content (in case there's additional text)
-                json_start = result.find('{')
-                json_end = result.rfind('}') + 1
-                
-                if json_start >= 0 and json_end > json_start:
-                    json_content = result[json_start:json_end]
-                    study_plan = json.loads(json_content)
-                    logger.info(f"Successfully parsed AI-generated study plan for topic: {topic}")
-                    return study_plan
-                else:
-                    logger.error("Could not find valid JSON in Ollama response")
-                    return self._generate_fallback_plan(topic, duration_weeks)
-                    
-            except json.JSONDecodeError as e:
-                logger.error(f"Error parsing JSON from Ollama response: {str(e)}")
+            # Parse the JSON response, repairing it and regenerating only the parts that are missing
+            study_plan = await complete_study_plan(self, result, topic, duration_weeks, generate_goals, "ollama")
+            if study_plan is None:
+                logger.error(f"Could not parse or salvage a study plan from the Ollama response")
                 logger.error(f"Raw response: {result}")
                 return self._generate_fallback_plan(topic, duration_weeks)
-                
+            logger.info(f"Successfully parsed AI-generated study plan for topic: {topic}")
+            return study_plan
+        
         except Exception as e:
             logger.error(f"Error creating study plan: {str(e)}")
             return self._generate_fallback_plan(topic, duration_weeks)
 
+    def build_study_plan_prompt(self,
+                                topic: str,
+                                research_data: Dict[str, Any],
+                                duration_weeks: int,
+                                depth_level: int,
+                                learning_style: Optional[str],
+                                prior_knowledge: Optional[str],
+                                include_goals: bool = False,
+                                include_resources: bool = True) -> str:
+        """
+        Build the study plan prompt: the shared static prefix, then the research data and user preferences
+        
+        With `include_goals`, the JSON format also asks for a "goals" list so
+        learning goals come back with the plan in a single call. Without
+        `include_resources` the resources list is left out of the format.
+        """
+        return prompt_templates.build_study_plan_prompt(
+            topic, research_data, duration_weeks, depth_level, learning_style, prior_knowledge,
+            include_goals=include_goals, include_resources=include_resources
+        )
+
     async def generate_learning_goals(self, topic: str, duration_weeks: int, prior_knowledge: Optional[str]) -> List[str]:
         """
         Generate a list of learning goals using Ollama.
@@ -224,7 +396,7 @@ Prior Knowledge: {prior_knowledge or 'None'}
 
 Return a JSON list of strings. For example: ["goal 1", "goal 2", "goal 3"]
 """
-        response = await self.generate_content(prompt)
+        response = await self.generate_content(prompt, max_tokens=estimate_goals_tokens())
         try:
             # Extract JSON from the response
             json_start = response.find('[')
@@ -4,11 +4,20 @@ Provides integration with OpenRouter API to generate content using various AI mo
 """
 import os
 import json
+import time
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator
 
 import httpx
 
+from app.services.http_client_registry import http_registry
+from app.services.generation_cache import cached_generation, cached_stream
+from app.services.plan_repair import complete_study_plan
+from app.utils.circuit_breaker import guarded_generation, guarded_stream
+from app.utils.token_budget import budget_study_plan_prompt, context_window, estimate_goals_tokens, record_usage
+from app.utils import prompt_templates
+from app.utils.structured_output import openrouter_response_format, study_plan_schema
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,22 +35,69 @@ class OpenRouterService:
         
         # Determine if this is a Google model for special handling
         self.is_google_model = self.model.startswith("google/")
-            
+        
         # OpenRouter API URL follows OpenAI-compatible format
         self.api_url = "https://openrouter.ai/api/v1/chat/completions"
+        # Default output limit; plan calls pass a limit sized to the plan
         self.max_tokens = 4000
+        self.context_window = context_window("openrouter")
         self.temperature = 0.7
         
         logger.info(f"Initialized OpenRouter service")
         logger.info(f"Using AI model: {self.model}")
     
-    async def generate_content(self, prompt: str) -> str:
+    async def generate_content(self, prompt: str, schema: Optional[Dict[str, Any]] = None,
+                               max_tokens: Optional[int] = None) -> str:
+        """
+        Generate content, served from the generation cache when the same prompt was answered before
+        and failing fast while the provider's circuit breaker is open
+        
+        Args:
+            prompt: The prompt to send to the model
+            schema: JSON schema the response must follow when STRUCTURED_OUTPUT is enabled
+            max_tokens: Output token limit for this call (defaults to `self.max_tokens`)
+        
+        Returns:
+            Generated text from the model
+        """
+        response_format = openrouter_response_format(schema)
+        max_tokens = max_tokens or self.max_tokens
+        return await cached_generation("openrouter", self.model, prompt, self._sampling_params(response_format, max_tokens),
+                                       lambda: guarded_generation("openrouter", lambda: self._generate_content(prompt, response_format, max_tokens)))
+    
+    def _sampling_params(self, response_format: Any = None, max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        params = {"temperature": self.temperature, "max_tokens": max_tokens or self.max_tokens}
+        if response_format is not None:
+            params["response_format"] = response_format
+        return params
+    
+    @staticmethod
+    def _user_content(prompt: str) -> Any:
+        """
+        The prompt as message content, with a cache_control breakpoint after its static prefix
+
+        Anthropic and Gemini models cache up to the breakpoint; providers with
+        automatic prefix caching ignore it.
+        """
+        prefix, rest = prompt_templates.split_cacheable_prefix(prompt)
+        if not prefix or not prompt_templates.prompt_cache_enabled():
+            return prompt
+        return [
+            {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": rest}
+        ]
+    
+    @staticmethod
+    def _cached_tokens(usage: Dict[str, Any]) -> int:
+        return (usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0
+    
+    async def _generate_content(self, prompt: str, response_format: Any = None, max_tokens: Optional[int] = None) -> str:
         """
         Generate content using the OpenRouter API
         
         Args:
             prompt: The prompt to send to the model
-            
+        
         Returns:
             Generated text from the model
         """
@@ -52,7 +108,7 @@ class OpenRouterService:
         if not self.api_key:
             logger.error("OpenRouter API key is not set")
             return "Error: OpenRouter API key is not set in environment variables"
-            
+        
         try:
             logger.info(f"Generating content with OpenRouter model: {self.model}")
             
@@ -68,12 +124,14 @@ class OpenRouterService:
                 "model": self.model,
                 "messages": [
                     {"role": "system", "content": "You are an expert educational consultant who creates comprehensive study plans. You always respond with valid, properly formatted JSON data as requested."},
-                    {"role": "user", "content": prompt}
+                    {"role": "user", "content": self._user_content(prompt)}
                 ],
                 "temperature": self.temperature,
-                "max_tokens": self.max_tokens,
+                "max_tokens": max_tokens or self.max_tokens,
                 "stream": False
             }
+            if response_format is not None:
+                payload["response_format"] = response_format
             
             # Special handling for Google Gemini models
             if self.is_google_model:
@@ -102,85 +160,170 @@ class OpenRouterService:
             logger.info(f"OpenRouter Request Headers: {headers}")
             logger.info(f"OpenRouter Request Payload (partial): {json.dumps(payload, indent=2)[:500]}...")
             
-            async with httpx.AsyncClient(timeout=60.0) as client:  # Increased timeout to 60 seconds
+            client = http_registry.get_client("openrouter")
+            try:
+                # Add verbose logging for the request
+                logger.info(f"Sending POST request to OpenRouter API...")
+                response = await client.post(
+                    self.api_url, 
+                    headers=headers,
+                    json=payload,
+                    timeout=60.0
+                )
+                
+                # Check response status code
+                if response.status_code != 200:
+                    logger.error(f"Error from OpenRouter API: {response.status_code}")
+                    logger.error(f"Response headers: {response.headers}")
+                    logger.error(f"Response body: {response.text}")
+                    
+                    # Extract error message from response if available
+                    error_msg = "Unknown error"
+                    try:
+                        error_data = response.json()
+                        if 'error' in error_data:
+                            if isinstance(error_data['error'], dict) and 'message' in error_data['error']:
+                                error_msg = error_data['error']['message']
+                            else:
+                                error_msg = str(error_data['error'])
+                    except:
+                        error_msg = response.text[:200]
+                    
+                    return f"Error generating content: {response.status_code} - {error_msg}"
+                
+                logger.info("Successfully received response from OpenRouter API")
+                
+                # Parse the response JSON
                 try:
-                    # Add verbose logging for the request
-                    logger.info(f"Sending POST request to OpenRouter API...")
-                    response = await client.post(
-                        self.api_url, 
-                        headers=headers,
-                        json=payload,
-                        timeout=60.0
-                    )
+                    # Log that we received a response
+                    logger.info(f"Received response from OpenRouter with status code {response.status_code}")
+                    logger.info(f"Response Content-Type: {response.headers.get('content-type', 'unknown')}")
                     
-                    # Check response status code
-                    if response.status_code != 200:
-                        logger.error(f"Error from OpenRouter API: {response.status_code}")
-                        logger.error(f"Response headers: {response.headers}")
-                        logger.error(f"Response body: {response.text}")
-                        
-                        # Extract error message from response if available
-                        error_msg = "Unknown error"
-                        try:
-                            error_data = response.json()
-                            if 'error' in error_data:
-                                if isinstance(error_data['error'], dict) and 'message' in error_data['error']:
-                                    error_msg = error_data['error']['message']
-                                else:
-                                    error_msg = str(error_data['error'])
-                        except:
-                            error_msg = response.text[:200]
-                            
-                        return f"Error generating content: {response.status_code} - {error_msg}"
+                    # Get the raw response first for logging
+                    raw_response = response.text
+                    logger.info(f"Raw response snippet: {raw_response[:200]}...")
                     
-                    logger.info("Successfully received response from OpenRouter API")
+                    # Parse the JSON
+                    result = response.json()
+                    logger.info(f"Response structure: {list(result.keys()) if isinstance(result, dict) else 'Not a dict'}")
                     
-                    # Parse the response JSON
-                    try:
-                        # Log that we received a response
-                        logger.info(f"Received response from OpenRouter with status code {response.status_code}")
-                        logger.info(f"Response Content-Type: {response.headers.get('content-type', 'unknown')}")
-                        
-                        # Get the raw response first for logging
-                        raw_response = response.text
-                        logger.info(f"Raw response snippet: {raw_response[:200]}...")
+                    if 'choices' in result and len(result['choices']) > 0:
+                        # Extract the generated text from the response
+                        logger.info(f"Found {len(result['choices'])} choices in the response")
                         
-                        # Parse the JSON
-                        result = response.json()
-                        logger.info(f"Response structure: {list(result.keys()) if isinstance(result, dict) else 'Not a dict'}")
+                        # Check the structure of the first choice
+                        choice = result['choices'][0]
+                        logger.info(f"Choice keys: {list(choice.keys()) if isinstance(choice, dict) else 'Not a dict'}")
                         
-                        if 'choices' in result and len(result['choices']) > 0:
-                            # Extract the generated text from the response
-                            logger.info(f"Found {len(result['choices'])} choices in the response")
-                            
-                            # Check the structure of the first choice
-                            choice = result['choices'][0]
-                            logger.info(f"Choice keys: {list(choice.keys()) if isinstance(choice, dict) else 'Not a dict'}")
-                            
-                            if 'message' in choice and isinstance(choice['message'], dict) and 'content' in choice['message']:
-                                generated_text = choice['message']['content']
-                                logger.info(f"Received {len(generated_text)} characters from OpenRouter")
-                                logger.info(f"First 100 chars of content: {generated_text[:100]}...")
-                                return generated_text
-                            else:
-                                logger.error(f"Unexpected choice format: {choice}")
-                                return f"Error: Unexpected response format in choices"
+                        if 'message' in choice and isinstance(choice['message'], dict) and 'content' in choice['message']:
+                            generated_text = choice['message']['content']
+                            logger.info(f"Received {len(generated_text)} characters from OpenRouter")
+                            usage = result.get('usage') or {}
+                            record_usage("openrouter", prompt, max_tokens or self.max_tokens, usage.get('prompt_tokens'),
+                                         usage.get('completion_tokens'), choice.get('finish_reason') == "length",
+                                         self._cached_tokens(usage))
+                            logger.info(f"First 100 chars of content: {generated_text[:100]}...")
+                            return generated_text
                         else:
-                            logger.error(f"Unexpected response format from OpenRouter: {result}")
-                            return "Error: Unexpected response format"
-                    
-                    except Exception as e:
-                        logger.error(f"Error parsing OpenRouter response: {e}")
-                        return f"Error parsing response: {e}"
-                        
-                except httpx.TimeoutException:
-                    logger.error("Connection to OpenRouter API timed out")
-                    return "Error: Connection to OpenRouter API timed out"
+                            logger.error(f"Unexpected choice format: {choice}")
+                            return f"Error: Unexpected response format in choices"
+                    else:
+                        logger.error(f"Unexpected response format from OpenRouter: {result}")
+                        return "Error: Unexpected response format"
                 
+                except Exception as e:
+                    logger.error(f"Error parsing OpenRouter response: {e}")
+                    return f"Error parsing response: {e}"
+            
+            except httpx.TimeoutException:
+                logger.error("Connection to OpenRouter API timed out")
+                return "Error: Connection to OpenRouter API timed out"
+        
         except Exception as e:
             logger.error(f"Error generating content with OpenRouter: {str(e)}")
             return f"Error: {str(e)}"
     
+    async def stream_content(self, prompt: str, schema: Optional[Dict[str, Any]] = None,
+                             max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Stream generated text; a cached response is yielded as a single chunk
+        """
+        response_format = openrouter_response_format(schema)
+        max_tokens = max_tokens or self.max_tokens
+        async for chunk in cached_stream("openrouter", self.model, prompt, self._sampling_params(response_format, max_tokens),
+                                         lambda: guarded_stream("openrouter", lambda: self._stream_content(prompt, response_format, max_tokens))):
+            yield chunk
+    
+    async def _stream_content(self, prompt: str, response_format: Any = None,
+                              max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Generate content with the OpenRouter API, yielding text as it is produced
+        
+        OpenRouter streams Server-Sent Events in the OpenAI chat completion
+        format; lines starting with ":" are keep-alive comments.
+        
+        Args:
+            prompt: The prompt to send to the model
+        
+        Yields:
+            Chunks of generated text
+        """
+        if not self.api_key:
+            raise RuntimeError("OpenRouter API key is not set in environment variables")
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://studyplannerai.app",
+            "X-Title": "StudyplannerAI"
+        }
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "You are an expert educational consultant who creates comprehensive study plans. You always respond with valid, properly formatted JSON data as requested."},
+                {"role": "user", "content": self._user_content(prompt)}
+            ],
+            "temperature": self.temperature,
+            "max_tokens": max_tokens or self.max_tokens,
+            "stream": True,
+            # The final event then carries the token usage
+            "usage": {"include": True}
+        }
+        if response_format is not None:
+            payload["response_format"] = response_format
+        
+        logger.info(f"Streaming content from OpenRouter model: {self.model}")
+        client = http_registry.get_client("openrouter")
+        started = time.perf_counter()
+        first_token_seconds = None
+        async with client.stream("POST", self.api_url, headers=headers, json=payload,
+                                 timeout=httpx.Timeout(60.0, read=120.0)) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                raise RuntimeError(f"Error from OpenRouter API: {response.status_code} - {body[:200]!r}")
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                if 'error' in event:
+                    raise RuntimeError(f"Error from OpenRouter API: {event['error']}")
+                if event.get('usage'):
+                    usage = event['usage']
+                    finished = [choice.get('finish_reason') for choice in event.get('choices', [])]
+                    record_usage("openrouter", prompt, max_tokens or self.max_tokens, usage.get('prompt_tokens'),
+                                 usage.get('completion_tokens'), "length" in finished, self._cached_tokens(usage),
+                                 first_token_seconds)
+                for choice in event.get('choices', []):
+                    content = (choice.get('delta') or {}).get('content')
+                    if content:
+                        if first_token_seconds is None:
+                            # Time to first token stands in for prefill time
+                            first_token_seconds = time.perf_counter() - started
+                        yield content
+    
     async def create_study_plan(self, 
                               topic: str, 
                               research_data: Dict[str, Any],
@@ -188,7 +331,8 @@ class OpenRouterService:
                               depth_level: int = 3,
                               learning_style: Optional[str] = None,
                               prior_knowledge: Optional[str] = None,
-                              generate_goals: bool = False) -> Dict[str, Any]:
+                              generate_goals: bool = False,
+                              include_resources: bool = True) -> Dict[str, Any]:
         """
         Generate a complete study plan using OpenRouter
         
@@ -199,94 +343,56 @@ class OpenRouterService:
             depth_level: Level of detail (1-5)
             learning_style: Preferred learning style
             prior_knowledge: Level of prior knowledge
-            
+            generate_goals: Ask for the learning goals in the plan's "goals" field instead of a separate call
+            include_resources: Ask for a list of learning resources
+        
         Returns:
             Structured study plan
         """
         try:
-            # Extract key information from research data to include in prompt
-            sources_info = ""
-            for idx, source in enumerate(research_data.get('sources', [])[:5]):
-                sources_info += f"Source {idx+1}: {source.get('title', 'Unknown')} - {source.get('summary', '')[:300]}...\n\n"
-            
-            key_concepts = ", ".join(research_data.get('key_concepts', [])[:8])
-            related_topics = ", ".join(research_data.get('related_topics', []))
+            # Output limit sized to the plan; research context trimmed to the context window
+            prompt, max_tokens = budget_study_plan_prompt(
+                self, topic, research_data, duration_weeks, depth_level, learning_style, prior_knowledge,
+                include_goals=generate_goals, include_resources=include_resources
+            )
             
-            # Build the prompt
-            prompt = f"""
-You are an expert educational consultant creating a comprehensive study plan for the topic: {topic}.
-
-RESEARCH DATA:
-{sources_info}
-
-KEY CONCEPTS: {key_concepts}
-
-RELATED TOPICS: {related_topics}
-
-PARAMETERS:
-- Duration: {duration_weeks} weeks
-- Depth Level: {depth_level}/5
-- Learning Style: {learning_style if learning_style else 'Not specified'}
-- Prior Knowledge: {prior_knowledge if prior_knowledge else 'Not specified'}
-
-Create a detailed, structured study plan following this JSON format:
-{{
-  "topic": "The main topic",
-  "summary": "A concise summary of what will be studied and why it's valuable",
-  "duration_weeks": {duration_weeks},
-  "learning_objectives": ["Objective 1", "Objective 2", "Objective 3", ...],
-  "key_concepts": ["Concept 1", "Concept 2", "Concept 3", ...],
-  "milestones": [
-    {{
-      "title": "Week 1: Foundation",
-      "description": "Description of what will be covered",
-      "week": 1,
-      "tasks": ["Task 1", "Task 2", "Task 3", ...],
-      "estimated_hours": 10
-    }},
-    ...more milestones for each week...
-  ],
-  "resources": [
-    {{
-      "title": "Resource Title",
-      "url": "https://example.com/resource",
-      "type": "article/book/video/course",
-      "description": "Brief description of the resource"
-    }},
-    ...more resources...
-  ],
-  "recommendations": "Additional personalized recommendations based on learning style and prior knowledge. For instance, suggest hands-on projects for kinesthetic learners or foundational books for beginners."
-}}
-
-Return ONLY the valid JSON object, nothing else. Ensure all JSON is properly formatted and valid.
-"""
             # Generate the study plan
-            result = await self.generate_content(prompt)
+            result = await self.generate_content(prompt, schema=study_plan_schema(generate_goals), max_tokens=max_tokens)
             
-            # Parse the JSON response
-            try:
-                # Find JSON content (in case there's additional text)
-                json_start = result.find('{')
-                json_end = result.rfind('}') + 1
-                
-                if json_start >= 0 and json_end > json_start:
-                    json_content = result[json_start:json_end]
-                    study_plan = json.loads(json_content)
-                    logger.info(f"Successfully parsed AI-generated study plan for topic: {topic}")
-                    return study_plan
-                else:
-                    logger.error("Could not find valid JSON in OpenRouter response")
-                    return self._generate_fallback_plan(topic, duration_weeks)
-                    
-            except json.JSONDecodeError as e:
-                logger.error(f"Error parsing JSON from OpenRouter response: {str(e)}")
+            # Parse the JSON response, repairing it and regenerating only the parts that are missing
+            study_plan = await complete_study_plan(self, result, topic, duration_weeks, generate_goals, "openrouter")
+            if study_plan is None:
+                logger.error(f"Could not parse or salvage a study plan from the OpenRouter response")
                 logger.error(f"Raw response: {result}")
                 return self._generate_fallback_plan(topic, duration_weeks)
-                
+            logger.info(f"Successfully parsed AI-generated study plan for topic: {topic}")
+            return study_plan
+        
         except Exception as e:
             logger.error(f"Error creating study plan: {str(e)}")
             return self._generate_fallback_plan(topic, duration_weeks)
 
+    def build_study_plan_prompt(self,
+                                topic: str,
+                                research_data: Dict[str, Any],
+                                duration_weeks: int,
+                                depth_level: int,
+                                learning_style: Optional[str],
+                                prior_knowledge: Optional[str],
+                                include_goals: bool = False,
+                                include_resources: bool = True) -> str:
+        """
+        Build the study plan prompt: the shared static prefix, then the research data and user preferences
+        
+        With `include_goals`, the JSON format also asks for a "goals" list so
+        learning goals come back with the plan in a single call. Without
+        `include_resources` the resources list is left out of the format.
+        """
+        return prompt_templates.build_study_plan_prompt(
+            topic, research_data, duration_weeks, depth_level, learning_style, prior_knowledge,
+            include_goals=include_goals, include_resources=include_resources
+        )
+
     async def generate_learning_goals(self, topic: str, duration_weeks: int, prior_knowledge: Optional[str]) -> List[str]:
         """
         Generate a list of learning goals using OpenRouter.
@@ -300,7 +406,7 @@ Prior Knowledge: {prior_knowledge or 'None'}
 
 Return a JSON list of strings. For example: ["goal 1", "goal 2", "goal 3"]
 """
-        response = await self.generate_content(prompt)
+        response = await self.generate_content(prompt, max_tokens=estimate_goals_tokens())
         try:
             # Extract JSON from the response
             json_start = response.find('[')
@@ -0,0 +1,198 @@
+"""
+Per-URL page content cache for StudyplannerAI.
+Stores extracted page text (zlib-compressed) together with the HTTP validators
+so popular pages can be revalidated with conditional GETs instead of being
+downloaded and parsed again.
+"""
+import os
+import time
+import zlib
+import sqlite3
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+from app.utils.metrics import metrics
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PageContentCache:
+    """
+    Disk-backed, size-bounded LRU cache of extracted page text keyed by URL
+    """
+
+    def __init__(self, data_dir: str = "data", max_bytes: Optional[int] = None):
+        self.data_dir = data_dir
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.db_path = os.path.join(self.data_dir, "page_cache.sqlite3")
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("PAGE_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10.0)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self) -> None:
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS page_cache (
+                    url TEXT PRIMARY KEY,
+                    content BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_page_cache_accessed ON page_cache (last_accessed)")
+            # Running byte total, so inserts don't re-sum the table to check the budget
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS page_cache_size (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    total_bytes INTEGER NOT NULL
+                )
+            """)
+            conn.execute(
+                "INSERT OR IGNORE INTO page_cache_size (id, total_bytes) "
+                "SELECT 0, COALESCE(SUM(size), 0) FROM page_cache"
+            )
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached page
+
+        Returns:
+            Dictionary with content, etag and last_modified, or None
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT content, etag, last_modified FROM page_cache WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        content, etag, last_modified = row
+        return {
+            'content': zlib.decompress(content).decode('utf-8'),
+            'etag': etag,
+            'last_modified': last_modified
+        }
+
+    def iter_pages(self) -> Iterator[Tuple[str, str]]:
+        """
+        Yield (url, content) for every cached page
+        """
+        with self._connect() as conn:
+            for url, content in conn.execute("SELECT url, content FROM page_cache ORDER BY url"):
+                yield url, zlib.decompress(content).decode('utf-8')
+
+    def conditional_headers(self, entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Build If-None-Match / If-Modified-Since headers for a cached entry
+        """
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def touch(self, url: str) -> None:
+        """
+        Mark a cached page as recently used after a successful revalidation
+        """
+        with self._connect() as conn:
+            conn.execute("UPDATE page_cache SET last_accessed = ? WHERE url = ?", (time.time(), url))
+        metrics.increment("page_cache.revalidated")
+
+    def set(self, url: str, content: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """
+        Store extracted page text and evict least recently used pages beyond the size budget
+        """
+        compressed = zlib.compress(content.encode('utf-8'), 6)
+        now = time.time()
+        with self._connect() as conn:
+            previous = conn.execute("SELECT size FROM page_cache WHERE url = ?", (url,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO page_cache (url, content, etag, last_modified, size, fetched_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, compressed, etag, last_modified, len(compressed), now, now)
+            )
+            self._add_bytes(conn, len(compressed) - (previous[0] if previous else 0))
+            self._evict(conn)
+        metrics.increment("page_cache.stored")
+
+    @staticmethod
+    def _add_bytes(conn: sqlite3.Connection, delta: int) -> None:
+        conn.execute("UPDATE page_cache_size SET total_bytes = total_bytes + ? WHERE id = 0", (delta,))
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT total_bytes FROM page_cache_size WHERE id = 0").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        freed = 0
+        for url, size in conn.execute("SELECT url, size FROM page_cache ORDER BY last_accessed ASC").fetchall():
+            if total - freed <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM page_cache WHERE url = ?", (url,))
+            freed += size
+            evicted += 1
+        self._add_bytes(conn, -freed)
+        metrics.increment("page_cache.evicted", evicted)
+        logger.info(f"Evicted {evicted} pages from the page cache to stay within {self.max_bytes} bytes")
+
+    def purge(self) -> int:
+        """
+        Remove every cached page
+
+        Returns:
+            Number of pages removed
+        """
+        with self._connect() as conn:
+            removed = conn.execute("DELETE FROM page_cache").rowcount
+            conn.execute("UPDATE page_cache_size SET total_bytes = 0 WHERE id = 0")
+        logger.info(f"Purged {removed} pages from the page cache")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return the size of the cache and its revalidation counters
+        """
+        with self._connect() as conn:
+            pages = conn.execute("SELECT COUNT(*) FROM page_cache").fetchone()[0]
+            stored_bytes = conn.execute("SELECT total_bytes FROM page_cache_size WHERE id = 0").fetchone()[0]
+        return {
+            "pages": pages,
+            "stored_bytes": stored_bytes,
+            "max_bytes": self.max_bytes,
+            "revalidated": metrics.get_counter("page_cache.revalidated"),
+            "refetched": metrics.get_counter("page_cache.refetched"),
+            "stored": metrics.get_counter("page_cache.stored"),
+            "evicted": metrics.get_counter("page_cache.evicted")
+        }
+
+
+_page_cache: Optional[PageContentCache] = None
+
+
+def get_page_cache() -> Optional[PageContentCache]:
+    """
+    Get the shared page content cache, or None when it is disabled
+    """
+    global _page_cache
+    if os.getenv("PAGE_CACHE_ENABLED", "true").lower() not in ["true", "1", "yes"]:
+        return None
+    if _page_cache is None:
+        _page_cache = PageContentCache(data_dir=os.getenv("DATA_DIR", "data"))
+    return _page_cache
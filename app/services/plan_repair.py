@@ -0,0 +1,264 @@
+"""
+Study plan salvage for StudyplannerAI.
+Instead of discarding a whole generation when the model's JSON is malformed,
+truncated or partly off-schema, the response is repaired, validated against
+`StudyPlanResponse` piece by piece, and only the missing parts (trailing
+milestones, required fields) are regenerated in a small follow-up call.
+"""
+import os
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.models import MilestoneItem, ResourceItem
+from app.services.generation_session import follow_up
+from app.utils.json_repair import repair_json
+from app.utils.json_stream import IncrementalJSONParser
+from app.utils.metrics import metrics
+from app.utils.structured_output import parse_plan
+from app.utils.token_budget import estimate_milestone_tokens
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Required list fields the follow-up call can regenerate
+_LIST_FIELDS = ("learning_objectives", "key_concepts")
+
+
+def valid_items(items: Any, model: Any) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Returns:
+        (items that validate against the model, number of items dropped)
+    """
+    if not isinstance(items, list):
+        return [], 0
+    valid = []
+    for item in items:
+        try:
+            valid.append(model.model_validate(item).model_dump())
+        except (ValidationError, TypeError):
+            continue
+    return valid, len(items) - len(valid)
+
+
+def salvage_study_plan(data: Any,
+                       topic: str,
+                       duration_weeks: int,
+                       include_goals: bool = False,
+                       dropped_items: int = 0) -> Tuple[Dict[str, Any], List[str], List[int]]:
+    """
+    Keep the valid parts of a (possibly repaired) plan
+
+    Args:
+        data: Parsed model output
+        topic: Requested topic, used when the plan has none
+        duration_weeks: Requested duration, used to find missing trailing weeks
+        include_goals: Whether a "goals" list was requested in the plan
+        dropped_items: Milestones already dropped while parsing because they were malformed
+
+    Returns:
+        (salvaged plan, names of missing fields, weeks whose milestones are missing)
+
+    Raises:
+        ValueError: If the output is not a JSON object
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Study plan is not a JSON object")
+
+    plan: Dict[str, Any] = {"topic": data.get("topic") if isinstance(data.get("topic"), str) else topic,
+                            "duration_weeks": duration_weeks}
+    missing: List[str] = []
+    if isinstance(data.get("summary"), str) and data["summary"].strip():
+        plan["summary"] = data["summary"]
+    else:
+        missing.append("summary")
+    for field in _LIST_FIELDS:
+        values = data.get(field)
+        if isinstance(values, list) and all(isinstance(value, str) for value in values):
+            plan[field] = values
+        else:
+            missing.append(field)
+    if isinstance(data.get("recommendations"), str):
+        plan["recommendations"] = data["recommendations"]
+    if include_goals:
+        if isinstance(data.get("goals"), list) and data["goals"]:
+            plan["goals"] = [str(goal) for goal in data["goals"]]
+        else:
+            missing.append("goals")
+
+    milestones, dropped = valid_items(data.get("milestones"), MilestoneItem)
+    dropped += dropped_items
+    seen = set()
+    plan["milestones"] = []
+    for milestone in milestones:
+        if milestone["week"] not in seen:
+            seen.add(milestone["week"])
+            plan["milestones"].append(milestone)
+    # Weeks after the last complete milestone were cut off; dropped milestones left gaps before it
+    last_week = max(seen, default=0)
+    missing_weeks = [week for week in range(last_week + 1, duration_weeks + 1)]
+    if dropped:
+        missing_weeks = sorted(set(missing_weeks) | {week for week in range(1, last_week) if week not in seen})
+
+    if "resources" in data:
+        plan["resources"], _ = valid_items(data.get("resources"), ResourceItem)
+    metrics.increment("plan_repair.milestones_dropped", dropped)
+    return plan, missing, missing_weeks
+
+
+def build_completion_prompt(plan: Dict[str, Any], missing: List[str], missing_weeks: List[int]) -> str:
+    """
+    Prompt asking only for the missing parts of a partially generated plan
+    """
+    outline = "\n".join(f"- Week {milestone['week']}: {milestone['title']}" for milestone in plan["milestones"])
+    fields = []
+    if missing_weeks:
+        fields.append(f'''  "milestones": [
+    {{
+      "title": "Week N: Theme",
+      "description": "Description of what will be covered",
+      "week": N,
+      "tasks": ["Task 1", "Task 2", "Task 3"],
+      "estimated_hours": 10
+    }}
+  ]  (one milestone for each of weeks {", ".join(str(week) for week in missing_weeks)})''')
+    if "summary" in missing:
+        fields.append('  "summary": "A concise summary of what will be studied and why it\'s valuable"')
+    for field in _LIST_FIELDS + ("goals",):
+        if field in missing:
+            fields.append(f'  "{field}": ["...", "...", "..."]')
+    keys = ",\n".join(fields)
+    return f"""
+You are completing a partially generated {plan['duration_weeks']}-week study plan for the topic: {plan['topic']}.
+
+EXISTING MILESTONES:
+{outline or '- none'}
+
+Return ONLY a JSON object with these keys, continuing the existing milestones without repeating them:
+{{
+{keys}
+}}
+"""
+
+
+async def complete_study_plan(ai_service: Any,
+                              text: str,
+                              topic: str,
+                              duration_weeks: int,
+                              include_goals: bool = False,
+                              provider: str = "unknown") -> Optional[Dict[str, Any]]:
+    """
+    Parse a plan response, repairing it and regenerating only what is missing
+
+    Args:
+        ai_service: Provider used for the follow-up call
+        text: Raw model response
+        topic: Requested topic
+        duration_weeks: Requested duration in weeks
+        include_goals: Whether a "goals" list was requested in the plan
+        provider: Provider name for metrics
+
+    Returns:
+        A plan that validates against `StudyPlanResponse`, or None when nothing usable was generated
+    """
+    if not text or text.startswith("Error"):
+        return None
+    repaired = False
+    dropped_items = 0
+    try:
+        data = parse_plan(text, provider)
+    except ValueError:
+        if os.getenv("PLAN_REPAIR_ENABLED", "true").lower() not in ["true", "1", "yes"]:
+            return None
+        try:
+            data = repair_json(text)
+        except ValueError as e:
+            # A malformed milestone mid-document defeats repair; keep the fields and items around it
+            parser = IncrementalJSONParser()
+            parser.feed(text)
+            data, dropped_items = parser.partial(), parser.dropped_items
+            if not data:
+                logger.warning(f"Could not repair study plan JSON: {str(e)}")
+                metrics.increment("plan_repair.unrepairable")
+                return None
+        repaired = True
+        metrics.increment("plan_repair.repaired")
+        logger.info(f"Repaired malformed study plan JSON for topic: {topic}")
+    return await complete_parsed_plan(ai_service, data, topic, duration_weeks, include_goals, repaired, dropped_items)
+
+
+async def complete_parsed_plan(ai_service: Any,
+                               data: Any,
+                               topic: str,
+                               duration_weeks: int,
+                               include_goals: bool = False,
+                               repaired: bool = False,
+                               dropped_items: int = 0) -> Optional[Dict[str, Any]]:
+    """
+    Keep the valid parts of an already parsed plan and regenerate only what is missing
+
+    Args:
+        ai_service: Provider used for the follow-up call
+        data: Parsed model output, e.g. a streamed plan
+        topic: Requested topic
+        duration_weeks: Requested duration in weeks
+        include_goals: Whether a "goals" list was requested in the plan
+        repaired: Whether the output had to be repaired to parse
+        dropped_items: Milestones dropped while parsing because they were malformed
+
+    Returns:
+        A plan that validates against `StudyPlanResponse`, or None when nothing usable was generated
+    """
+    try:
+        plan, missing, missing_weeks = salvage_study_plan(data, topic, duration_weeks, include_goals, dropped_items)
+    except ValueError as e:
+        logger.warning(f"Could not salvage study plan: {str(e)}")
+        return None
+    if not missing and not missing_weeks:
+        return plan
+
+    logger.info(f"Study plan for {topic} is missing fields {missing} and weeks {missing_weeks}")
+    if os.getenv("PLAN_REPAIR_FOLLOWUP", "true").lower() in ["true", "1", "yes"]:
+        metrics.increment("plan_repair.followups")
+        try:
+            # Sent as a continuation of the plan call where the provider keeps its evaluated prompt
+            with follow_up():
+                response = await ai_service.generate_content(build_completion_prompt(plan, missing, missing_weeks),
+                                                             max_tokens=estimate_milestone_tokens(len(missing_weeks) + 1))
+            completion = repair_json(response)
+        except Exception as e:
+            logger.warning(f"Study plan follow-up call failed: {str(e)}")
+            completion = {}
+        _merge_completion(plan, completion, missing, missing_weeks)
+
+    if repaired and not plan["milestones"]:
+        # Nothing worth keeping survived the repair
+        return None
+    # Whatever is still missing gets a neutral default so the plan validates
+    plan.setdefault("summary", f"A {duration_weeks}-week study plan for {plan['topic']}")
+    for field in _LIST_FIELDS:
+        plan.setdefault(field, [])
+    metrics.increment("plan_repair.salvaged")
+    return plan
+
+
+def _merge_completion(plan: Dict[str, Any], completion: Any,
+                      missing: List[str], missing_weeks: List[int]) -> None:
+    if not isinstance(completion, dict):
+        return
+    for field in missing:
+        value = completion.get(field)
+        if field == "summary" and isinstance(value, str) and value.strip():
+            plan["summary"] = value
+        elif isinstance(value, list) and value:
+            plan[field] = [str(item) for item in value]
+    milestones, _ = valid_items(completion.get("milestones"), MilestoneItem)
+    wanted = set(missing_weeks)
+    for milestone in milestones:
+        if milestone["week"] in wanted:
+            wanted.discard(milestone["week"])
+            plan["milestones"].append(milestone)
+    plan["milestones"].sort(key=lambda milestone: milestone["week"])
+    metrics.increment("plan_repair.weeks_regenerated", len(missing_weeks) - len(wanted))
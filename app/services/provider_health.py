@@ -0,0 +1,126 @@
+"""
+Background health probing of LLM providers for StudyplannerAI.
+While a provider's circuit breaker is not closed, its health endpoint is
+checked periodically; a healthy answer closes the breaker and a failed one
+keeps it open, so user requests keep failing fast instead of acting as probes.
+"""
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.services.http_client_registry import http_registry
+from app.utils.circuit_breaker import CLOSED, get_breaker
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+async def probe_ollama(timeout: float) -> bool:
+    host = os.getenv("OLLAMA_HOST", "http://localhost:11434").rstrip('/')
+    if not host.startswith("http"):
+        host = f"http://{host}"
+    response = await http_registry.get_client("ollama").get(f"{host}/api/tags", timeout=timeout)
+    return response.status_code == 200
+
+
+async def probe_openrouter(timeout: float) -> bool:
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key:
+        return False
+    response = await http_registry.get_client("openrouter").get(
+        "https://openrouter.ai/api/v1/models",
+        headers={"Authorization": f"Bearer {api_key}"},
+        timeout=timeout
+    )
+    return response.status_code == 200
+
+
+async def probe_gemini(timeout: float) -> bool:
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        return False
+    response = await http_registry.get_client("gemini").get(
+        "https://generativelanguage.googleapis.com/v1beta/models",
+        params={"key": api_key, "pageSize": 1},
+        timeout=timeout
+    )
+    return response.status_code == 200
+
+
+PROBES: Dict[str, Callable[[float], Awaitable[bool]]] = {
+    "ollama": probe_ollama,
+    "openrouter": probe_openrouter,
+    "gemini": probe_gemini,
+}
+
+
+def configured_providers() -> List[str]:
+    """
+    Providers the application may call, given AI_PROVIDER (and ROUTER_PROVIDERS for the router)
+    """
+    ai_provider = os.getenv("AI_PROVIDER", "ollama").lower()
+    if ai_provider == "router":
+        names = [name.strip().lower() for name in os.getenv("ROUTER_PROVIDERS", "ollama,openrouter,gemini").split(",")]
+    else:
+        names = [ai_provider if ai_provider in PROBES else "ollama"]
+    return [name for name in names if name in PROBES]
+
+
+class ProviderHealthProber:
+    """
+    Periodically probes providers whose breaker is open or half-open
+    """
+
+    def __init__(self,
+                 providers: Optional[List[str]] = None,
+                 interval: Optional[float] = None,
+                 timeout: Optional[float] = None,
+                 probes: Optional[Dict[str, Callable[[float], Awaitable[bool]]]] = None):
+        self.providers = providers if providers is not None else configured_providers()
+        self.interval = interval if interval is not None else float(os.getenv("BREAKER_PROBE_INTERVAL", "10"))
+        self.timeout = timeout if timeout is not None else float(os.getenv("BREAKER_PROBE_TIMEOUT", "5"))
+        self.probes = probes if probes is not None else PROBES
+        self._task: Optional[asyncio.Task] = None
+        for name in self.providers:
+            # Register every breaker up front so /health lists all providers
+            get_breaker(name)
+
+    async def probe_once(self) -> None:
+        """
+        Probe every provider whose breaker is not closed, closing or re-opening it
+        """
+        for name in self.providers:
+            breaker = get_breaker(name)
+            if breaker.state == CLOSED:
+                continue
+            try:
+                healthy = await self.probes[name](self.timeout)
+            except Exception as e:
+                logger.info(f"Health probe for {name} failed: {str(e)}")
+                healthy = False
+            metrics.increment(f"circuit_breaker.{name}.probes")
+            if healthy:
+                logger.info(f"Health probe for {name} succeeded, closing its circuit breaker")
+                breaker.record_success()
+            else:
+                breaker.trip()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.probe_once()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Started provider health probes for: {', '.join(self.providers)} (interval {self.interval}s)")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
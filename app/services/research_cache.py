@@ -0,0 +1,209 @@
+"""
+Persistent research cache for StudyplannerAI.
+Stores research results in SQLite so they survive restarts and are shared by
+every uvicorn worker on the host.
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple
+
+from app.utils.metrics import metrics
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cache lookup outcomes
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+class ResearchCache:
+    """
+    Disk-backed TTL/LRU cache of research results keyed by normalized topic
+    """
+
+    def __init__(self,
+                 data_dir: str = "data",
+                 ttl: Optional[float] = None,
+                 stale_ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        self.data_dir = data_dir
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.db_path = os.path.join(self.data_dir, "research_cache.sqlite3")
+        # Entries younger than `ttl` are fresh; until `ttl + stale_ttl` they are served stale and refreshed
+        self.ttl = ttl if ttl is not None else float(os.getenv("RESEARCH_CACHE_TTL", "21600"))
+        self.stale_ttl = stale_ttl if stale_ttl is not None else float(os.getenv("RESEARCH_CACHE_STALE_TTL", "86400"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("RESEARCH_CACHE_MAX_ENTRIES", "500"))
+        self.refresh_claim_seconds = 60.0
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10.0)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self) -> None:
+        with self._connect() as conn:
+            # WAL lets readers in other workers proceed while one worker writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS research_cache (
+                    key TEXT PRIMARY KEY,
+                    topic TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL,
+                    refresh_started REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_research_cache_accessed ON research_cache (last_accessed)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS research_cache_counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+
+    @staticmethod
+    def normalize_key(topic: str, depth: int) -> str:
+        """
+        Build the cache key for a topic: lowercase, punctuation stripped, whitespace collapsed
+        """
+        normalized = re.sub(r"[^\w\s]", " ", topic.lower())
+        normalized = " ".join(normalized.split())
+        return f"{normalized}|{depth}"
+
+    def _count(self, conn: sqlite3.Connection, name: str) -> None:
+        conn.execute(
+            "INSERT INTO research_cache_counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+        metrics.increment(f"research_cache.{name}")
+
+    def get(self, topic: str, depth: int) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Look up research results for a topic
+
+        Returns:
+            Tuple of (cached data or None, one of "fresh", "stale" or "miss")
+        """
+        key = self.normalize_key(topic, depth)
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data, created_at FROM research_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._count(conn, "misses")
+                return None, MISS
+
+            data, created_at = row
+            age = now - created_at
+            if age > self.ttl + self.stale_ttl:
+                conn.execute("DELETE FROM research_cache WHERE key = ?", (key,))
+                self._count(conn, "misses")
+                return None, MISS
+
+            conn.execute("UPDATE research_cache SET last_accessed = ? WHERE key = ?", (now, key))
+            if age > self.ttl:
+                self._count(conn, "stale_hits")
+                return json.loads(data), STALE
+
+            self._count(conn, "hits")
+            return json.loads(data), FRESH
+
+    def claim_refresh(self, topic: str, depth: int) -> bool:
+        """
+        Mark a stale entry as being refreshed so only one worker revalidates it
+
+        Returns:
+            True if the caller should perform the refresh
+        """
+        key = self.normalize_key(topic, depth)
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE research_cache SET refresh_started = ? "
+                "WHERE key = ? AND (refresh_started IS NULL OR refresh_started < ?)",
+                (now, key, now - self.refresh_claim_seconds)
+            )
+            return cursor.rowcount == 1
+
+    def set(self, topic: str, depth: int, data: Dict[str, Any]) -> None:
+        """
+        Store research results and evict least recently used entries beyond the size bound
+        """
+        key = self.normalize_key(topic, depth)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO research_cache (key, topic, data, created_at, last_accessed, refresh_started) "
+                "VALUES (?, ?, ?, ?, ?, NULL)",
+                (key, topic, json.dumps(data), now, now)
+            )
+            cursor = conn.execute(
+                "DELETE FROM research_cache WHERE key IN ("
+                "SELECT key FROM research_cache ORDER BY last_accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            if cursor.rowcount > 0:
+                logger.info(f"Evicted {cursor.rowcount} least recently used research cache entries")
+
+    def purge(self) -> int:
+        """
+        Remove every cached entry
+
+        Returns:
+            Number of entries removed
+        """
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM research_cache")
+            removed = cursor.rowcount
+        logger.info(f"Purged {removed} research cache entries")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss/staleness counters shared by all workers
+        """
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM research_cache_counters").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM research_cache").fetchone()[0]
+        lookups = counters.get("hits", 0) + counters.get("stale_hits", 0) + counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "stale_ttl_seconds": self.stale_ttl,
+            "hits": counters.get("hits", 0),
+            "stale_hits": counters.get("stale_hits", 0),
+            "misses": counters.get("misses", 0),
+            "hit_rate": (counters.get("hits", 0) + counters.get("stale_hits", 0)) / lookups if lookups else 0.0
+        }
+
+
+_research_cache: Optional[ResearchCache] = None
+
+
+def get_research_cache() -> Optional[ResearchCache]:
+    """
+    Get the shared research cache, or None when caching is disabled
+    """
+    global _research_cache
+    if os.getenv("RESEARCH_CACHE_ENABLED", "true").lower() not in ["true", "1", "yes"]:
+        return None
+    if _research_cache is None:
+        _research_cache = ResearchCache(data_dir=os.getenv("DATA_DIR", "data"))
+    return _research_cache
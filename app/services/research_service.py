@@ -1,66 +1,213 @@
 import os
-import httpx
+import time
 import asyncio
-from typing import List, Dict, Any, Optional
-from bs4 import BeautifulSoup
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlparse
 import logging
 
+from app.services.http_client_registry import http_registry
+from app.services.research_cache import ResearchCache, get_research_cache, FRESH, STALE
+from app.services.page_cache import PageContentCache, get_page_cache
+from app.services.local_index import LocalSearchIndex, get_local_index
+from app.utils.dedup import near_duplicate_mask
+from app.utils.html_parsing import run_parser, extract_page_text, parse_search_results
+from app.utils.metrics import metrics
+from app.utils.single_flight import SingleFlight
+from app.utils.text_extraction import extract_key_concepts, find_related_topics
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Background stale-while-revalidate refreshes (kept referenced until they finish)
+_refresh_tasks = set()
+
+# Concurrent research for the same topic shares one live run
+_research_flights = SingleFlight("research")
+
+# "local" answers from the local index only, "web" always searches the web, and
+# "hybrid" uses the local index unless it has too few matching pages
+RESEARCH_MODES = ("local", "web", "hybrid")
+
 class ResearchService:
     """
     Service for researching topics online and extracting relevant information
     """
     
-    def __init__(self):
+    def __init__(self,
+                 cache: Optional[ResearchCache] = None,
+                 page_cache: Optional[PageContentCache] = None,
+                 local_index: Optional[LocalSearchIndex] = None):
+        self.cache = cache if cache is not None else get_research_cache()
+        self.page_cache = page_cache if page_cache is not None else get_page_cache()
+        self.local_index = local_index if local_index is not None else get_local_index()
         self.search_url = "https://duckduckgo.com/html/"
         self.user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+        # Bounds for the concurrent page fetch fan-out
+        self.max_concurrency = max(1, int(os.getenv("RESEARCH_MAX_CONCURRENCY", "5")))
+        self.per_host_limit = max(1, int(os.getenv("RESEARCH_PER_HOST_LIMIT", "2")))
+        # Limits for individual page downloads and the text kept from them
+        self.max_page_bytes = int(os.getenv("RESEARCH_MAX_PAGE_BYTES", str(512 * 1024)))
+        self.max_text_chars = int(os.getenv("RESEARCH_MAX_TEXT_CHARS", "5000"))
+        self.allowed_content_types = ("text/html", "application/xhtml+xml")
+        # Overall deadline for one research run (search plus page fetches)
+        self.time_budget = float(os.getenv("RESEARCH_TIME_BUDGET", "3.0"))
+        # Near-duplicate sources at or above this SimHash similarity are dropped and backfilled
+        self.dedup_threshold = float(os.getenv("RESEARCH_DEDUP_THRESHOLD", "0.85"))
+        self.backfill_results = int(os.getenv("RESEARCH_BACKFILL_RESULTS", "3"))
+        # Where research comes from, and how many local matches make hybrid mode skip the web
+        self.research_mode = os.getenv("RESEARCH_MODE", "web").lower()
+        self.local_min_results = max(1, int(os.getenv("RESEARCH_LOCAL_MIN_RESULTS", "3")))
     
-    async def research_topic(self, topic: str, depth: int = 3) -> Dict[str, Any]:
+    async def research_topic(self,
+                             topic: str,
+                             depth: int = 3,
+                             time_budget: Optional[float] = None,
+                             mode: Optional[str] = None) -> Dict[str, Any]:
         """
         Research a topic by searching the web and extracting relevant information
         
         Args:
             topic: The topic to research
-            depth: How many search results to analyze (1-5)
-            
+            depth: How many search results to analyze (1-5), three sources per level
+            time_budget: Seconds allowed for the research; defaults to RESEARCH_TIME_BUDGET.
+                When it runs out, the sources fetched so far are returned.
+            mode: "local", "web" or "hybrid"; defaults to RESEARCH_MODE
+        
         Returns:
             Dictionary containing research results
         """
+        mode = (mode or self.research_mode).lower()
+        if mode not in RESEARCH_MODES:
+            raise ValueError(f"Unknown research mode: {mode}")
+        if mode != "web":
+            local_data = await self._research_local(topic, depth)
+            if mode == "local" or local_data['research_completeness']['complete']:
+                return local_data
+            metrics.increment("research.local.fallback")
+            logger.info(f"Local index has too few matches for {topic}, falling back to the web")
+        
+        if self.cache is not None:
+            try:
+                # The cache is SQLite with a busy timeout, so it is queried off the event loop
+                cached, status = await asyncio.to_thread(self.cache.get, topic, depth)
+                if status == FRESH:
+                    logger.info(f"Research cache hit for topic: {topic}")
+                    return cached
+                if status == STALE:
+                    logger.info(f"Serving stale research for topic: {topic}, refreshing in background")
+                    await self._schedule_refresh(topic, depth)
+                    return cached
+            except Exception as e:
+                logger.error(f"Research cache lookup failed for {topic}: {str(e)}")
+        
+        async def research_and_store():
+            research_data = await self._research_live(topic, depth, time_budget)
+            await self._store_in_cache(topic, depth, research_data)
+            return research_data
+        
+        return await _research_flights.do(ResearchCache.normalize_key(topic, depth), research_and_store)
+    
+    async def _schedule_refresh(self, topic: str, depth: int) -> None:
+        """
+        Refresh a stale cache entry in the background, unless another worker already is
+        """
+        if not await asyncio.to_thread(self.cache.claim_refresh, topic, depth):
+            return
+        
+        async def refresh():
+            research_data = await self._research_live(topic, depth)
+            await self._store_in_cache(topic, depth, research_data)
+        
+        task = asyncio.create_task(refresh())
+        _refresh_tasks.add(task)
+        task.add_done_callback(_refresh_tasks.discard)
+    
+    async def _store_in_cache(self, topic: str, depth: int, research_data: Dict[str, Any]) -> None:
+        # Empty results usually mean the search failed, and partial results ran out of
+        # time budget; don't pin either in the cache
+        if self.cache is None or not research_data.get('sources'):
+            return
+        if not research_data.get('research_completeness', {}).get('complete', True):
+            return
+        try:
+            await asyncio.to_thread(self.cache.set, topic, depth, research_data)
+        except Exception as e:
+            logger.error(f"Failed to store research for {topic} in cache: {str(e)}")
+    
+    async def _research_live(self, topic: str, depth: int, time_budget: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Research a topic against the live web, bypassing the cache
+        """
         logger.info(f"Researching topic: {topic}")
+        budget = self.time_budget if time_budget is None else time_budget
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + budget
+        max_sources = max(1, min(depth, 5)) * 3
         
         try:
-            # Search for the topic
-            search_results = await self._search_web(topic, max_results=depth*3)
+            # Search for the topic, with a few extra results to backfill dropped duplicates
+            search_timed_out = False
+            try:
+                search_results = await asyncio.wait_for(
+                    self._search_web(topic, max_results=max_sources + self.backfill_results),
+                    timeout=max(0.0, deadline - loop.time())
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"Search for {topic} exceeded the {budget}s research budget")
+                search_results = []
+                search_timed_out = True
             
-            # Extract content from top results
-            content_results = []
-            for result in search_results[:depth*3]:
-                if result.get('url'):
-                    try:
-                        content = await self._extract_page_content(result['url'])
-                        if content:
-                            content_results.append({
-                                'title': result.get('title', 'Unknown Title'),
-                                'url': result['url'],
-                                'summary': content[:1000],  # Truncate long content
-                                'source': result.get('source', 'web')
-                            })
-                    except Exception as e:
-                        logger.error(f"Error extracting content from {result['url']}: {str(e)}")
+            # Extract content from top results concurrently, keeping search-rank order
+            content_results, fetch_stats = await self._fetch_sources(
+                search_results[:max_sources],
+                timeout=max(0.0, deadline - loop.time())
+            )
+            requested = min(len(search_results), max_sources)
+            
+            # Drop near-duplicates and backfill from lower-ranked results while time remains
+            content_results, duplicates = self._deduplicate_sources(content_results)
+            backfill_needed = duplicates
+            next_index = max_sources
+            while backfill_needed > 0 and next_index < len(search_results) and deadline > loop.time():
+                batch = search_results[next_index:next_index + backfill_needed]
+                next_index += len(batch)
+                requested += len(batch)
+                more, more_stats = await self._fetch_sources(batch, timeout=max(0.0, deadline - loop.time()))
+                fetch_stats = self._merge_fetch_stats(fetch_stats, more_stats)
+                merged, dropped = self._deduplicate_sources(content_results + more)
+                duplicates += dropped
+                backfill_needed -= len(merged) - len(content_results)
+                content_results = merged
+            fetch_stats['duplicates_dropped'] = duplicates
+            
+            completeness = {
+                'mode': 'web',
+                'budget_seconds': budget,
+                'elapsed_seconds': round(budget - max(0.0, deadline - loop.time()), 3),
+                'sources_requested': requested,
+                'sources_fetched': len(content_results),
+                'sources_cancelled': fetch_stats['pages_cancelled'],
+                'search_timed_out': search_timed_out,
+                'ratio': round((requested - fetch_stats['pages_cancelled']) / requested, 3) if requested else 0.0,
+                'complete': not search_timed_out and fetch_stats['pages_cancelled'] == 0
+            }
+            if not completeness['complete']:
+                metrics.increment("research.budget_exhausted")
+                logger.info(f"Research budget exhausted for {topic}: {completeness}")
             
             # Compile research data
             research_data = {
                 'topic': topic,
                 'sources': content_results,
                 'key_concepts': await self._extract_key_concepts(content_results),
-                'related_topics': await self._find_related_topics(topic, search_results)
+                'related_topics': await self._find_related_topics(topic, search_results),
+                'fetch_stats': fetch_stats,
+                'research_completeness': completeness
             }
             
             return research_data
-            
+        
         except Exception as e:
             logger.error(f"Error researching topic {topic}: {str(e)}")
             # Return minimal fallback data
@@ -71,6 +218,167 @@ class ResearchService:
                 'related_topics': []
             }
     
+    async def _research_local(self, topic: str, depth: int) -> Dict[str, Any]:
+        """
+        Research a topic from the local index of previously fetched pages
+        
+        Only pages containing every term of the topic count as matches; the
+        result is complete when at least `local_min_results` of them are found.
+        """
+        started = time.perf_counter()
+        max_sources = max(1, min(depth, 5)) * 3
+        hits = []
+        if self.local_index is not None:
+            try:
+                hits = await asyncio.to_thread(self.local_index.search, topic, limit=max_sources)
+            except Exception as e:
+                logger.error(f"Local index search failed for {topic}: {str(e)}")
+        matches = [hit for hit in hits if hit['coverage'] == 1.0]
+        
+        sources, duplicates = self._deduplicate_sources([
+            {
+                'title': hit['title'],
+                'url': hit['url'],
+                'summary': hit['content'][:1000],
+                'source': hit['source']
+            }
+            for hit in matches
+        ])
+        elapsed = time.perf_counter() - started
+        completeness = {
+            'mode': 'local',
+            'elapsed_seconds': round(elapsed, 3),
+            'sources_requested': max_sources,
+            'sources_fetched': len(sources),
+            'local_hits': len(hits),
+            'ratio': round(len(sources) / max_sources, 3),
+            'complete': len(sources) >= min(self.local_min_results, max_sources)
+        }
+        metrics.observe("research.local.seconds", elapsed)
+        metrics.increment("research.local.answered" if completeness['complete'] else "research.local.insufficient")
+        logger.info(f"Local index returned {len(sources)} sources for {topic} in {elapsed * 1000:.1f}ms")
+        
+        return {
+            'topic': topic,
+            'sources': sources,
+            'key_concepts': await self._extract_key_concepts(sources),
+            'related_topics': await self._find_related_topics(topic, matches),
+            'fetch_stats': {'duplicates_dropped': duplicates},
+            'research_completeness': completeness
+        }
+    
+    def _deduplicate_sources(self, sources: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Remove mirrors and near-identical copies, keeping the highest-ranked version
+        
+        Returns:
+            Tuple of (unique sources in rank order, number of sources dropped)
+        """
+        if len(sources) < 2:
+            return sources, 0
+        
+        keep, _ = near_duplicate_mask([source.get('summary', '') for source in sources], self.dedup_threshold)
+        seen_urls = set()
+        unique = []
+        for source, is_unique in zip(sources, keep):
+            parsed = urlparse(source.get('url', ''))
+            url_key = (parsed.netloc.lower().removeprefix('www.'), parsed.path.rstrip('/'), parsed.query)
+            if is_unique and url_key not in seen_urls:
+                unique.append(source)
+            seen_urls.add(url_key)
+        
+        dropped = len(sources) - len(unique)
+        if dropped:
+            metrics.increment("research.dedup.dropped", dropped)
+            logger.info(f"Dropped {dropped} near-duplicate sources")
+        return unique, dropped
+    
+    @staticmethod
+    def _merge_fetch_stats(first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+        merged = dict(first)
+        for key, value in second.items():
+            if isinstance(value, (int, float)):
+                merged[key] = round(merged.get(key, 0) + value, 3)
+        return merged
+    
+    async def _fetch_sources(self,
+                             search_results: List[Dict[str, str]],
+                             timeout: Optional[float] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Fetch the content of several search results concurrently
+        
+        Concurrency is bounded globally by `max_concurrency` and per host by
+        `per_host_limit`. Results are returned in the original search-rank order.
+        Fetches still running after `timeout` seconds are cancelled and dropped.
+        
+        Returns:
+            Tuple of (content results, fetch statistics)
+        """
+        global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        durations: List[float] = []
+        byte_stats = {'bytes_downloaded': 0, 'bytes_skipped': 0}
+        
+        async def fetch(result: Dict[str, str]) -> Optional[Dict[str, Any]]:
+            url = result.get('url')
+            if not url:
+                return None
+            host = urlparse(url).netloc.lower()
+            host_semaphore = host_semaphores.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+            async with host_semaphore:
+                async with global_semaphore:
+                    started = time.perf_counter()
+                    try:
+                        content = await self._extract_page_content(url, stats=byte_stats)
+                    except Exception as e:
+                        logger.error(f"Error extracting content from {url}: {str(e)}")
+                        content = None
+                    finally:
+                        durations.append(time.perf_counter() - started)
+            if not content:
+                return None
+            await self._index_page(url, result.get('title', 'Unknown Title'), content, result.get('source'))
+            return {
+                'title': result.get('title', 'Unknown Title'),
+                'url': url,
+                'summary': content[:1000],  # Truncate long content
+                'source': result.get('source', 'web')
+            }
+        
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(fetch(result)) for result in search_results]
+        pages_cancelled = 0
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            pages_cancelled = len(pending)
+        fetched = [task.result() if not task.cancelled() and task.exception() is None else None for task in tasks]
+        wall_clock = time.perf_counter() - started
+        
+        # Time a one-by-one fetch would have taken is the sum of the individual fetches
+        sequential_estimate = sum(durations)
+        time_saved = max(0.0, sequential_estimate - wall_clock)
+        fetch_stats = {
+            'pages_attempted': len(durations),
+            'pages_fetched': sum(1 for item in fetched if item),
+            'pages_cancelled': pages_cancelled,
+            'wall_clock_seconds': round(wall_clock, 3),
+            'sequential_estimate_seconds': round(sequential_estimate, 3),
+            'time_saved_seconds': round(time_saved, 3),
+            'bytes_downloaded': byte_stats['bytes_downloaded'],
+            'bytes_skipped': byte_stats['bytes_skipped']
+        }
+        metrics.observe("research.fetch.wall_clock_seconds", wall_clock)
+        metrics.observe("research.fetch.time_saved_seconds", time_saved)
+        metrics.increment("research.fetch.bytes_downloaded", byte_stats['bytes_downloaded'])
+        metrics.increment("research.fetch.bytes_skipped", byte_stats['bytes_skipped'])
+        logger.info(f"Fetched {fetch_stats['pages_fetched']}/{fetch_stats['pages_attempted']} pages in {wall_clock:.2f}s "
+                    f"(sequential estimate {sequential_estimate:.2f}s, saved {time_saved:.2f}s)")
+        
+        return [item for item in fetched if item], fetch_stats
+    
     async def _search_web(self, query: str, max_results: int = 10) -> List[Dict[str, str]]:
         """
         Perform a web search using DuckDuckGo
@@ -85,161 +393,159 @@ class ResearchService:
                 't': 'h_'
             }
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.search_url,
-                    data=search_params,
-                    headers={'User-Agent': self.user_agent}
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"Error with search request: {response.status_code}")
-                    return results
-                
-                # Parse search results
-                soup = BeautifulSoup(response.text, 'html.parser')
-                result_elements = soup.select('.result')
-                
-                for i, result in enumerate(result_elements):
-                    if i >= max_results:
-                        break
-                        
-                    title_element = result.select_one('.result__title')
-                    url_element = result.select_one('.result__url')
-                    snippet_element = result.select_one('.result__snippet')
-                    
-                    title = title_element.get_text().strip() if title_element else "Unknown Title"
-                    
-                    # Extract URL from href attribute
-                    url = None
-                    if title_element and title_element.select_one('a'):
-                        url_href = title_element.select_one('a').get('href', '')
-                        # Some DDG results have redirect URLs, extract the actual URL
-                        if 'duckduckgo.com/l/?' in url_href:
-                            # Extract the actual URL from redirect parameter
-                            from urllib.parse import urlparse, parse_qs
-                            parsed_url = urlparse(url_href)
-                            url_params = parse_qs(parsed_url.query)
-                            if 'uddg' in url_params:
-                                url = url_params['uddg'][0]
-                        else:
-                            url = url_href
-                    
-                    snippet = snippet_element.get_text().strip() if snippet_element else ""
-                    source = url_element.get_text().strip() if url_element else "Unknown Source"
-                    
-                    if url:  # Only add if we have a valid URL
-                        results.append({
-                            'title': title,
-                            'url': url,
-                            'snippet': snippet,
-                            'source': source
-                        })
-                        
-            return results
+            client = http_registry.get_client("search")
+            response = await client.post(
+                self.search_url,
+                data=search_params,
+                headers={'User-Agent': self.user_agent},
+                timeout=30.0
+            )
+            
+            if response.status_code != 200:
+                logger.error(f"Error with search request: {response.status_code}")
+                return results
+            
+            # Parse search results off the event loop
+            results = await run_parser(parse_search_results, response.text, max_results)
             
+            return results
+        
         except Exception as e:
             logger.error(f"Error during web search: {str(e)}")
             return results
     
-    async def _extract_page_content(self, url: str) -> Optional[str]:
+    async def _extract_page_content(self, url: str, stats: Optional[Dict[str, int]] = None) -> Optional[str]:
         """
         Extract the main content from a web page
+        
+        The body is streamed and reading stops at `max_page_bytes`; non-HTML
+        responses are rejected from their headers before any body is read.
+        
+        Args:
+            url: The page to fetch
+            stats: Optional dict whose 'bytes_downloaded'/'bytes_skipped' counters are updated
         """
+        if stats is None:
+            stats = {'bytes_downloaded': 0, 'bytes_skipped': 0}
+        
         try:
-            async with httpx.AsyncClient(timeout=20.0) as client:
-                response = await client.get(
-                    url, 
-                    headers={'User-Agent': self.user_agent},
-                    follow_redirects=True
-                )
+            cached = await self._get_cached_page(url)
+            headers = {'User-Agent': self.user_agent}
+            if self.page_cache is not None:
+                headers.update(self.page_cache.conditional_headers(cached))
+            
+            client = http_registry.get_client("pages")
+            async with client.stream(
+                "GET",
+                url, 
+                headers=headers,
+                follow_redirects=True,
+                timeout=20.0
+            ) as response:
+                # Unchanged since we cached it: skip the download and the parse
+                if response.status_code == 304 and cached:
+                    await self._touch_page(url)
+                    return cached['content']
                 
                 if response.status_code != 200:
                     return None
                 
-                # Parse the HTML
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Remove script and style elements
-                for script in soup(["script", "style", "nav", "footer", "header", "aside"]):
-                    script.extract()
-                
-                # Get the main text content
-                text = soup.get_text(separator='\n')
-                
-                # Clean up whitespace
-                lines = (line.strip() for line in text.splitlines())
-                chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                text = '\n'.join(chunk for chunk in chunks if chunk)
+                content_length = self._content_length(response)
+                content_type = response.headers.get('content-type', '').split(';')[0].strip().lower()
+                if content_type and content_type not in self.allowed_content_types:
+                    logger.info(f"Skipping {url}: unsupported content type {content_type}")
+                    stats['bytes_skipped'] += content_length or 0
+                    return None
                 
-                return text
+                body = bytearray()
+                truncated = False
+                async for chunk in response.aiter_bytes():
+                    body.extend(chunk)
+                    if len(body) >= self.max_page_bytes:
+                        truncated = True
+                        break
+                stats['bytes_downloaded'] += response.num_bytes_downloaded
+                if truncated:
+                    del body[self.max_page_bytes:]
+                    if content_length:
+                        stats['bytes_skipped'] += max(0, content_length - response.num_bytes_downloaded)
+                    logger.info(f"Stopped reading {url} after {self.max_page_bytes} bytes")
                 
+                html = bytes(body).decode(response.encoding or 'utf-8', errors='replace')
+            
+            # Parse the HTML and clean up its text off the event loop
+            text = await run_parser(extract_page_text, html, self.max_text_chars)
+            
+            await self._store_page(url, text, response, refetched=cached is not None)
+            return text
+        
         except Exception as e:
             logger.error(f"Error extracting content from {url}: {str(e)}")
             return None
     
+    @staticmethod
+    def _content_length(response: Any) -> Optional[int]:
+        try:
+            return int(response.headers.get('content-length', ''))
+        except ValueError:
+            return None
+    
+    async def _get_cached_page(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a page in the page cache; its SQLite calls run off the event loop
+        """
+        if self.page_cache is None:
+            return None
+        try:
+            return await asyncio.to_thread(self.page_cache.get, url)
+        except Exception as e:
+            logger.error(f"Page cache lookup failed for {url}: {str(e)}")
+            return None
+    
+    async def _touch_page(self, url: str) -> None:
+        try:
+            await asyncio.to_thread(self.page_cache.touch, url)
+        except Exception as e:
+            logger.error(f"Page cache update failed for {url}: {str(e)}")
+    
+    async def _store_page(self, url: str, text: str, response: Any, refetched: bool = False) -> None:
+        if self.page_cache is None or not text:
+            return
+        try:
+            await asyncio.to_thread(
+                self.page_cache.set,
+                url,
+                text,
+                etag=response.headers.get('etag'),
+                last_modified=response.headers.get('last-modified')
+            )
+            if refetched:
+                metrics.increment("page_cache.refetched")
+        except Exception as e:
+            logger.error(f"Failed to store {url} in page cache: {str(e)}")
+    
+    async def _index_page(self, url: str, title: str, content: str, source: Optional[str]) -> None:
+        """
+        Add a fetched page to the local index, off the event loop
+        """
+        if self.local_index is None:
+            return
+        try:
+            await asyncio.to_thread(self.local_index.add_document, url, title, content, source)
+        except Exception as e:
+            logger.error(f"Failed to index {url}: {str(e)}")
+    
     async def _extract_key_concepts(self, content_results: List[Dict[str, Any]]) -> List[str]:
         """
-        Extract key concepts from the research content
-        This is a basic implementation - in a real app, this would use NLP techniques
+        Extract key concepts from the research content, ranked by relevance
         """
-        # Placeholder implementation - in a real app this would use more sophisticated NLP
-        key_concepts = set()
-        
-        for result in content_results:
-            summary = result.get('summary', '')
-            # Extract phrases that appear to be key concepts (simple implementation)
-            if summary:
-                # Split into sentences and look for definitional phrases
-                sentences = summary.split('.')
-                for sentence in sentences:
-                    if any(phrase in sentence.lower() for phrase in [
-                        ' is ', ' are ', ' refers to ', ' defined as ', ' means ', 
-                        ' consists of ', ' includes '
-                    ]):
-                        # Clean up and add the concept
-                        concept = sentence.strip()
-                        if 30 < len(concept) < 200 and concept not in key_concepts:
-                            key_concepts.add(concept)
-        
-        # Return top concepts, ordered by length (shorter is usually better)
-        return sorted(list(key_concepts), key=len)[:10]
+        return extract_key_concepts(result.get('summary', '') for result in content_results)
     
     async def _find_related_topics(self, main_topic: str, search_results: List[Dict[str, str]]) -> List[str]:
         """
-        Extract related topics from search results
+        Extract related topics from search results, ranked by relevance
         """
-        related_topics = set()
-        main_words = set(main_topic.lower().split())
-        
-        for result in search_results:
-            title = result.get('title', '')
-            snippet = result.get('snippet', '')
-            
-            # Process title for potential related topics
-            title_words = title.split()
-            for i in range(len(title_words)-1):
-                if i < len(title_words) - 2:
-                    phrase = f"{title_words[i]} {title_words[i+1]} {title_words[i+2]}"
-                    if phrase.lower() not in main_topic.lower() and all(word.lower() not in main_words for word in phrase.split()):
-                        related_topics.add(phrase)
-                
-                phrase = f"{title_words[i]} {title_words[i+1]}"
-                if phrase.lower() not in main_topic.lower() and all(word.lower() not in main_words for word in phrase.split()):
-                    related_topics.add(phrase)
-        
-        # Filter out common words and short phrases
-        filtered_topics = []
-        common_words = {'and', 'the', 'for', 'with', 'this', 'that', 'what', 'how', 'why'}
-        
-        for topic in related_topics:
-            words = topic.lower().split()
-            if (len(words) >= 2 and
-                not any(word in common_words for word in words) and
-                not all(c.isdigit() or c in '.,;:?!' for c in topic)):
-                filtered_topics.append(topic.strip('.,;:?!'))
-        
-        return filtered_topics[:5]  # Return top 5 related topics
+        return find_related_topics(main_topic, search_results, limit=5)
     
     async def get_trending_topics(self) -> List[str]:
         """
@@ -0,0 +1,343 @@
+"""
+Latency-aware routing across LLM providers for StudyplannerAI.
+RouterService has the same interface as the individual provider services. It
+scores every configured provider by EWMA latency and error rate, sends each
+call to the fastest healthy provider and fails over to the next one on error.
+Optionally, once the primary has run past its p90 latency, a hedged call goes
+to the next provider and the first valid answer wins.
+"""
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, List, Optional, AsyncIterator, Awaitable, Callable, Tuple
+
+from app.services.ollama_service import OllamaService
+from app.services.openrouter_service import OpenRouterService
+from app.services.gemini_service import GeminiService
+from app.services.plan_repair import complete_study_plan
+from app.utils.circuit_breaker import OPEN, get_breaker
+from app.utils.structured_output import study_plan_schema
+from app.utils.token_budget import DEFAULT_CONTEXT_WINDOWS, budget_study_plan_prompt
+from app.utils.metrics import metrics
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROVIDER_CLASSES = {
+    "ollama": OllamaService,
+    "openrouter": OpenRouterService,
+    "gemini": GeminiService,
+}
+
+# Latency samples needed before a provider's p90 is trusted as the hedge delay
+_MIN_P90_SAMPLES = 5
+
+
+class ProviderStats:
+    """
+    EWMA latency and error rate of one provider, plus a window of recent latencies for its p90
+
+    An unhealthy provider is ranked last and stops getting the calls that
+    would lower its error rate, so between samples the rate decays with a
+    half-life; the provider is tried again once it has cooled down.
+    """
+
+    def __init__(self, alpha: float = 0.3, window: int = 50, error_half_life: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.alpha = alpha
+        self.error_half_life = error_half_life
+        self._clock = clock
+        self.latency: Optional[float] = None
+        # EWMA as of the last sample; `current_error_rate` applies the decay since then
+        self.error_rate = 0.0
+        self.sampled_at = clock()
+        self.calls = 0
+        self.errors = 0
+        self._samples: deque = deque(maxlen=window)
+
+    def current_error_rate(self) -> float:
+        if self.error_half_life <= 0:
+            return self.error_rate
+        return self.error_rate * 0.5 ** ((self._clock() - self.sampled_at) / self.error_half_life)
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.calls += 1
+        self.error_rate = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.current_error_rate()
+        self.sampled_at = self._clock()
+        if not ok:
+            self.errors += 1
+            return
+        self.latency = latency if self.latency is None else self.alpha * latency + (1 - self.alpha) * self.latency
+        self._samples.append(latency)
+
+    def p90(self) -> Optional[float]:
+        if len(self._samples) < _MIN_P90_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[math.ceil(0.9 * len(ordered)) - 1]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "ewma_latency_seconds": round(self.latency, 4) if self.latency is not None else None,
+            "p90_latency_seconds": self.p90(),
+            "error_rate": round(self.current_error_rate(), 4),
+            "calls": self.calls,
+            "errors": self.errors
+        }
+
+
+# Provider scores outlive a single request (the router is created per request)
+_provider_stats: Dict[str, ProviderStats] = {}
+
+
+def get_provider_stats(name: str) -> ProviderStats:
+    stats = _provider_stats.get(name)
+    if stats is None:
+        stats = ProviderStats(alpha=float(os.getenv("ROUTER_EWMA_ALPHA", "0.3")),
+                              error_half_life=float(os.getenv("ROUTER_ERROR_HALF_LIFE", "60")))
+        _provider_stats[name] = stats
+    return stats
+
+
+def router_stats() -> Dict[str, Any]:
+    """
+    Return the current score of every provider the router has used
+    """
+    return {name: stats.snapshot() for name, stats in _provider_stats.items()}
+
+
+class RouterService:
+    """
+    Route each LLM call to the fastest healthy provider, with failover and optional hedging
+    """
+
+    def __init__(self, providers: Optional[Dict[str, Any]] = None):
+        if providers is None:
+            names = [name.strip().lower() for name in os.getenv("ROUTER_PROVIDERS", "ollama,openrouter,gemini").split(",")]
+            unknown = [name for name in names if name and name not in PROVIDER_CLASSES]
+            if unknown:
+                logger.warning(f"Ignoring unknown ROUTER_PROVIDERS entries: {', '.join(unknown)}")
+            providers = {name: PROVIDER_CLASSES[name]() for name in names if name in PROVIDER_CLASSES}
+        if not providers:
+            raise ValueError("RouterService needs at least one provider")
+        self.providers = providers
+        self.model = "router:" + ",".join(f"{name}/{getattr(provider, 'model', None)}" for name, provider in providers.items())
+        # A prompt has to fit whichever provider ends up serving it
+        self.context_window = min(getattr(provider, "context_window", DEFAULT_CONTEXT_WINDOWS["ollama"])
+                                  for provider in providers.values())
+        self.max_error_rate = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5"))
+        self.hedge = os.getenv("ROUTER_HEDGE", "false").lower() in ["true", "1", "yes"]
+        # Used as the hedge delay until a provider has enough samples for its p90
+        self.hedge_delay = float(os.getenv("ROUTER_HEDGE_DELAY", "10"))
+        logger.info(f"Initialized router over providers: {', '.join(providers)} (hedging: {self.hedge})")
+
+    def rank(self) -> List[str]:
+        """
+        Order providers for the next call: healthy before unhealthy, then by EWMA latency
+
+        Providers with an open circuit breaker or a high error rate are unhealthy;
+        providers without latency samples sort first so they get measured.
+        """
+        def score(name: str) -> Tuple[bool, float, float]:
+            stats = get_provider_stats(name)
+            error_rate = stats.current_error_rate()
+            return (error_rate > self.max_error_rate or get_breaker(name).state == OPEN,
+                    stats.latency if stats.latency is not None else 0.0,
+                    error_rate)
+        return sorted(self.providers, key=score)
+
+    def _hedge_after(self, name: str) -> float:
+        p90 = get_provider_stats(name).p90()
+        return p90 if p90 is not None else self.hedge_delay
+
+    async def _attempt(self, name: str, call: Callable[[Any], Awaitable[Any]],
+                       valid: Callable[[Any], bool]) -> Tuple[bool, Any]:
+        """
+        Run one call against one provider and record its latency and outcome
+
+        Returns:
+            (whether the result is valid, result or the exception raised)
+        """
+        started = time.perf_counter()
+        try:
+            result = await call(self.providers[name])
+            ok = valid(result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            result, ok = e, False
+        elapsed = time.perf_counter() - started
+        get_provider_stats(name).record(elapsed, ok)
+        metrics.observe(f"router.{name}.latency_seconds", elapsed)
+        if not ok:
+            metrics.increment(f"router.{name}.errors")
+            logger.warning(f"Provider {name} failed after {elapsed:.2f}s: {str(result)[:200]}")
+        return ok, result
+
+    async def _route(self, call: Callable[[Any], Awaitable[Any]], valid: Callable[[Any], bool]) -> Any:
+        """
+        Run a call on the best provider, hedging and failing over as configured
+
+        Returns:
+            The first valid result; if every provider fails, the last invalid result
+
+        Raises:
+            The last exception when every provider failed by raising
+        """
+        order = self.rank()
+        pending: Dict[asyncio.Task, str] = {}
+        next_index = 0
+        hedged = False
+        last_result: Any = None
+
+        def launch() -> None:
+            nonlocal next_index
+            name = order[next_index]
+            next_index += 1
+            pending[asyncio.ensure_future(self._attempt(name, call, valid))] = name
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and not hedged and next_index < len(order):
+                    timeout = self._hedge_after(order[0])
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The primary is slower than usual; race it against the next provider
+                    hedged = True
+                    metrics.increment("router.hedged")
+                    logger.info(f"Hedging {order[0]} with {order[next_index]} after {timeout:.2f}s")
+                    launch()
+                    continue
+                for task in done:
+                    name = pending.pop(task)
+                    ok, result = task.result()
+                    if ok:
+                        metrics.increment(f"router.{name}.served")
+                        if hedged and name != order[0]:
+                            metrics.increment("router.hedge_wins")
+                        return result
+                    last_result = result
+                if not pending and next_index < len(order):
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if isinstance(last_result, Exception):
+            raise last_result
+        return last_result
+
+    async def generate_content(self, prompt: str, schema: Optional[Dict[str, Any]] = None,
+                               max_tokens: Optional[int] = None) -> str:
+        """
+        Generate content on the best available provider
+
+        Args:
+            prompt: The prompt to send to the model
+            schema: JSON schema the response must follow when STRUCTURED_OUTPUT is enabled
+            max_tokens: Output token limit for this call
+
+        Returns:
+            Generated text, or an "Error: ..." string when every provider failed
+        """
+        try:
+            return await self._route(lambda provider: provider.generate_content(prompt, schema=schema, max_tokens=max_tokens),
+                                     lambda result: bool(result) and not result.startswith("Error"))
+        except Exception as e:
+            return f"Error: {str(e)}"
+
+    async def stream_content(self, prompt: str, schema: Optional[Dict[str, Any]] = None,
+                             max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Stream generated text from the best available provider
+
+        Streams are not hedged; a provider that fails before its first chunk is
+        replaced by the next one.
+        """
+        last_error: Optional[Exception] = None
+        for name in self.rank():
+            started = time.perf_counter()
+            streamed = False
+            try:
+                async for chunk in self.providers[name].stream_content(prompt, schema=schema, max_tokens=max_tokens):
+                    streamed = True
+                    yield chunk
+            except Exception as e:
+                get_provider_stats(name).record(time.perf_counter() - started, False)
+                metrics.increment(f"router.{name}.errors")
+                if streamed:
+                    raise
+                logger.warning(f"Provider {name} failed to stream, trying the next one: {str(e)}")
+                last_error = e
+                continue
+            get_provider_stats(name).record(time.perf_counter() - started, True)
+            metrics.increment(f"router.{name}.served")
+            return
+        raise last_error or RuntimeError("No provider could stream the response")
+
+    def build_study_plan_prompt(self, *args: Any, **kwargs: Any) -> str:
+        """
+        Build the study plan prompt (identical for every provider, so the first configured one builds it)
+        """
+        return next(iter(self.providers.values())).build_study_plan_prompt(*args, **kwargs)
+
+    async def create_study_plan(self,
+                                topic: str,
+                                research_data: Dict[str, Any],
+                                duration_weeks: int = 4,
+                                depth_level: int = 3,
+                                learning_style: Optional[str] = None,
+                                prior_knowledge: Optional[str] = None,
+                                generate_goals: bool = False,
+                                include_resources: bool = True) -> Dict[str, Any]:
+        """
+        Generate a complete study plan; an answer only counts once it parses (or is salvaged) as a plan
+
+        Returns:
+            Structured study plan, or the fallback template when every provider failed
+        """
+        prompt, max_tokens = budget_study_plan_prompt(
+            self, topic, research_data, duration_weeks, depth_level, learning_style, prior_knowledge,
+            include_goals=generate_goals, include_resources=include_resources
+        )
+
+        schema = study_plan_schema(generate_goals)
+
+        async def call(provider: Any) -> Optional[Dict[str, Any]]:
+            # Repair and follow-up calls stay on the provider that produced the partial plan
+            result = await provider.generate_content(prompt, schema=schema, max_tokens=max_tokens)
+            return await complete_study_plan(provider, result, topic, duration_weeks, generate_goals, "router")
+
+        try:
+            study_plan = await self._route(call, lambda plan: isinstance(plan, dict))
+        except Exception as e:
+            logger.error(f"Every provider failed to create a study plan: {str(e)}")
+            return self._generate_fallback_plan(topic, duration_weeks)
+        if study_plan is None:
+            logger.error("No provider returned a usable study plan")
+            return self._generate_fallback_plan(topic, duration_weeks)
+        logger.info(f"Successfully parsed routed study plan for topic: {topic}")
+        return study_plan
+
+    async def generate_learning_goals(self, topic: str, duration_weeks: int, prior_knowledge: Optional[str]) -> List[str]:
+        """
+        Generate learning goals on the best available provider
+        """
+        try:
+            goals = await self._route(
+                lambda provider: provider.generate_learning_goals(topic, duration_weeks, prior_knowledge),
+                lambda result: isinstance(result, list) and len(result) > 0
+            )
+        except Exception as e:
+            logger.error(f"Every provider failed to generate learning goals: {str(e)}")
+            return []
+        return goals or []
+
+    def _generate_fallback_plan(self, topic: str, duration_weeks: int, is_disabled: bool = False) -> Dict[str, Any]:
+        return next(iter(self.providers.values()))._generate_fallback_plan(topic, duration_weeks, is_disabled)
@@ -0,0 +1,412 @@
+"""
+Semantic study plan cache for StudyplannerAI.
+Plan requests are embedded (topic plus the free-text preferences) and stored
+with the generated plan, so a request that means the same thing as an earlier
+one ("Intro to ML", "machine learning basics") is answered without research or
+generation. Vectors live in a memory-mapped float32 matrix per embedding model;
+metadata and plans live in SQLite. Duration, depth and the remaining request
+parameters must match exactly.
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from app.services.http_client_registry import http_registry
+from app.utils.circuit_breaker import CLOSED, get_breaker
+from app.utils.metrics import metrics
+from app.utils.text_extraction import ENGLISH_STOPWORDS, tokenize
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Words that describe the level of a request rather than its subject
+_GENERIC_WORDS = ENGLISH_STOPWORDS | frozenset("""
+basic basics beginner beginners beginning fundamentals fundamental primer 101 getting started
+intro introduction introductory course courses guide tutorial learn
+""".split())
+
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+
+class HashingEmbedder:
+    """
+    Offline embedder: signed feature hashing of words, word initials and character trigrams
+
+    Initials of consecutive words ("machine learning" -> "ml") are weighted up
+    so acronyms land close to their expansions; character trigrams match
+    inflections ("learn", "learning"). It only sees surface forms, so true
+    paraphrases need the Ollama embedder or a lower threshold.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[Tuple[str, float]]:
+        words = [token for token in tokenize(text) if token not in _GENERIC_WORDS]
+        features = [(f"w:{word}", 1.0) for word in words]
+        for size in (2, 3):
+            for gram in zip(*(words[i:] for i in range(size))):
+                features.append((f"w:{''.join(word[0] for word in gram)}", 2.0))
+        for word in words:
+            padded = f"^{word}$"
+            features.extend((f"c:{padded[i:i + 3]}", 0.3) for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dim] += weight if digest >> 63 else -weight
+        return _normalize(vector)
+
+
+class OllamaEmbedder:
+    """
+    Embedder backed by the Ollama embeddings API
+    """
+
+    def __init__(self, host: Optional[str] = None, model: Optional[str] = None):
+        self.host = (host or os.getenv("OLLAMA_HOST", "http://localhost:11434")).rstrip('/')
+        if not self.host.startswith("http"):
+            self.host = f"http://{self.host}"
+        self.model = model or os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+        self.name = f"ollama-{self.model}"
+        # The lookup sits in front of every plan request, so a slow embedding must not hold it up
+        self.timeout = float(os.getenv("SEMANTIC_CACHE_EMBED_TIMEOUT", "2.0"))
+
+    async def embed(self, text: str) -> np.ndarray:
+        client = http_registry.get_client("ollama")
+        response = await client.post(
+            f"{self.host}/api/embeddings",
+            json={"model": self.model, "prompt": text},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return _normalize(np.asarray(response.json()["embedding"], dtype=np.float32))
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+def describe_request(topic: str,
+                     learning_style: Optional[str] = None,
+                     prior_knowledge: Optional[str] = None,
+                     goals: Optional[List[str]] = None,
+                     additional_context: Optional[str] = None) -> str:
+    """
+    Text that is embedded for a plan request: the topic and the free-text preferences
+    """
+    parts = [topic]
+    if learning_style:
+        parts.append(f"learning style {learning_style}")
+    if prior_knowledge:
+        parts.append(f"prior knowledge {prior_knowledge}")
+    if goals:
+        parts.append("goals " + "; ".join(goals))
+    if additional_context:
+        parts.append(additional_context)
+    return ". ".join(parts)
+
+
+class SemanticPlanCache:
+    """
+    Nearest-neighbour cache of study plans over request embeddings
+    """
+
+    def __init__(self,
+                 data_dir: str = "data",
+                 threshold: Optional[float] = None,
+                 ttl: Optional[float] = None,
+                 top_k: Optional[int] = None,
+                 embedder: Optional[str] = None):
+        self.data_dir = data_dir
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.db_path = os.path.join(self.data_dir, "semantic_cache.sqlite3")
+        self.threshold = threshold if threshold is not None else float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("SEMANTIC_CACHE_TTL", "604800"))
+        self.top_k = top_k if top_k is not None else int(os.getenv("SEMANTIC_CACHE_TOP_K", "5"))
+        # Ollama embeddings only by default when Ollama is already the generation provider
+        default_embedder = "ollama" if os.getenv("AI_PROVIDER", "ollama").lower() == "ollama" else "hashing"
+        embedder = (embedder or os.getenv("SEMANTIC_CACHE_EMBEDDER", default_embedder)).lower()
+        self.hashing_embedder = HashingEmbedder(int(os.getenv("SEMANTIC_CACHE_HASH_DIM", "512")))
+        self.ollama_embedder = OllamaEmbedder() if embedder == "ollama" else None
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10.0)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self) -> None:
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS matrices (
+                    embedder TEXT PRIMARY KEY,
+                    dim INTEGER NOT NULL,
+                    rows INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS plans (
+                    embedder TEXT NOT NULL,
+                    row_index INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    duration_weeks INTEGER NOT NULL,
+                    depth_level INTEGER NOT NULL,
+                    params_key TEXT NOT NULL,
+                    plan TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (embedder, row_index)
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_plans_lookup ON plans (embedder, duration_weeks, depth_level, params_key)"
+            )
+
+    @staticmethod
+    def params_key(**params: Any) -> str:
+        """
+        Fingerprint of the request parameters that must match exactly besides duration and depth
+        """
+        return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    async def embed(self, text: str) -> Tuple[str, np.ndarray]:
+        """
+        Embed a request description
+
+        Returns:
+            (embedder name, unit vector); falls back to the hashing embedder when Ollama is unreachable
+        """
+        if self.ollama_embedder is not None:
+            if get_breaker("ollama").state != CLOSED:
+                # Ollama is known to be down; don't wait out a timeout on every request
+                metrics.increment("semantic_cache.embedding_fallbacks")
+                return self.hashing_embedder.name, self.hashing_embedder.embed(text)
+            try:
+                return self.ollama_embedder.name, await self.ollama_embedder.embed(text)
+            except Exception as e:
+                metrics.increment("semantic_cache.embedding_fallbacks")
+                logger.warning(f"Ollama embeddings unavailable, using the hashing embedder: {str(e)}")
+        return self.hashing_embedder.name, self.hashing_embedder.embed(text)
+
+    def _matrix_path(self, embedder: str) -> str:
+        return os.path.join(self.data_dir, f"semantic_vectors_{_SLUG_RE.sub('_', embedder.lower())}.f32")
+
+    def _open_matrix(self, embedder: str, dim: int, rows: int, mode: str = "r") -> np.memmap:
+        return np.memmap(self._matrix_path(embedder), dtype=np.float32, mode=mode, shape=(rows, dim))
+
+    def lookup(self,
+               embedder: str,
+               vector: np.ndarray,
+               duration_weeks: int,
+               depth_level: int,
+               params_key: str,
+               text: Optional[str] = None) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Find the most similar cached plan with the same duration, depth and parameters
+
+        Plans are also indexed under the hashing embedder, so with the request
+        `text` a miss under another embedder is retried there; that finds plans
+        stored while Ollama was unreachable.
+
+        Returns:
+            (plan, cosine similarity) if the best match reaches the threshold, otherwise None
+        """
+        match = self._lookup_matrix(embedder, vector, duration_weeks, depth_level, params_key)
+        if match is None and text is not None and embedder != self.hashing_embedder.name:
+            match = self._lookup_matrix(self.hashing_embedder.name, self.hashing_embedder.embed(text),
+                                        duration_weeks, depth_level, params_key)
+        if match is None:
+            metrics.increment("semantic_cache.misses")
+            return None
+        metrics.increment("semantic_cache.hits")
+        metrics.observe("semantic_cache.hit_similarity", match[1])
+        return match
+
+    def _lookup_matrix(self,
+                       embedder: str,
+                       vector: np.ndarray,
+                       duration_weeks: int,
+                       depth_level: int,
+                       params_key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        with self._connect() as conn:
+            matrix_row = conn.execute("SELECT dim, rows FROM matrices WHERE embedder = ?", (embedder,)).fetchone()
+            candidates = conn.execute(
+                "SELECT row_index FROM plans WHERE embedder = ? AND duration_weeks = ? AND depth_level = ? "
+                "AND params_key = ? AND expires_at > ?",
+                (embedder, duration_weeks, depth_level, params_key, time.time())
+            ).fetchall()
+        if matrix_row is None or not candidates or matrix_row[0] != len(vector):
+            return None
+
+        dim, rows = matrix_row
+        indices, similarities = self.top_k_similar(
+            self._open_matrix(embedder, dim, rows), vector, np.fromiter((row[0] for row in candidates), dtype=np.int64)
+        )
+        for index, similarity in zip(indices, similarities):
+            if similarity < self.threshold:
+                break
+            with self._connect() as conn:
+                # Re-check the filters: the row may have been reused by another plan since the scan
+                row = conn.execute(
+                    "SELECT plan FROM plans WHERE embedder = ? AND row_index = ? AND duration_weeks = ? "
+                    "AND depth_level = ? AND params_key = ? AND expires_at > ?",
+                    (embedder, int(index), duration_weeks, depth_level, params_key, time.time())
+                ).fetchone()
+            if row is not None:
+                return json.loads(row[0]), float(similarity)
+        return None
+
+    def top_k_similar(self, matrix: np.ndarray, vector: np.ndarray,
+                      rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cosine top-k over the given rows of a matrix of unit vectors
+
+        Returns:
+            (row indices, similarities), most similar first
+        """
+        similarities = np.asarray(matrix[rows]) @ vector
+        k = min(self.top_k, len(rows))
+        best = np.argpartition(-similarities, k - 1)[:k]
+        best = best[np.argsort(-similarities[best])]
+        return rows[best], similarities[best]
+
+    def store(self,
+              embedder: str,
+              vector: np.ndarray,
+              text: str,
+              duration_weeks: int,
+              depth_level: int,
+              params_key: str,
+              plan: Dict[str, Any]) -> None:
+        """
+        Store the plan a request produced under its embedder, and under the hashing embedder as well
+
+        The hashing copy keeps the plan reachable when lookups fall back to the
+        hashing embedder because Ollama is unreachable.
+        """
+        self._store_vector(embedder, vector, text, duration_weeks, depth_level, params_key, plan)
+        if embedder != self.hashing_embedder.name:
+            self._store_vector(self.hashing_embedder.name, self.hashing_embedder.embed(text), text,
+                               duration_weeks, depth_level, params_key, plan)
+        metrics.increment("semantic_cache.stored")
+
+    def _store_vector(self,
+                      embedder: str,
+                      vector: np.ndarray,
+                      text: str,
+                      duration_weeks: int,
+                      depth_level: int,
+                      params_key: str,
+                      plan: Dict[str, Any]) -> None:
+        """
+        Write a request vector to a free row of its matrix, or append one, and store the plan it produced
+        """
+        now = time.time()
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._connect() as conn:
+            # Reserve a row under the write lock so concurrent workers never share one
+            conn.execute("BEGIN IMMEDIATE")
+            matrix_row = conn.execute("SELECT dim, rows FROM matrices WHERE embedder = ?", (embedder,)).fetchone()
+            if matrix_row is not None and matrix_row[0] != len(vector):
+                raise ValueError(f"Embedding size changed for {embedder}: {matrix_row[0]} != {len(vector)}")
+            rows = matrix_row[1] if matrix_row is not None else 0
+            # Rows of expired plans are reused, so the matrix only grows with the number of live plans
+            conn.execute("DELETE FROM plans WHERE embedder = ? AND expires_at <= ?", (embedder, now))
+            row_index = conn.execute(
+                "SELECT MIN(candidate) FROM (SELECT 0 AS candidate UNION ALL "
+                "SELECT row_index + 1 FROM plans WHERE embedder = ?) "
+                "WHERE candidate NOT IN (SELECT row_index FROM plans WHERE embedder = ?)",
+                (embedder, embedder)
+            ).fetchone()[0]
+            if row_index >= rows:
+                row_index, rows = rows, rows + 1
+                with open(self._matrix_path(embedder), "ab") as handle:
+                    handle.truncate(rows * len(vector) * 4)
+            matrix = self._open_matrix(embedder, len(vector), rows, mode="r+")
+            matrix[row_index] = vector
+            matrix.flush()
+            conn.execute(
+                "INSERT OR REPLACE INTO matrices (embedder, dim, rows) VALUES (?, ?, ?)",
+                (embedder, len(vector), rows)
+            )
+            conn.execute(
+                "INSERT INTO plans (embedder, row_index, text, duration_weeks, depth_level, params_key, plan, "
+                "created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (embedder, row_index, text, duration_weeks, depth_level, params_key, json.dumps(plan),
+                 now, now + self.ttl)
+            )
+
+    def purge(self) -> int:
+        """
+        Remove every cached plan and vector matrix
+
+        Returns:
+            Number of plans removed
+        """
+        with self._connect() as conn:
+            embedders = [row[0] for row in conn.execute("SELECT embedder FROM matrices").fetchall()]
+            removed = conn.execute("DELETE FROM plans").rowcount
+            conn.execute("DELETE FROM matrices")
+        for embedder in embedders:
+            try:
+                os.remove(self._matrix_path(embedder))
+            except FileNotFoundError:
+                pass
+        logger.info(f"Purged {removed} plans from the semantic cache")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return plan counts per embedder and the hit rate
+        """
+        with self._connect() as conn:
+            matrices = conn.execute("SELECT embedder, dim, rows FROM matrices").fetchall()
+            plans = dict(conn.execute(
+                "SELECT embedder, COUNT(*) FROM plans WHERE expires_at > ? GROUP BY embedder", (time.time(),)
+            ).fetchall())
+        hits = metrics.get_counter("semantic_cache.hits")
+        misses = metrics.get_counter("semantic_cache.misses")
+        return {
+            "threshold": self.threshold,
+            "embedders": {
+                embedder: {"dim": dim, "vectors": rows, "plans": plans.get(embedder, 0)}
+                for embedder, dim, rows in matrices
+            },
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0
+        }
+
+
+_semantic_cache: Optional[SemanticPlanCache] = None
+
+
+def get_semantic_cache() -> Optional[SemanticPlanCache]:
+    """
+    Get the shared semantic plan cache, or None when it is disabled
+    """
+    global _semantic_cache
+    if os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() not in ["true", "1", "yes"]:
+        return None
+    if _semantic_cache is None:
+        _semantic_cache = SemanticPlanCache(data_dir=os.getenv("DATA_DIR", "data"))
+    return _semantic_cache
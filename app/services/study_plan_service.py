@@ -1,12 +1,48 @@
 import os
+import json
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
+from pydantic import ValidationError
+from app.models import StudyPlanResponse
 from .research_service import ResearchService
+from app.services.research_cache import ResearchCache
+from app.services.generation_cache import bypass_generation_cache
+from app.services.generation_session import generation_session
+from app.services.semantic_cache import get_semantic_cache, describe_request
+from app.services.plan_repair import complete_parsed_plan, complete_study_plan
+from app.services.chunked_generation import chunked_generation_applies, generate_chunked_plan, iter_chunked_plan
+from app.utils.extractive_summary import compress_research
+from app.utils.json_stream import IncrementalJSONParser, FIELD, ITEM
+from app.utils.single_flight import SingleFlight
+from app.utils.structured_output import study_plan_schema
+from app.utils.token_budget import budget_study_plan_prompt
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Concurrent identical plan requests share one generation
+_plan_flights = SingleFlight("study_plan")
+
+GOAL_GENERATION_MODES = ("concurrent", "inline", "sequential")
+
+
+def goal_generation_mode() -> str:
+    """
+    How learning goals are generated when requested (GOAL_GENERATION_MODE)
+    
+    "concurrent" runs the goals call alongside the plan call, "inline" asks for
+    the goals inside the plan JSON (one LLM call), and "sequential" makes the
+    goals call after the plan.
+    """
+    mode = os.getenv("GOAL_GENERATION_MODE", "concurrent").lower()
+    if mode not in GOAL_GENERATION_MODES:
+        logger.warning(f"Unknown GOAL_GENERATION_MODE '{mode}', using 'concurrent'")
+        return "concurrent"
+    return mode
+
 class StudyPlanService:
     """
     Service for generating study plans based on research data and user preferences
@@ -46,30 +82,376 @@ class StudyPlanService:
         Returns:
             Structured study plan as a dictionary
         """
+        key = self._plan_key(ai_service, topic, research_data, depth_level, duration_weeks, include_resources,
+                             learning_style, prior_knowledge, goals, generate_goals, additional_context)
+        return await _plan_flights.do(key, lambda: self._generate_plan(
+            ai_service=ai_service,
+            topic=topic,
+            research_data=research_data,
+            depth_level=depth_level,
+            duration_weeks=duration_weeks,
+            include_resources=include_resources,
+            learning_style=learning_style,
+            prior_knowledge=prior_knowledge,
+            goals=goals,
+            generate_goals=generate_goals,
+            additional_context=additional_context
+        ))
+    
+    @staticmethod
+    def _plan_key(ai_service: Any, topic: str, research_data: Dict[str, Any], *params: Any) -> str:
+        """
+        Build the coalescing key for a plan request: provider, model, normalized topic and parameters
+        """
+        source_urls = [source.get('url') for source in research_data.get('sources', [])]
+        fingerprint = json.dumps([
+            ai_service.__class__.__name__,
+            getattr(ai_service, 'model', None),
+            ResearchCache.normalize_key(topic, 0),
+            source_urls,
+            list(params)
+        ], sort_keys=True, default=str)
+        return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
+    
+    async def find_similar_plan(self,
+                                ai_service: Any,
+                                topic: str,
+                                depth_level: int,
+                                duration_weeks: int,
+                                include_resources: bool,
+                                learning_style: Optional[str],
+                                prior_knowledge: Optional[str],
+                                goals: Optional[List[str]],
+                                generate_goals: bool,
+                                additional_context: Optional[str],
+                                research_mode: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Look up a cached plan for a semantically equivalent request
+        
+        Returns:
+            (cached plan or None, lookup handle to pass to `remember_plan`, or None when the cache is off)
+        """
+        cache = get_semantic_cache()
+        if cache is None:
+            return None, None
+        try:
+            text = describe_request(topic, learning_style, prior_knowledge, goals, additional_context)
+            embedder, vector = await cache.embed(text)
+            handle = {
+                "embedder": embedder,
+                "vector": vector,
+                "text": text,
+                "duration_weeks": duration_weeks,
+                "depth_level": depth_level,
+                "params_key": cache.params_key(
+                    provider=ai_service.__class__.__name__,
+                    model=getattr(ai_service, 'model', None),
+                    include_resources=include_resources,
+                    learning_style=learning_style,
+                    prior_knowledge=prior_knowledge,
+                    generate_goals=generate_goals,
+                    research_mode=research_mode
+                )
+            }
+            # A forced fresh generation still refreshes the cache afterwards
+            if bypass_generation_cache.get():
+                return None, handle
+            # SQLite and the memory-mapped matrix are read off the event loop
+            match = await asyncio.to_thread(
+                cache.lookup, handle["embedder"], vector, duration_weeks, depth_level, handle["params_key"], text
+            )
+        except Exception as e:
+            logger.warning(f"Semantic plan cache lookup failed: {str(e)}")
+            return None, None
+        if match is None:
+            return None, handle
+        plan, similarity = match
+        logger.info(f"Serving cached study plan for topic: {topic} (similarity {similarity:.3f})")
+        plan["topic"] = topic
+        return plan, handle
+    
+    async def remember_plan(self, handle: Optional[Dict[str, Any]], study_plan: Dict[str, Any]) -> None:
+        """
+        Store a generated plan in the semantic cache; fallback, placeholder and invalid plans are never stored
+        """
+        cache = get_semantic_cache()
+        if cache is None or handle is None:
+            return
+        if not str(study_plan.get("summary", "")).startswith("[Generated using:"):
+            return
+        try:
+            # Every later similar request would be answered with it, so it has to be a valid response
+            plan = StudyPlanResponse(**study_plan).model_dump(exclude={"research_completeness"})
+        except ValidationError as e:
+            logger.warning(f"Not caching a study plan that fails validation: {str(e)}")
+            return
         try:
-            logger.info(f"Generating study plan for topic: {topic}")
-            logger.info(f"Generation parameters: depth={depth_level}, duration={duration_weeks} weeks, learning_style={learning_style}, prior_knowledge={prior_knowledge}")
+            await asyncio.to_thread(cache.store, plan=plan, **handle)
+        except Exception as e:
+            logger.warning(f"Failed to store study plan in the semantic cache: {str(e)}")
+    
+    async def _generate_plan(self,
+                             ai_service: Any,
+                             topic: str,
+                             research_data: Dict[str, Any],
+                             depth_level: int,
+                             duration_weeks: int,
+                             include_resources: bool,
+                             learning_style: Optional[str],
+                             prior_knowledge: Optional[str],
+                             goals: Optional[List[str]],
+                             generate_goals: bool,
+                             additional_context: Optional[str]) -> Dict[str, Any]:
+        """
+        Generate a study plan without coalescing (see `generate_plan`)
+        """
+        with generation_session():
+            try:
+                logger.info(f"Generating study plan for topic: {topic}")
+                logger.info(f"Generation parameters: depth={depth_level}, duration={duration_weeks} weeks, learning_style={learning_style}, prior_knowledge={prior_knowledge}")
+            
+                # Check if we're using AI or placeholders
+                use_ai = os.getenv("USE_AI_GENERATION", "true").lower() in ["true", "1", "yes"]
             
-            # Check if we're using AI or placeholders
-            use_ai = os.getenv("USE_AI_GENERATION", "true").lower() in ["true", "1", "yes"]
+                goals_mode = goal_generation_mode() if generate_goals else None
+                generated_goals = None
             
-            if use_ai:
-                logger.info(f"Attempting to generate study plan using AI service: {ai_service.__class__.__name__}")
-                study_plan = await ai_service.create_study_plan(
+                if use_ai:
+                    logger.info(f"Attempting to generate study plan using AI service: {ai_service.__class__.__name__}")
+                    # The prompt carries the most informative research sentences, not each source's first 300 characters
+                    research_data = compress_research(research_data, topic)
+                    plan_call = self._create_study_plan(
+                        ai_service=ai_service,
+                        topic=topic,
+                        research_data=research_data,
+                        duration_weeks=duration_weeks,
+                        depth_level=depth_level,
+                        learning_style=learning_style,
+                        prior_knowledge=prior_knowledge,
+                        generate_goals=goals_mode == "inline",
+                        include_resources=include_resources
+                    )
+                    if goals_mode == "concurrent":
+                        # Goals only depend on the request, so they need not wait for the plan
+                        study_plan, generated_goals = await asyncio.gather(plan_call, self.generate_learning_goals(
+                            ai_service=ai_service,
+                            topic=topic,
+                            duration_weeks=duration_weeks,
+                            prior_knowledge=prior_knowledge
+                        ))
+                    else:
+                        study_plan = await plan_call
+                    generation_method = ai_service.__class__.__name__
+                else:
+                    # Skip AI and use placeholders directly
+                    logger.warning(f"AI generation disabled by environment setting. Using PLACEHOLDER generation.")
+                    study_plan = self._create_fallback_plan(topic, duration_weeks)
+                    generation_method = "PLACEHOLDER"
+            
+                return await self._finalize_plan(
+                    study_plan=study_plan,
+                    ai_service=ai_service,
+                    generation_method=generation_method,
                     topic=topic,
-                    research_data=research_data,
                     duration_weeks=duration_weeks,
-                    depth_level=depth_level,
-                    learning_style=learning_style,
+                    include_resources=include_resources,
                     prior_knowledge=prior_knowledge,
-                    generate_goals=generate_goals
+                    goals=goals,
+                    generate_goals=generate_goals,
+                    additional_context=additional_context,
+                    generated_goals=generated_goals
                 )
+            
+            except Exception as e:
+                logger.error(f"Error generating study plan: {str(e)}")
+                # Generate a fallback study plan
+                logger.warning(f"Falling back to template-based study plan generation for topic: {topic}")
+                return self._create_fallback_plan(topic, duration_weeks)
+    
+    async def _create_study_plan(self,
+                                 ai_service: Any,
+                                 topic: str,
+                                 research_data: Dict[str, Any],
+                                 duration_weeks: int,
+                                 depth_level: int,
+                                 learning_style: Optional[str],
+                                 prior_knowledge: Optional[str],
+                                 generate_goals: bool,
+                                 include_resources: bool) -> Dict[str, Any]:
+        """
+        Generate the plan in one call, or in parallel chunks when it is too long for one response
+        """
+        if chunked_generation_applies(duration_weeks):
+            study_plan = await generate_chunked_plan(
+                ai_service, topic, research_data, duration_weeks, depth_level,
+                learning_style, prior_knowledge, include_goals=generate_goals, include_resources=include_resources
+            )
+            if study_plan is not None:
+                return study_plan
+            logger.warning(f"Chunked generation failed, generating the {duration_weeks}-week plan in one call")
+        return await ai_service.create_study_plan(
+            topic=topic,
+            research_data=research_data,
+            duration_weeks=duration_weeks,
+            depth_level=depth_level,
+            learning_style=learning_style,
+            prior_knowledge=prior_knowledge,
+            generate_goals=generate_goals,
+            include_resources=include_resources
+        )
+    
+    async def stream_plan(self,
+                          ai_service: Any,
+                          topic: str,
+                          research_data: Dict[str, Any],
+                          depth_level: int = 3,
+                          duration_weeks: int = 4,
+                          include_resources: bool = True,
+                          learning_style: Optional[str] = None,
+                          prior_knowledge: Optional[str] = None,
+                          goals: Optional[List[str]] = None,
+                          generate_goals: bool = False,
+                          additional_context: Optional[str] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Generate a study plan, yielding its parts as soon as the model has written them
+        
+        While the model streams, yields ("milestone", milestone) and
+        ("resource", resource) for each completed array item and
+        ("field", {"name": ..., "value": ...}) for each completed scalar field,
+        then one ("plan", study_plan) event with the finished plan. The final plan
+        is authoritative: if generation fails part-way, it is the fallback plan.
+        Providers without `stream_content` are generated in one piece.
+        """
+        use_ai = os.getenv("USE_AI_GENERATION", "true").lower() in ["true", "1", "yes"]
+        if not use_ai or not hasattr(ai_service, 'stream_content'):
+            study_plan = await self.generate_plan(
+                ai_service=ai_service,
+                topic=topic,
+                research_data=research_data,
+                depth_level=depth_level,
+                duration_weeks=duration_weeks,
+                include_resources=include_resources,
+                learning_style=learning_style,
+                prior_knowledge=prior_knowledge,
+                goals=goals,
+                generate_goals=generate_goals,
+                additional_context=additional_context
+            )
+            for milestone in study_plan.get("milestones", []):
+                yield "milestone", milestone
+            for resource in study_plan.get("resources") or []:
+                yield "resource", resource
+            yield "plan", study_plan
+            return
+        
+        # Follow-up calls (repairs, retried weeks) can continue the plan call
+        with generation_session():
+            logger.info(f"Streaming study plan for topic: {topic} from {ai_service.__class__.__name__}")
+            goals_mode = goal_generation_mode() if generate_goals else None
+            goals_task = None
+            if goals_mode == "concurrent":
+                goals_task = asyncio.ensure_future(self.generate_learning_goals(
+                    ai_service=ai_service,
+                    topic=topic,
+                    duration_weeks=duration_weeks,
+                    prior_knowledge=prior_knowledge
+                ))
+            research_data = compress_research(research_data, topic)
+            parser = IncrementalJSONParser()
+            chunks: List[str] = []
+            try:
+                try:
+                    study_plan = None
+                    if chunked_generation_applies(duration_weeks):
+                        try:
+                            # Milestones arrive chunk by chunk instead of token by token
+                            async for kind, value in iter_chunked_plan(
+                                ai_service, topic, research_data, duration_weeks, depth_level,
+                                learning_style, prior_knowledge, include_goals=goals_mode == "inline",
+                                include_resources=include_resources
+                            ):
+                                if kind == "plan":
+                                    study_plan = value
+                                elif kind != "resource" or include_resources:
+                                    yield kind, value
+                        except ValueError as e:
+                            logger.warning(f"Chunked generation failed, streaming the plan in one call: {str(e)}")
+                
+                    if study_plan is None:
+                        prompt, max_tokens = budget_study_plan_prompt(
+                            ai_service, topic, research_data, duration_weeks, depth_level, learning_style, prior_knowledge,
+                            include_goals=goals_mode == "inline", include_resources=include_resources
+                        )
+                        schema = study_plan_schema(goals_mode == "inline")
+                        async for chunk in ai_service.stream_content(prompt, schema=schema, max_tokens=max_tokens):
+                            chunks.append(chunk)
+                            for kind, key, value in parser.feed(chunk):
+                                if kind == ITEM and key == "milestones":
+                                    yield "milestone", value
+                                elif kind == ITEM and key == "resources" and include_resources:
+                                    yield "resource", value
+                                elif kind == FIELD and not isinstance(value, (list, dict)):
+                                    yield "field", {"name": key, "value": value}
+                    
+                        # Well-formed JSON can still hold off-schema or missing milestones
+                        study_plan = await complete_parsed_plan(
+                            ai_service, parser.close(), topic, duration_weeks, goals_mode == "inline"
+                        )
+                except Exception as e:
+                    logger.error(f"Error streaming study plan: {str(e)}")
+                    # Keep whatever was streamed before the output broke off or went malformed
+                    study_plan = await complete_study_plan(
+                        ai_service, "".join(chunks), topic, duration_weeks, goals_mode == "inline", "stream"
+                    )
                 generation_method = ai_service.__class__.__name__
-            else:
-                # Skip AI and use placeholders directly
-                logger.warning(f"AI generation disabled by environment setting. Using PLACEHOLDER generation.")
-                study_plan = self._create_fallback_plan(topic, duration_weeks)
-                generation_method = "PLACEHOLDER"
+                if study_plan is None:
+                    logger.warning(f"Falling back to template-based study plan generation for topic: {topic}")
+                    study_plan = self._create_fallback_plan(topic, duration_weeks)
+                    generation_method = "PLACEHOLDER"
+            
+                generated_goals = await goals_task if goals_task is not None else None
+            finally:
+                # Don't leave the goals call running if the client disconnects mid-stream
+                if goals_task is not None and not goals_task.done():
+                    goals_task.cancel()
+        
+            yield "plan", await self._finalize_plan(
+                study_plan=study_plan,
+                ai_service=ai_service,
+                generation_method=generation_method,
+                topic=topic,
+                duration_weeks=duration_weeks,
+                include_resources=include_resources,
+                prior_knowledge=prior_knowledge,
+                goals=goals,
+                generate_goals=generate_goals,
+                additional_context=additional_context,
+                generated_goals=generated_goals
+            )
+    
+    async def _finalize_plan(self,
+                             study_plan: Dict[str, Any],
+                             ai_service: Any,
+                             generation_method: str,
+                             topic: str,
+                             duration_weeks: int,
+                             include_resources: bool,
+                             prior_knowledge: Optional[str],
+                             goals: Optional[List[str]],
+                             generate_goals: bool,
+                             additional_context: Optional[str],
+                             generated_goals: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Label a generated plan with its provider, merge goals and context, and drop unrequested resources
+        
+        Goals already generated alongside the plan (`generated_goals`, or the
+        plan's own "goals" field in inline mode) are used as they are; otherwise
+        they are generated here.
+        """
+        try:
+            inline_goals = study_plan.pop("goals", None)
+            if generated_goals is None and isinstance(inline_goals, list) and inline_goals:
+                generated_goals = [str(goal) for goal in inline_goals]
             
             # Check if this is actually a fallback template by looking for markers in the summary
             is_fallback = False
@@ -83,13 +465,14 @@ class StudyPlanService:
                 
             # Generate or merge goals
             if generate_goals:
-                logger.info("Generating smart goals...")
-                generated_goals = await self.generate_learning_goals(
-                    ai_service=ai_service,
-                    topic=topic,
-                    duration_weeks=duration_weeks,
-                    prior_knowledge=prior_knowledge
-                )
+                if generated_goals is None:
+                    logger.info("Generating smart goals...")
+                    generated_goals = await self.generate_learning_goals(
+                        ai_service=ai_service,
+                        topic=topic,
+                        duration_weeks=duration_weeks,
+                        prior_knowledge=prior_knowledge
+                    )
                 if "learning_objectives" in study_plan:
                     study_plan["learning_objectives"] = list(set(study_plan["learning_objectives"] + generated_goals))
                 else:
@@ -127,6 +510,7 @@ class StudyPlanService:
         Generate learning goals using the selected AI provider.
         """
         try:
+            # Goals only depend on the request, so the call stays stateless rather than continuing the plan call
             return await ai_service.generate_learning_goals(
                 topic=topic,
                 duration_weeks=duration_weeks,
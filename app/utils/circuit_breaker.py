@@ -0,0 +1,154 @@
+"""
+Circuit breakers for StudyplannerAI's upstream LLM providers.
+A breaker opens after consecutive failures so callers fail fast instead of
+waiting for timeouts. After a cool-down it lets a single trial call through
+(half-open); the trial's outcome, or a successful health probe, closes it.
+"""
+import os
+import time
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised (or reported) when a call is rejected because the breaker is open
+    """
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker around one upstream
+    """
+
+    def __init__(self,
+                 name: str,
+                 failure_threshold: Optional[int] = None,
+                 reset_timeout: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold if failure_threshold is not None else int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))
+        self.reset_timeout = reset_timeout if reset_timeout is not None else float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+        self._clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_started: Optional[float] = None
+
+    def allow_request(self) -> bool:
+        """
+        Whether a call may go through now; an open breaker past its cool-down admits one trial call
+        """
+        now = self._clock()
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                metrics.increment(f"circuit_breaker.{self.name}.rejected")
+                return False
+            self._transition(HALF_OPEN)
+        # Half-open: one trial at a time; a trial that never reported back is replaced after the cool-down
+        if self._trial_started is not None and now - self._trial_started < self.reset_timeout:
+            metrics.increment(f"circuit_breaker.{self.name}.rejected")
+            return False
+        self._trial_started = now
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._trial_started = None
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_started = None
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.trip()
+
+    def trip(self) -> None:
+        """
+        Open the breaker (again), restarting its cool-down
+        """
+        self.opened_at = self._clock()
+        self._trial_started = None
+        if self.state != OPEN:
+            self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        logger.warning(f"Circuit breaker for {self.name}: {self.state} -> {state}")
+        metrics.increment(f"circuit_breaker.{self.name}.{state}")
+        self.state = state
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {"state": self.state, "consecutive_failures": self.failures}
+        if self.state == OPEN:
+            snapshot["retry_in_seconds"] = round(max(0.0, self.reset_timeout - (self._clock() - self.opened_at)), 1)
+        return snapshot
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Get the shared breaker for an upstream, creating it on first use
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = CircuitBreaker(name)
+        _breakers[name] = breaker
+    return breaker
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
+
+
+async def guarded_generation(name: str, generate: Callable[[], Awaitable[str]]) -> str:
+    """
+    Run a provider generation through its breaker
+
+    Providers report failures as "Error..." strings, so those count as failures;
+    a rejected call is reported the same way without touching the network.
+    """
+    breaker = get_breaker(name)
+    if not breaker.allow_request():
+        return f"Error: {name} is unavailable (circuit breaker open)"
+    try:
+        response = await generate()
+    except Exception:
+        breaker.record_failure()
+        raise
+    if not response or response.startswith("Error"):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+
+async def guarded_stream(name: str, stream: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+    """
+    Run a provider stream through its breaker
+
+    Raises:
+        CircuitOpenError: The breaker is open
+    """
+    breaker = get_breaker(name)
+    if not breaker.allow_request():
+        raise CircuitOpenError(f"{name} is unavailable (circuit breaker open)")
+    try:
+        async for chunk in stream():
+            yield chunk
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
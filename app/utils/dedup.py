@@ -0,0 +1,79 @@
+"""
+Near-duplicate detection for research sources.
+Documents are fingerprinted with 64-bit SimHash over word shingles; the
+fingerprinting and the pairwise Hamming distances are vectorized with NumPy.
+"""
+import re
+import hashlib
+from typing import List, Tuple
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+")
+FINGERPRINT_BITS = 64
+
+
+def _shingles(text: str, size: int) -> List[str]:
+    tokens = _WORD_RE.findall(text.lower())
+    if len(tokens) < size:
+        return [" ".join(tokens)] if tokens else []
+    return [" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)]
+
+
+def simhash(text: str, shingle_size: int = 2) -> np.ndarray:
+    """
+    Compute the 64-bit SimHash of a text
+
+    Returns:
+        Fingerprint as an array of 8 uint8 values (big-endian bit order)
+    """
+    shingles = _shingles(text, shingle_size)
+    if not shingles:
+        return np.zeros(8, dtype=np.uint8)
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles)
+    # (n_shingles, 64) matrix of hash bits, voted +1/-1 per bit position
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+    votes = bits.astype(np.int32).sum(axis=0) * 2 - len(shingles)
+    return np.packbits(votes > 0)
+
+
+def simhash_many(texts: List[str], shingle_size: int = 2) -> np.ndarray:
+    """
+    Fingerprint several texts
+
+    Returns:
+        (n, 8) uint8 matrix, one fingerprint per row
+    """
+    if not texts:
+        return np.zeros((0, 8), dtype=np.uint8)
+    return np.vstack([simhash(text, shingle_size) for text in texts])
+
+
+def similarity_matrix(fingerprints: np.ndarray) -> np.ndarray:
+    """
+    Pairwise SimHash similarity (1 - Hamming distance / 64) between fingerprints
+    """
+    xor = np.bitwise_xor(fingerprints[:, None, :], fingerprints[None, :, :])
+    distances = np.unpackbits(xor, axis=2).sum(axis=2)
+    return 1.0 - distances / FINGERPRINT_BITS
+
+
+def near_duplicate_mask(texts: List[str], threshold: float = 0.85, shingle_size: int = 2) -> Tuple[List[bool], np.ndarray]:
+    """
+    Decide which texts to keep, walking them in rank order
+
+    A text is dropped when its similarity to an already kept, higher-ranked
+    text reaches `threshold`.
+
+    Returns:
+        Tuple of (keep flags in input order, similarity matrix)
+    """
+    similarities = similarity_matrix(simhash_many(texts, shingle_size))
+    keep: List[bool] = []
+    kept_indices: List[int] = []
+    for i in range(len(texts)):
+        duplicate = bool(kept_indices) and bool((similarities[i, kept_indices] >= threshold).any())
+        keep.append(not duplicate)
+        if not duplicate:
+            kept_indices.append(i)
+    return keep, similarities
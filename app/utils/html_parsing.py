@@ -0,0 +1,196 @@
+"""
+HTML parsing and text extraction for the research pipeline.
+Parsing is CPU-bound, so `run_parser` hands it to a thread or process pool
+instead of running it on the event loop. The functions in this module are
+top-level so they can be pickled for a process pool.
+"""
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Callable
+from urllib.parse import urlparse, parse_qs
+
+from bs4 import BeautifulSoup
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lxml  # noqa: F401 - enables the faster BeautifulSoup tree builder
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+try:
+    from selectolax.parser import HTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
+
+# Elements that never contain the main content of a page
+NON_CONTENT_TAGS = ["script", "style", "nav", "footer", "header", "aside"]
+
+
+def get_parser_backend() -> str:
+    """
+    Pick the HTML parser: HTML_PARSER if set, otherwise the fastest one installed
+    """
+    configured = os.getenv("HTML_PARSER", "").lower()
+    if configured == "selectolax" and SELECTOLAX_AVAILABLE:
+        return "selectolax"
+    if configured == "lxml" and LXML_AVAILABLE:
+        return "lxml"
+    if configured == "html.parser":
+        return "html.parser"
+    if SELECTOLAX_AVAILABLE:
+        return "selectolax"
+    if LXML_AVAILABLE:
+        return "lxml"
+    return "html.parser"
+
+
+def _clean_text(text: str, max_chars: Optional[int]) -> str:
+    """
+    Collapse whitespace into one phrase per line, stopping once `max_chars` are collected
+    """
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    collected = []
+    collected_chars = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        collected.append(chunk)
+        collected_chars += len(chunk) + 1
+        if max_chars is not None and collected_chars >= max_chars:
+            break
+    return '\n'.join(collected)
+
+
+def extract_page_text(html: str, max_chars: Optional[int] = None, backend: Optional[str] = None) -> str:
+    """
+    Extract the readable text of a page
+
+    Args:
+        html: Raw HTML of the page
+        max_chars: Stop once this many characters of clean text are collected
+        backend: Parser to use; defaults to `get_parser_backend()`
+
+    Returns:
+        Clean text, one phrase per line
+    """
+    backend = backend or get_parser_backend()
+    if backend == "selectolax":
+        tree = HTMLParser(html)
+        tree.strip_tags(NON_CONTENT_TAGS)
+        root = tree.body or tree.root
+        text = root.text(separator='\n') if root is not None else ""
+    else:
+        soup = BeautifulSoup(html, backend)
+        for element in soup(NON_CONTENT_TAGS):
+            element.extract()
+        text = soup.get_text(separator='\n')
+    return _clean_text(text, max_chars)
+
+
+def parse_search_results(html: str, max_results: int = 10, backend: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Parse a DuckDuckGo HTML results page
+
+    Returns:
+        List of dictionaries with title, url, snippet and source
+    """
+    backend = backend or get_parser_backend()
+    # CSS selection below relies on BeautifulSoup; selectolax pages fall back to lxml or html.parser
+    if backend == "selectolax":
+        backend = "lxml" if LXML_AVAILABLE else "html.parser"
+    soup = BeautifulSoup(html, backend)
+    results = []
+
+    for i, result in enumerate(soup.select('.result')):
+        if i >= max_results:
+            break
+
+        title_element = result.select_one('.result__title')
+        url_element = result.select_one('.result__url')
+        snippet_element = result.select_one('.result__snippet')
+
+        title = title_element.get_text().strip() if title_element else "Unknown Title"
+
+        # Extract URL from href attribute
+        url = None
+        if title_element and title_element.select_one('a'):
+            url_href = title_element.select_one('a').get('href', '')
+            # Some DDG results have redirect URLs, extract the actual URL
+            if 'duckduckgo.com/l/?' in url_href:
+                url_params = parse_qs(urlparse(url_href).query)
+                if 'uddg' in url_params:
+                    url = url_params['uddg'][0]
+            else:
+                url = url_href
+
+        snippet = snippet_element.get_text().strip() if snippet_element else ""
+        source = url_element.get_text().strip() if url_element else "Unknown Source"
+
+        if url:  # Only add if we have a valid URL
+            results.append({
+                'title': title,
+                'url': url,
+                'snippet': snippet,
+                'source': source
+            })
+
+    return results
+
+
+_executor: Optional[Executor] = None
+
+
+def get_parse_executor() -> Optional[Executor]:
+    """
+    Get the worker pool used for parsing, or None to parse inline
+
+    HTML_PARSE_EXECUTOR selects "thread" (default), "process" or "inline";
+    HTML_PARSE_WORKERS sets the pool size.
+    """
+    global _executor
+    mode = os.getenv("HTML_PARSE_EXECUTOR", "thread").lower()
+    if mode == "inline":
+        return None
+    if _executor is None:
+        workers = int(os.getenv("HTML_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+        if mode == "process":
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="html-parse")
+        logger.info(f"Started {mode} pool with {workers} workers for HTML parsing (parser: {get_parser_backend()})")
+    return _executor
+
+
+def shutdown_parse_executor() -> None:
+    """
+    Stop the parsing pool (called on application shutdown)
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def run_parser(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run a parsing function off the event loop and record how long the loop was blocked
+    """
+    executor = get_parse_executor()
+    started = time.perf_counter()
+    if executor is None:
+        result = func(*args)
+        metrics.observe("html_parse.loop_blocking_seconds", time.perf_counter() - started)
+        return result
+
+    future = asyncio.get_running_loop().run_in_executor(executor, func, *args)
+    metrics.observe("html_parse.loop_blocking_seconds", time.perf_counter() - started)
+    return await future
@@ -0,0 +1,127 @@
+"""
+Best-effort repair of malformed JSON in LLM responses.
+Fixes the faults models commonly produce: code fences and prose around the
+object, trailing commas, single-quoted strings, Python literals and output cut
+off by the token limit (open strings, arrays and objects are closed after the
+last complete value).
+"""
+import re
+import json
+import logging
+from typing import Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_FENCE_RE = re.compile(r"```[a-zA-Z]*")
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _close(text: str, stack: List[str]) -> str:
+    text = text.rstrip()
+    if stack[-1] == "{":
+        # A key whose value was cut off is dropped with it
+        text = re.sub(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*:?$', r"\1", text)
+    text = text.rstrip().rstrip(",:")
+    return text + "".join(_CLOSERS[opener] for opener in reversed(stack))
+
+
+def _scan(text: str) -> Tuple[str, List[str], bool, List[Tuple[int, List[str]]]]:
+    """
+    Normalize quotes, literals and trailing commas of the first top-level value
+
+    Returns:
+        (normalized text, containers still open, whether it ended inside a string,
+         cut points (text length, open containers) after each complete value)
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    cuts: List[Tuple[int, List[str]]] = []
+    quote = None
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if quote is not None:
+            if char == "\\" and i + 1 < len(text):
+                # \' is only an escape inside single-quoted strings
+                out.extend("'" if text[i + 1] == "'" else text[i:i + 2])
+                i += 2
+                continue
+            if char == quote:
+                out.append('"')
+                quote = None
+                cuts.append((len(out), list(stack)))
+            elif char == '"':
+                # A double quote inside a single-quoted string
+                out.extend('\\"')
+            elif char == "\n":
+                out.extend("\\n")
+            else:
+                out.append(char)
+            i += 1
+            continue
+        if char in "\"'":
+            quote = char
+            out.append('"')
+        elif char in "{[":
+            stack.append(char)
+            out.append(char)
+        elif char in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(char)
+            cuts.append((len(out), list(stack)))
+            if not stack:
+                return "".join(out), stack, False, cuts
+        elif char.isalpha():
+            word = re.match(r"[A-Za-z_]+", text[i:]).group(0)
+            out.extend(_LITERALS.get(word, word))
+            i += len(word)
+            cuts.append((len(out), list(stack)))
+            continue
+        elif char.isdigit() or char == "-":
+            number = re.match(r"-?[0-9.eE+-]+", text[i:]).group(0)
+            out.extend(number)
+            i += len(number)
+            cuts.append((len(out), list(stack)))
+            continue
+        else:
+            out.append(char)
+        i += 1
+    return "".join(out), stack, quote is not None, cuts
+
+
+def repair_json(text: str) -> Any:
+    """
+    Parse the first JSON object or array in a model response, repairing common faults
+
+    Raises:
+        ValueError: If no JSON value can be recovered
+    """
+    text = _FENCE_RE.sub("", text)
+    starts = [index for index in (text.find("{"), text.find("[")) if index != -1]
+    if not starts:
+        raise ValueError("No JSON object found in response")
+    normalized, stack, in_string, cuts = _scan(text[min(starts):])
+
+    candidates = []
+    if not stack:
+        candidates.append(normalized)
+    else:
+        if in_string:
+            candidates.append(_close(normalized + '"', stack))
+        candidates.append(_close(normalized, stack))
+        # Fall back to the last complete values, most recent first
+        for length, open_containers in reversed(cuts[-20:]):
+            if open_containers:
+                candidates.append(_close(normalized[:length], open_containers))
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    raise ValueError("Could not repair JSON in response")
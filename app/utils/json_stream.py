@@ -0,0 +1,242 @@
+"""
+Helpers for consuming study plans while the LLM is still generating them.
+`IncrementalJSONParser` is fed token chunks and reports top-level fields and
+array items as soon as they close, so partial plans are usable before
+generation finishes. `parse_study_plan_json` is the one-shot form used by the
+providers.
+"""
+import json
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Event kinds returned by IncrementalJSONParser.feed
+FIELD = "field"
+ITEM = "item"
+
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalJSONParser:
+    """
+    Push parser for a JSON object arriving in chunks
+
+    Text before the first "{" (prose, markdown code fences) and after the
+    matching "}" is ignored. `feed` returns events:
+
+    - ("item", key, value) for each element of a top-level array, e.g. every
+      milestone of "milestones", as soon as the element closes
+    - ("field", key, value) for each top-level value once it is complete
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        # Where we are in the top-level object: key, colon, value, literal, container, after_value
+        self._expect = "key"
+        self._key: Optional[str] = None
+        self._value_start = 0
+        self._array_key: Optional[str] = None
+        self._item_start: Optional[int] = None
+        self._fields: Dict[str, Any] = {}
+        self._items: Dict[str, List[Any]] = {}
+        self._errors: List[str] = []
+        self._dropped_items = 0
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def dropped_items(self) -> int:
+        """
+        Array items skipped because they were malformed; `partial` leaves a gap for each
+        """
+        return self._dropped_items
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, Any]]:
+        """
+        Add a chunk of generated text
+
+        Returns:
+            Events completed by this chunk, in document order
+        """
+        self._buffer += chunk
+        events: List[Tuple[str, str, Any]] = []
+        buffer = self._buffer
+        i = self._pos
+        end = len(buffer)
+        while i < end and not self._done:
+            char = buffer[i]
+            if not self._started:
+                if char == '{':
+                    self._started = True
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._string_closed(i, events)
+            elif char in _WHITESPACE:
+                pass
+            elif self._depth == 1:
+                self._top_level(char, i, events)
+            else:
+                self._nested(char, i, events)
+            i += 1
+        self._pos = i
+        return events
+
+    def _top_level(self, char: str, i: int, events: List[Tuple[str, str, Any]]) -> None:
+        expect = self._expect
+        if expect == "key":
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == '}':
+                self._done = True
+        elif expect == "colon":
+            if char == ':':
+                self._expect = "value"
+        elif expect == "value":
+            self._value_start = i
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in '{[':
+                self._depth += 1
+                self._expect = "container"
+                if char == '[':
+                    self._array_key = self._key
+                    self._items[self._key] = []
+            else:
+                self._expect = "literal"
+        elif expect == "literal":
+            if char in ',}':
+                self._emit_field(self._buffer[self._value_start:i].strip(), events)
+                self._expect = "key"
+                self._done = char == '}'
+        elif expect == "after_value":
+            if char == ',':
+                self._expect = "key"
+            elif char == '}':
+                self._done = True
+
+    def _nested(self, char: str, i: int, events: List[Tuple[str, str, Any]]) -> None:
+        in_array = self._array_key is not None and self._depth == 2
+        if char == '"':
+            self._in_string = True
+            self._string_start = i
+            if in_array and self._item_start is None:
+                self._item_start = i
+        elif char in '{[':
+            if in_array and self._item_start is None:
+                self._item_start = i
+            self._depth += 1
+        elif char in '}]':
+            self._depth -= 1
+            if self._depth == 2 and self._array_key is not None and self._item_start is not None:
+                self._emit_item(self._buffer[self._item_start:i + 1], events)
+            elif self._depth == 1:
+                if self._array_key is not None and self._item_start is not None:
+                    self._emit_item(self._buffer[self._item_start:i], events)
+                self._emit_field(self._buffer[self._value_start:i + 1], events)
+                self._array_key = None
+                self._expect = "after_value"
+        elif char == ',':
+            if in_array and self._item_start is not None:
+                self._emit_item(self._buffer[self._item_start:i], events)
+        elif in_array and self._item_start is None:
+            self._item_start = i
+
+    def _string_closed(self, i: int, events: List[Tuple[str, str, Any]]) -> None:
+        text = self._buffer[self._string_start:i + 1]
+        if self._depth == 1:
+            if self._expect == "key":
+                self._key = self._decode(text)
+                self._expect = "colon"
+            elif self._expect == "value":
+                self._emit_field(text, events)
+                self._expect = "after_value"
+        elif self._depth == 2 and self._array_key is not None and self._item_start == self._string_start:
+            self._emit_item(text, events)
+
+    def _emit_item(self, text: str, events: List[Tuple[str, str, Any]]) -> None:
+        self._item_start = None
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError as e:
+            # Later items still stream, but the document is incomplete; `close` reports the gap
+            self._errors.append(f"{self._array_key} item: {str(e)}")
+            self._dropped_items += 1
+            logger.warning(f"Skipping malformed item in '{self._array_key}': {str(e)}")
+            return
+        self._items[self._array_key].append(value)
+        events.append((ITEM, self._array_key, value))
+
+    def _emit_field(self, text: str, events: List[Tuple[str, str, Any]]) -> None:
+        key = self._key
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError as e:
+            if key in self._items:
+                # Keep the elements that did parse (e.g. the array had a trailing comma)
+                value = self._items[key]
+            else:
+                self._errors.append(f"{key}: {str(e)}")
+                logger.warning(f"Skipping malformed field '{key}': {str(e)}")
+                return
+        self._fields[key] = value
+        events.append((FIELD, key, value))
+
+    @staticmethod
+    def _decode(text: str) -> Any:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return text[1:-1]
+
+    def partial(self) -> Dict[str, Any]:
+        """
+        The document so far: completed fields, plus the completed items of an array still being generated
+        """
+        partial = {key: list(items) for key, items in self._items.items()}
+        partial.update(self._fields)
+        return partial
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Finish parsing and return the complete document
+
+        Raises:
+            ValueError: If no object was found, it was cut off, or a field or array item was malformed
+        """
+        if not self._started:
+            raise ValueError("Could not find a JSON object in the response")
+        if not self._done:
+            raise ValueError("JSON object is incomplete")
+        if self._errors:
+            raise ValueError(f"Malformed JSON fields: {'; '.join(self._errors)}")
+        return dict(self._fields)
+
+
+def parse_study_plan_json(text: str) -> Dict[str, Any]:
+    """
+    Parse the study plan JSON object out of a complete model response
+
+    Raises:
+        ValueError: If the response does not contain a complete, valid JSON object
+    """
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    return parser.close()
@@ -0,0 +1,52 @@
+"""
+Event-loop lag monitor for StudyplannerAI.
+Measures how long the event loop is blocked by synchronous work by checking
+how late a periodic timer fires.
+"""
+import time
+import asyncio
+import logging
+from typing import Optional
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoopLagMonitor:
+    """
+    Periodically samples event-loop lag and records it in the metrics registry
+    """
+
+    def __init__(self, interval: float = 0.05, metric_name: str = "event_loop.lag_seconds"):
+        self.interval = interval
+        self.metric_name = metric_name
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.samples = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.max_lag = max(self.max_lag, lag)
+            self.total_lag += lag
+            self.samples += 1
+            metrics.observe(self.metric_name, lag)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Started event-loop lag monitor (interval {self.interval}s)")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
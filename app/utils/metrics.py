@@ -0,0 +1,68 @@
+"""
+Lightweight in-process metrics for StudyplannerAI.
+Services record counters and timings here so they can be inspected without
+an external monitoring stack.
+"""
+import threading
+from typing import Dict, Any
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of named counters and observed values
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._observations: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """
+        Increase a counter by the given amount
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        Record a single observation (e.g. a duration in seconds)
+        """
+        with self._lock:
+            stats = self._observations.get(name)
+            if stats is None:
+                stats = {"count": 0, "total": 0.0, "min": value, "max": value, "last": value}
+                self._observations[name] = stats
+            stats["count"] += 1
+            stats["total"] += value
+            stats["min"] = min(stats["min"], value)
+            stats["max"] = max(stats["max"], value)
+            stats["last"] = value
+
+    def get_counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return a copy of all counters and observation summaries
+        """
+        with self._lock:
+            observations = {}
+            for name, stats in self._observations.items():
+                summary = dict(stats)
+                summary["avg"] = stats["total"] / stats["count"] if stats["count"] else 0.0
+                observations[name] = summary
+            return {
+                "counters": dict(self._counters),
+                "observations": observations
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._observations.clear()
+
+
+# Shared registry used across the application
+metrics = MetricsRegistry()
@@ -0,0 +1,237 @@
+"""
+Prompt templates for StudyplannerAI with a prefix-stable layout.
+Each prompt starts with static instructions and the JSON format, identical for
+every topic, and ends with the request's topic, research and parameters.
+Providers can then reuse the evaluated prefix across requests: Ollama through
+llama.cpp's KV prefix reuse, OpenRouter through cache_control breakpoints and
+Gemini through its implicit prefix caching.
+"""
+import os
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from app.utils.extractive_summary import format_sources
+
+# Every static prefix built so far, so providers can find the cacheable part of a prompt
+_PREFIXES: Set[str] = set()
+
+_GOALS_FIELD = '\n  "goals": ["Specific, measurable learning goal 1", "Goal 2", "Goal 3", ...],'
+_RESOURCES_FIELD = '''  "resources": [
+    {
+      "title": "Resource Title",
+      "url": "https://example.com/resource",
+      "type": "article/book/video/course",
+      "description": "Brief description of the resource"
+    },
+    ...more resources...
+  ],
+'''
+
+
+def prompt_cache_enabled() -> bool:
+    """
+    Whether providers mark or upload the static prompt prefix for caching (PROMPT_CACHE_ENABLED)
+    """
+    return os.getenv("PROMPT_CACHE_ENABLED", "true").lower() in ["true", "1", "yes"]
+
+
+def _register(prefix: str) -> str:
+    _PREFIXES.add(prefix)
+    return prefix
+
+
+@lru_cache(maxsize=None)
+def study_plan_prefix(include_goals: bool = False, include_resources: bool = True) -> str:
+    """
+    Static part of the study plan prompt: role, JSON format and rules
+    """
+    goals_field = _GOALS_FIELD if include_goals else ""
+    resources_field = _RESOURCES_FIELD if include_resources else ""
+    return _register(f"""
+You are an expert educational consultant creating comprehensive study plans.
+The request at the end gives the topic, research data and the learner's parameters.
+
+Create a detailed, structured study plan following this exact JSON format:
+{{
+  "topic": "The main topic",
+  "summary": "A concise summary of what will be studied and why it's valuable",
+  "duration_weeks": 4,
+  "learning_objectives": ["Objective 1", "Objective 2", "Objective 3", ...],{goals_field}
+  "key_concepts": ["Concept 1", "Concept 2", "Concept 3", ...],
+  "milestones": [
+    {{
+      "title": "Week 1: Foundation",
+      "description": "Description of what will be covered",
+      "week": 1,
+      "tasks": ["Task 1", "Task 2", "Task 3", ...],
+      "estimated_hours": 10
+    }},
+    ...more milestones for each week...
+  ],
+{resources_field}  "recommendations": "Additional personalized recommendations based on learning style and prior knowledge. For instance, suggest hands-on projects for kinesthetic learners or foundational books for beginners."
+}}
+
+Set "duration_weeks" to the requested duration and write one milestone for every week.
+Return ONLY the valid JSON object, nothing else. Ensure all JSON is properly formatted and valid.
+""")
+
+
+@lru_cache(maxsize=None)
+def outline_prefix(include_goals: bool = False, include_resources: bool = True) -> str:
+    """
+    Static part of the chunked-generation outline prompt
+    """
+    goals_field = _GOALS_FIELD if include_goals else ""
+    resources_field = _RESOURCES_FIELD if include_resources else ""
+    return _register(f"""
+You are an expert educational consultant outlining long study plans.
+The request at the end gives the topic, research data and the learner's parameters.
+
+Outline the plan following this exact JSON format, with one short theme for every week of the requested duration:
+{{
+  "topic": "The main topic",
+  "summary": "A concise summary of what will be studied and why it's valuable",
+  "duration_weeks": 26,
+  "learning_objectives": ["Objective 1", "Objective 2", "Objective 3", ...],{goals_field}
+  "key_concepts": ["Concept 1", "Concept 2", "Concept 3", ...],
+  "weeks": [
+    {{"week": 1, "theme": "Foundation"}},
+    ...one entry for each week...
+  ],
+{resources_field}  "recommendations": "Additional personalized recommendations based on learning style and prior knowledge."
+}}
+
+Set "duration_weeks" to the requested duration.
+Return ONLY the valid JSON object, nothing else.
+""")
+
+
+@lru_cache(maxsize=None)
+def chunk_prefix() -> str:
+    """
+    Static part of the prompt for one group of weeks of a chunked plan
+    """
+    return _register("""
+You are an expert educational consultant writing part of a long study plan.
+The request at the end gives the plan outline, the learner's parameters and the weeks to write.
+
+Write the detailed milestones following this exact JSON format:
+{
+  "milestones": [
+    {
+      "title": "Week 5: Theme of week 5",
+      "description": "Description of what will be covered",
+      "week": 5,
+      "tasks": ["Task 1", "Task 2", "Task 3", ...],
+      "estimated_hours": 10
+    },
+    ...one milestone for each requested week...
+  ]
+}
+
+Return ONLY the valid JSON object, nothing else.
+""")
+
+
+def _parameters(depth_level: int, learning_style: Optional[str], prior_knowledge: Optional[str]) -> str:
+    return f"""- Depth Level: {depth_level}/5
+- Learning Style: {learning_style if learning_style else 'Not specified'}
+- Prior Knowledge: {prior_knowledge if prior_knowledge else 'Not specified'}"""
+
+
+def request_details(topic: str,
+                    research_data: Dict[str, Any],
+                    duration_weeks: int,
+                    depth_level: int,
+                    learning_style: Optional[str],
+                    prior_knowledge: Optional[str]) -> str:
+    """
+    Variable part of the plan and outline prompts: topic, research and parameters
+    """
+    key_concepts = ", ".join(research_data.get('key_concepts', [])[:8])
+    related_topics = ", ".join(research_data.get('related_topics', []))
+    return f"""
+REQUEST:
+TOPIC: {topic}
+
+RESEARCH DATA:
+{format_sources(research_data)}
+KEY CONCEPTS: {key_concepts}
+
+RELATED TOPICS: {related_topics}
+
+PARAMETERS:
+- Duration: {duration_weeks} weeks
+{_parameters(depth_level, learning_style, prior_knowledge)}
+"""
+
+
+def build_study_plan_prompt(topic: str,
+                            research_data: Dict[str, Any],
+                            duration_weeks: int,
+                            depth_level: int,
+                            learning_style: Optional[str],
+                            prior_knowledge: Optional[str],
+                            include_goals: bool = False,
+                            include_resources: bool = True) -> str:
+    """
+    Study plan prompt: the static prefix, then the request
+
+    With `include_goals`, the JSON format also asks for a "goals" list so
+    learning goals come back with the plan in a single call. Without
+    `include_resources` the resources list is left out of the format.
+    """
+    return (study_plan_prefix(include_goals, include_resources)
+            + request_details(topic, research_data, duration_weeks, depth_level, learning_style, prior_knowledge)
+            + f"\nWrite the {duration_weeks}-week study plan for {topic} as the JSON object.\n")
+
+
+def build_outline_prompt(topic: str,
+                         research_data: Dict[str, Any],
+                         duration_weeks: int,
+                         depth_level: int,
+                         learning_style: Optional[str],
+                         prior_knowledge: Optional[str],
+                         include_goals: bool = False,
+                         include_resources: bool = True) -> str:
+    """
+    Prompt for the plan's fields and a one-line theme per week, without milestone details
+    """
+    return (outline_prefix(include_goals, include_resources)
+            + request_details(topic, research_data, duration_weeks, depth_level, learning_style, prior_knowledge)
+            + f"\nOutline the {duration_weeks}-week plan for {topic}, with a theme for every week from 1 to {duration_weeks}.\n")
+
+
+def build_chunk_prompt(topic: str,
+                       themes: Dict[int, str],
+                       weeks: List[int],
+                       depth_level: int,
+                       learning_style: Optional[str],
+                       prior_knowledge: Optional[str]) -> str:
+    """
+    Prompt for the detailed milestones of one group of weeks, with the whole outline for context
+
+    Chunks of the same plan differ only in the last line, so they also share
+    the outline as a prefix.
+    """
+    outline = "\n".join(f"- Week {week}: {theme}" for week, theme in sorted(themes.items()))
+    return f"""{chunk_prefix()}
+REQUEST:
+TOPIC: {topic} ({len(themes)} weeks)
+
+PLAN OUTLINE:
+{outline}
+
+PARAMETERS:
+{_parameters(depth_level, learning_style, prior_knowledge)}
+
+Write the milestones for weeks {weeks[0]} to {weeks[-1]} only, building on the earlier weeks of the outline.
+"""
+
+
+def split_cacheable_prefix(prompt: str) -> Tuple[str, str]:
+    """
+    Split a prompt into its longest static prefix and the rest; the prefix is empty if none matches
+    """
+    prefix = max((candidate for candidate in _PREFIXES if prompt.startswith(candidate)), key=len, default="")
+    return prefix, prompt[len(prefix):]
@@ -0,0 +1,72 @@
+"""
+Single-flight request coalescing.
+Concurrent callers asking for the same key share one in-flight task instead
+of each starting their own.
+"""
+import copy
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one task
+
+    Cancellation is per caller: a cancelled caller stops waiting, and the shared
+    task is only cancelled once every caller waiting on it has gone away.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, _Flight] = {}
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `factory()` for `key`, or join the call already in flight
+
+        Args:
+            key: Normalized key identifying identical requests
+            factory: Zero-argument callable returning the awaitable to run
+
+        Returns:
+            A private copy of the shared result
+        """
+        loop = asyncio.get_running_loop()
+        flight = self._flights.get(key)
+        if flight is None or flight.task.done() or flight.task.get_loop() is not loop:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _task, k=key, f=flight: self._forget(k, f))
+        else:
+            metrics.increment(f"single_flight.{self.name}.coalesced")
+            logger.info(f"Coalesced {self.name} request into in-flight call for key: {key}")
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is waiting for the result any more
+                flight.task.cancel()
+                self._forget(key, flight)
+        # Callers may mutate what they get back, so each one receives its own copy
+        return copy.deepcopy(result)
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def in_flight(self) -> int:
+        return len(self._flights)
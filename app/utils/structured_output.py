@@ -0,0 +1,159 @@
+"""
+Structured-output support for StudyplannerAI's LLM providers.
+Derives the study plan JSON schema from the `StudyPlanResponse` model and
+translates the configured mode (STRUCTURED_OUTPUT) into each provider's
+request options: Ollama `format`, OpenRouter `response_format` and Gemini
+`responseMimeType`/`responseSchema`. Plan parsing is timed per mode so
+fallback rates and parse times can be compared.
+"""
+import os
+import copy
+import time
+import logging
+from typing import Dict, Any, Optional, Union
+
+from app.models import StudyPlanResponse
+from app.utils.json_stream import parse_study_plan_json
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# "off": prompt wording only; "json": JSON mode; "schema": JSON constrained to the plan schema
+STRUCTURED_OUTPUT_MODES = ("off", "json", "schema")
+
+# Fields the server adds after generation
+_SERVER_FIELDS = {"research_completeness"}
+
+_GEMINI_TYPES = {"string": "STRING", "integer": "INTEGER", "number": "NUMBER", "boolean": "BOOLEAN",
+                 "array": "ARRAY", "object": "OBJECT"}
+
+
+def structured_output_mode() -> str:
+    mode = os.getenv("STRUCTURED_OUTPUT", "off").lower()
+    if mode not in STRUCTURED_OUTPUT_MODES:
+        logger.warning(f"Unknown STRUCTURED_OUTPUT '{mode}', using 'off'")
+        return "off"
+    return mode
+
+
+def _simplify(node: Any, defs: Dict[str, Any]) -> Any:
+    """
+    Inline $refs, collapse Optional (anyOf with null) to the inner type and drop titles and defaults
+    """
+    if isinstance(node, list):
+        return [_simplify(item, defs) for item in node]
+    if not isinstance(node, dict):
+        return node
+    if "$ref" in node:
+        return _simplify(defs[node["$ref"].split("/")[-1]], defs)
+    if "anyOf" in node:
+        variants = [variant for variant in node["anyOf"] if variant.get("type") != "null"]
+        if len(variants) == 1:
+            return _simplify(variants[0], defs)
+    simplified = {}
+    for key, value in node.items():
+        if key == "properties":
+            # Property names are data here, so a field called "title" must survive
+            simplified[key] = {name: _simplify(prop, defs) for name, prop in value.items()}
+        elif key not in ("title", "default", "$defs"):
+            simplified[key] = _simplify(value, defs)
+    return simplified
+
+
+def study_plan_schema(include_goals: bool = False) -> Dict[str, Any]:
+    """
+    JSON schema of a generated study plan, derived from `StudyPlanResponse`
+
+    Args:
+        include_goals: Add the "goals" list requested by inline goal generation
+    """
+    raw = StudyPlanResponse.model_json_schema()
+    schema = _simplify(raw, raw.get("$defs", {}))
+    for field in _SERVER_FIELDS:
+        schema["properties"].pop(field, None)
+    schema["required"] = [field for field in schema.get("required", []) if field not in _SERVER_FIELDS]
+    if include_goals:
+        schema["properties"]["goals"] = {"type": "array", "items": {"type": "string"}}
+        schema["required"].append("goals")
+    return schema
+
+
+def milestones_schema() -> Dict[str, Any]:
+    """
+    JSON schema of a {"milestones": [...]} object, used for chunked generation of groups of weeks
+    """
+    milestones = study_plan_schema()["properties"]["milestones"]
+    return {"type": "object", "properties": {"milestones": milestones}, "required": ["milestones"]}
+
+
+def gemini_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a JSON schema to the OpenAPI subset accepted by Gemini's responseSchema
+    """
+    converted = {}
+    for key, value in schema.items():
+        if key == "type":
+            converted["type"] = _GEMINI_TYPES.get(value, value)
+        elif key == "properties":
+            converted["properties"] = {name: gemini_schema(prop) for name, prop in value.items()}
+        elif key == "items":
+            converted["items"] = gemini_schema(value)
+        elif key in ("required", "description", "enum", "format"):
+            converted[key] = copy.deepcopy(value)
+    return converted
+
+
+def ollama_format(schema: Optional[Dict[str, Any]]) -> Optional[Union[str, Dict[str, Any]]]:
+    """
+    Value of Ollama's `format` option for a call expecting `schema`, or None for plain text
+    """
+    mode = structured_output_mode()
+    if schema is None or mode == "off":
+        return None
+    return "json" if mode == "json" else schema
+
+
+def openrouter_response_format(schema: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Value of OpenRouter's `response_format` for a call expecting `schema`, or None for plain text
+    """
+    mode = structured_output_mode()
+    if schema is None or mode == "off":
+        return None
+    if mode == "json":
+        return {"type": "json_object"}
+    return {"type": "json_schema", "json_schema": {"name": "study_plan", "schema": schema}}
+
+
+def gemini_generation_config(schema: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Gemini generationConfig fields for a call expecting `schema`, or None for plain text
+    """
+    mode = structured_output_mode()
+    if schema is None or mode == "off":
+        return None
+    config: Dict[str, Any] = {"responseMimeType": "application/json"}
+    if mode == "schema":
+        config["responseSchema"] = gemini_schema(schema)
+    return config
+
+
+def parse_plan(text: str, provider: str) -> Dict[str, Any]:
+    """
+    Parse a complete plan response, recording parse time and outcome for the current mode
+
+    Raises:
+        ValueError: If the response does not contain a complete, valid JSON object
+    """
+    mode = structured_output_mode()
+    started = time.perf_counter()
+    try:
+        plan = parse_study_plan_json(text)
+    except ValueError:
+        metrics.increment(f"structured_output.{mode}.fallbacks")
+        metrics.increment(f"structured_output.{mode}.{provider}.fallbacks")
+        raise
+    finally:
+        metrics.observe(f"structured_output.{mode}.parse_seconds", time.perf_counter() - started)
+    metrics.increment(f"structured_output.{mode}.parsed")
+    return plan
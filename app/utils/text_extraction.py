@@ -0,0 +1,171 @@
+"""
+Key-concept and related-topic extraction for research results.
+Uses compiled regular expressions for sentence splitting and Counter-based
+n-gram statistics with TF-IDF-style weights. Output is ranked and
+deterministic: ties are broken by length and then alphabetically.
+"""
+import re
+import math
+from collections import Counter
+from typing import List, Dict, Any, Iterable, Set, Tuple
+
+# A sentence runs up to and including its terminal punctuation, or to the end of the line
+_SENTENCE_RE = re.compile(r"[^.!?\n]+[.!?]?")
+_DEFINITION_RE = re.compile(r" (?:is|are|refers to|defined as|means|consists of|includes) ", re.IGNORECASE)
+# Tokens start and end with a letter or digit ("c++" and "c#" are kept whole)
+_TOKEN_RE = re.compile(r"[a-z0-9](?:[a-z0-9+#'.-]*[a-z0-9+#])?")
+
+ENGLISH_STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how in into is it its of on or our so than that the
+their then there these they this to too was we were what when where which who why will with you your vs via
+about after all also any before between both each more most not only other over same some such up
+""".split())
+
+# Generic study-material words that carry no topical meaning in concepts and related topics
+STOPWORDS = ENGLISH_STOPWORDS | frozenset("""
+best new use using used guide tutorial introduction intro learn learning course courses free online
+""".split())
+
+# Words that disqualify a phrase from being a related topic (kept from the original heuristic)
+COMMON_WORDS = frozenset({'and', 'the', 'for', 'with', 'this', 'that', 'what', 'how', 'why'})
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text into sentences on terminal punctuation and line breaks
+    """
+    return [sentence for sentence in map(str.strip, _SENTENCE_RE.findall(text)) if sentence]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase a text and split it into word tokens
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _terms(text: str) -> Set[str]:
+    return set(_TOKEN_RE.findall(text.lower())) - STOPWORDS
+
+
+def extract_key_concepts(summaries: Iterable[str], limit: int = 10,
+                         min_length: int = 30, max_length: int = 200) -> List[str]:
+    """
+    Rank definitional sentences ("X is ...", "Y refers to ...") by how central they are to the sources
+
+    Each sentence is scored by the TF-IDF weight of its terms, where term
+    frequency is counted over all sources and document frequency per source,
+    normalized by the square root of the sentence's term count. Sentences built
+    from terms that recur throughout the research score highest.
+
+    Args:
+        summaries: Text of each research source
+        limit: Maximum number of concepts to return
+        min_length: Minimum sentence length in characters (exclusive)
+        max_length: Maximum sentence length in characters (exclusive)
+
+    Returns:
+        Concept sentences, best first
+    """
+    tokens: List[str] = []
+    document_terms: List[str] = []
+    candidates: Dict[str, None] = {}
+    documents = 0
+    for summary in summaries:
+        if not summary:
+            continue
+        documents += 1
+        summary_tokens = _TOKEN_RE.findall(summary.lower())
+        tokens += summary_tokens
+        document_terms += set(summary_tokens)
+        for sentence in map(str.strip, _SENTENCE_RE.findall(summary)):
+            if min_length < len(sentence) < max_length and _DEFINITION_RE.search(sentence):
+                candidates.setdefault(sentence, None)
+
+    if not candidates:
+        return []
+
+    # Counting flat token lists keeps the per-token work inside Counter's C loop
+    term_frequency = Counter(tokens)
+    document_frequency = Counter(document_terms)
+    candidate_terms = {sentence: _terms(sentence) for sentence in candidates}
+    weights = {
+        term: term_frequency[term] * math.log(1 + documents / document_frequency[term])
+        for term in set().union(*candidate_terms.values())
+    }
+    scored = []
+    for sentence, terms in candidate_terms.items():
+        score = sum(map(weights.__getitem__, terms)) / math.sqrt(len(terms)) if terms else 0.0
+        scored.append((-round(score, 9), len(sentence), sentence))
+    scored.sort()
+    return [sentence for _, _, sentence in scored[:limit]]
+
+
+def _display_form(phrase: Tuple[str, ...], texts: List[str]) -> str:
+    """
+    Recover the original capitalization of a lowercased phrase
+    """
+    pattern = re.compile(r"\b" + r"\W+".join(re.escape(word) for word in phrase) + r"\b", re.IGNORECASE)
+    for text in texts:
+        match = pattern.search(text)
+        if match:
+            return " ".join(match.group(0).split())
+    return " ".join(phrase)
+
+
+def find_related_topics(main_topic: str, search_results: List[Dict[str, Any]], limit: int = 5) -> List[str]:
+    """
+    Rank recurring bigrams and trigrams from search result titles and snippets
+
+    A phrase's score is its frequency multiplied by the mean IDF of its words
+    across the results, so phrases that recur but are not generic rank first.
+    Phrases containing words of the main topic, common words or only digits
+    are skipped, as are phrases overlapping a higher-ranked phrase.
+
+    Args:
+        main_topic: The topic being researched
+        search_results: Search results with 'title' and optional 'snippet'
+        limit: Maximum number of topics to return
+
+    Returns:
+        Related topic phrases, best first
+    """
+    main_lower = main_topic.lower()
+    excluded = set(main_lower.split()) | COMMON_WORDS | STOPWORDS
+
+    phrase_counts: Counter = Counter()
+    word_document_frequency: Counter = Counter()
+    titles: List[str] = []
+    snippets: List[str] = []
+    for result in search_results:
+        words_in_result = set()
+        for field, texts in ((result.get('title', ''), titles), (result.get('snippet', ''), snippets)):
+            if not field:
+                continue
+            texts.append(field)
+            tokens = _TOKEN_RE.findall(field.lower())
+            words_in_result.update(tokens)
+            phrase_counts.update(zip(tokens, tokens[1:]))
+            phrase_counts.update(zip(tokens, tokens[1:], tokens[2:]))
+        word_document_frequency.update(words_in_result)
+
+    total_results = max(1, len(search_results))
+    scored = []
+    for phrase, count in phrase_counts.items():
+        if not excluded.isdisjoint(phrase) or all(word.isdigit() for word in phrase):
+            continue
+        if " ".join(phrase) in main_lower:
+            continue
+        idf = sum(math.log(1 + total_results / word_document_frequency[word]) for word in phrase) / len(phrase)
+        scored.append((-round(count * idf, 9), -len(phrase), phrase))
+    scored.sort()
+
+    selected: List[Tuple[str, ...]] = []
+    for _, _, phrase in scored:
+        if any(not set(phrase).isdisjoint(chosen) for chosen in selected):
+            continue
+        selected.append(phrase)
+        if len(selected) >= limit:
+            break
+    # Prefer the capitalization used in titles
+    return [_display_form(phrase, titles + snippets) for phrase in selected]
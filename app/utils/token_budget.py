@@ -0,0 +1,209 @@
+"""
+Token budgeting for StudyplannerAI's LLM calls.
+Sizes each request's output limit to the plan it asks for (weeks, depth,
+resources, goals) instead of a fixed 4000 tokens, counts prompt tokens with a
+local approximation of BPE tokenizers, trims the research context so prompt
+plus output fit the model's context window, and logs estimated against actual
+token usage.
+"""
+import os
+import re
+import math
+import logging
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Words, numbers and single punctuation marks, roughly how BPE tokenizers split text
+_PIECE_RE = re.compile(r"[A-Za-z]+|[0-9]+|[^\sA-Za-z0-9]")
+
+# Context windows in tokens when <PROVIDER>_CONTEXT_WINDOW is not set
+DEFAULT_CONTEXT_WINDOWS = {"ollama": 8192, "openrouter": 32768, "gemini": 1048576}
+
+# Approximate output tokens per part of a plan
+_HEADER_TOKENS = 250
+_WEEK_BASE_TOKENS = 60
+_WEEK_DEPTH_TOKENS = 30
+_RESOURCE_TOKENS = 70
+_GOALS_TOKENS = 100
+
+
+def count_tokens(text: str) -> int:
+    """
+    Approximate the token count of text without a model tokenizer
+
+    Common words are one token and long words one per ~6 letters; digits
+    split in groups of three and every punctuation mark is its own token.
+    """
+    tokens = 0
+    for piece in _PIECE_RE.findall(text):
+        if piece[0].isalpha():
+            tokens += 1 + (len(piece) - 1) // 6
+        elif piece[0].isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        else:
+            tokens += 1
+    return tokens
+
+
+def context_window(provider: str) -> int:
+    return int(os.getenv(f"{provider.upper()}_CONTEXT_WINDOW", str(DEFAULT_CONTEXT_WINDOWS.get(provider, 8192))))
+
+
+def _clamp(tokens: float) -> int:
+    """
+    Apply the safety margin, round up to a multiple of 64 and keep within TOKEN_BUDGET_MIN/MAX
+    """
+    tokens *= float(os.getenv("TOKEN_BUDGET_MARGIN", "1.3"))
+    tokens = math.ceil(tokens / 64) * 64
+    return max(int(os.getenv("TOKEN_BUDGET_MIN", "512")), min(int(os.getenv("TOKEN_BUDGET_MAX", "8192")), tokens))
+
+
+def week_tokens(depth_level: int) -> int:
+    """
+    Approximate output tokens of one milestone at a depth level (1-5)
+    """
+    return _WEEK_BASE_TOKENS + _WEEK_DEPTH_TOKENS * max(1, min(5, depth_level))
+
+
+def estimate_plan_tokens(duration_weeks: int,
+                         depth_level: int = 3,
+                         include_resources: bool = True,
+                         include_goals: bool = False) -> int:
+    """
+    Output token limit for a complete study plan
+    """
+    tokens = _HEADER_TOKENS + duration_weeks * week_tokens(depth_level)
+    if include_resources:
+        tokens += _RESOURCE_TOKENS * (3 + depth_level)
+    if include_goals:
+        tokens += _GOALS_TOKENS
+    return _clamp(tokens)
+
+
+def estimate_outline_tokens(duration_weeks: int,
+                            depth_level: int = 3,
+                            include_resources: bool = True,
+                            include_goals: bool = False) -> int:
+    """
+    Output token limit for a chunked plan's outline: the plan fields plus a short theme per week
+    """
+    tokens = _HEADER_TOKENS + duration_weeks * 15
+    if include_resources:
+        tokens += _RESOURCE_TOKENS * (3 + depth_level)
+    if include_goals:
+        tokens += _GOALS_TOKENS
+    return _clamp(tokens)
+
+
+def estimate_milestone_tokens(weeks: int, depth_level: int = 3) -> int:
+    """
+    Output token limit for a {"milestones": [...]} answer covering `weeks` weeks
+    """
+    return _clamp(weeks * week_tokens(depth_level) + 50)
+
+
+def estimate_goals_tokens() -> int:
+    """
+    Output token limit for a list of learning goals
+    """
+    return _clamp(_GOALS_TOKENS * 2)
+
+
+def fit_research_data(build_prompt: Callable[[Dict[str, Any]], str],
+                      research_data: Dict[str, Any],
+                      max_prompt_tokens: int) -> Tuple[str, int]:
+    """
+    Build a prompt, trimming the research context until it fits `max_prompt_tokens`
+
+    Sources are dropped from the least relevant end first, then related topics
+    and key concepts; the rest of the prompt is never cut.
+
+    Returns:
+        (prompt, its approximate token count)
+    """
+    data = dict(research_data)
+    sources = research_data.get("sources", [])
+    # Compressed research is already budgeted across all sources; otherwise prompts show the first five
+    data["sources"] = list(sources if research_data.get("compressed") else sources[:5])
+    prompt = build_prompt(data)
+    tokens = count_tokens(prompt)
+    trimmed = 0
+    while tokens > max_prompt_tokens:
+        if data["sources"]:
+            data["sources"].pop()
+        elif data.get("related_topics"):
+            data["related_topics"] = []
+        elif data.get("key_concepts"):
+            data["key_concepts"] = []
+        else:
+            break
+        trimmed += 1
+        prompt = build_prompt(data)
+        tokens = count_tokens(prompt)
+    if trimmed:
+        metrics.increment("token_budget.research_trimmed")
+        logger.info(f"Trimmed research context {trimmed} times to fit {max_prompt_tokens} prompt tokens (now {tokens})")
+    return prompt, tokens
+
+
+def budget_study_plan_prompt(ai_service: Any,
+                             topic: str,
+                             research_data: Dict[str, Any],
+                             duration_weeks: int,
+                             depth_level: int,
+                             learning_style: Optional[str],
+                             prior_knowledge: Optional[str],
+                             include_goals: bool = False,
+                             include_resources: bool = True) -> Tuple[str, int]:
+    """
+    Build a provider's study plan prompt sized to its context window
+
+    Returns:
+        (prompt, output token limit for the call)
+    """
+    max_tokens = estimate_plan_tokens(duration_weeks, depth_level, include_resources, include_goals)
+    window = getattr(ai_service, "context_window", DEFAULT_CONTEXT_WINDOWS["ollama"])
+    prompt, prompt_tokens = fit_research_data(
+        lambda data: ai_service.build_study_plan_prompt(
+            topic, data, duration_weeks, depth_level, learning_style, prior_knowledge,
+            include_goals=include_goals, include_resources=include_resources
+        ),
+        research_data,
+        window - max_tokens
+    )
+    logger.info(f"Token budget for {topic}: ~{prompt_tokens} prompt + {max_tokens} output of {window}")
+    return prompt, max_tokens
+
+
+def record_usage(provider: str,
+                 prompt: str,
+                 max_tokens: int,
+                 prompt_tokens: Optional[int],
+                 output_tokens: Optional[int],
+                 truncated: bool = False,
+                 cached_tokens: Optional[int] = None,
+                 prefill_seconds: Optional[float] = None) -> None:
+    """
+    Log estimated against actual token usage reported by a provider
+
+    `cached_tokens` is the part of the prompt served from the provider's prompt
+    or KV cache; prefill time is recorded separately for cached and uncached prompts.
+    """
+    estimated_prompt = count_tokens(prompt)
+    logger.info(f"{provider} token usage: prompt ~{estimated_prompt} estimated / {prompt_tokens} actual "
+                f"({cached_tokens or 0} cached), "
+                f"output {output_tokens} of {max_tokens} budgeted{' (truncated)' if truncated else ''}")
+    if cached_tokens is not None:
+        metrics.observe(f"prompt_cache.{provider}.cached_tokens", cached_tokens)
+    if prefill_seconds is not None:
+        metrics.observe(f"prompt_cache.{provider}.prefill_seconds.{'cached' if cached_tokens else 'uncached'}",
+                        prefill_seconds)
+    if prompt_tokens:
+        metrics.observe(f"token_budget.{provider}.prompt_estimate_ratio", estimated_prompt / prompt_tokens)
+    if output_tokens is not None and max_tokens:
+        metrics.observe(f"token_budget.{provider}.output_utilization", output_tokens / max_tokens)
+    if truncated:
+        metrics.increment(f"token_budget.{provider}.truncated")
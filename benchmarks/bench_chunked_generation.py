@@ -0,0 +1,131 @@
+"""
+Benchmark: latency and success rate of single-call vs chunked plan generation.
+
+Drives `StudyPlanService.generate_plan` against a simulated provider that
+decodes at a fixed token rate, serves a limited number of requests in
+parallel, cuts every response off at its output token limit and fails a
+fraction of calls. For durations from 4 to 52 weeks it reports the mean
+latency, the LLM calls per plan and the success rate (share of weeks that
+got a generated milestone rather than a fallback or outline placeholder)
+with chunked generation off and on.
+
+Usage:
+    python -m benchmarks.bench_chunked_generation [--rounds 3] [--tokens-per-second 400] [--max-tokens 4000]
+        [--parallel 4] [--error-rate 0.05] [--durations 4,8,12,26,52]
+"""
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+
+from app.services.plan_repair import complete_study_plan
+from app.services.study_plan_service import StudyPlanService
+
+# Rough output size of each part of a plan
+_HEADER_TOKENS = 350
+_MILESTONE_TOKENS = 140
+_THEME_TOKENS = 12
+
+
+def _milestone(week: int) -> dict:
+    return {"title": f"Week {week}: Topic {week}", "description": "Generated " + "detail " * 60, "week": week,
+            "tasks": [f"Task {i}" for i in range(4)], "estimated_hours": 8}
+
+
+class SimulatedProvider:
+    """
+    Provider answering plan, outline and chunk prompts at a fixed decode rate, with truncation and failures
+    """
+    model = "simulated"
+
+    def __init__(self, tokens_per_second: float, max_tokens: int, parallel: int, error_rate: float, seed: int = 0):
+        self.tokens_per_second = tokens_per_second
+        self.max_tokens = max_tokens
+        self.error_rate = error_rate
+        self.slots = asyncio.Semaphore(parallel)
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    def _answer(self, prompt: str):
+        weeks = re.search(r"Write the milestones for weeks (\d+) to (\d+)", prompt)
+        if weeks:
+            first, last = int(weeks.group(1)), int(weeks.group(2))
+            return {"milestones": [_milestone(week) for week in range(first, last + 1)]}, (last - first + 1) * _MILESTONE_TOKENS
+        followup = re.search(r"one milestone for each of weeks ([\d, ]+)", prompt)
+        if followup:
+            listed = [int(week) for week in followup.group(1).split(",")]
+            return {"milestones": [_milestone(week) for week in listed]}, len(listed) * _MILESTONE_TOKENS
+        duration = int(re.search(r"Duration: (\d+) weeks", prompt).group(1))
+        header = {"topic": "Topic", "summary": "A plan", "duration_weeks": duration,
+                  "learning_objectives": ["Objective"], "key_concepts": ["Concept"], "resources": []}
+        if "Outline the plan" in prompt:
+            header["weeks"] = [{"week": week, "theme": f"Topic {week}"} for week in range(1, duration + 1)]
+            return header, _HEADER_TOKENS + duration * _THEME_TOKENS
+        header["milestones"] = [_milestone(week) for week in range(1, duration + 1)]
+        return header, _HEADER_TOKENS + duration * _MILESTONE_TOKENS
+
+    async def generate_content(self, prompt, schema=None, max_tokens=None):
+        self.calls += 1
+        answer, tokens = self._answer(prompt)
+        limit = min(self.max_tokens, max_tokens or self.max_tokens)
+        async with self.slots:
+            await asyncio.sleep(min(tokens, limit) / self.tokens_per_second)
+        if self.random.random() < self.error_rate:
+            return "Error: simulated upstream failure"
+        text = json.dumps(answer)
+        if tokens > limit:
+            text = text[:int(len(text) * limit / tokens)]
+        return text
+
+    async def create_study_plan(self, topic, research_data, duration_weeks=4, depth_level=3,
+                                learning_style=None, prior_knowledge=None, generate_goals=False,
+                                include_resources=True):
+        result = await self.generate_content(f"Duration: {duration_weeks} weeks")
+        plan = await complete_study_plan(self, result, topic, duration_weeks, generate_goals, "simulated")
+        return plan if plan is not None else {"topic": topic, "summary": "[FALLBACK TEMPLATE]", "milestones": []}
+
+
+async def measure(chunked: bool, duration: int, rounds: int, args):
+    os.environ["CHUNKED_GENERATION_MIN_WEEKS"] = "1" if chunked else "0"
+    service = StudyPlanService()
+    provider = SimulatedProvider(args.tokens_per_second, args.max_tokens, args.parallel, args.error_rate)
+    generated_weeks = 0
+    started = time.perf_counter()
+    for i in range(rounds):
+        plan = await service.generate_plan(
+            ai_service=provider,
+            topic=f"Topic {chunked} {duration} {i}",
+            research_data={"sources": []},
+            duration_weeks=duration
+        )
+        generated_weeks += sum(1 for milestone in plan.get("milestones", [])
+                               if milestone.get("description", "").startswith("Generated"))
+    return (time.perf_counter() - started) / rounds, provider.calls / rounds, generated_weeks / (rounds * duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--tokens-per-second", type=float, default=400.0, help="Simulated decode rate per request")
+    parser.add_argument("--max-tokens", type=int, default=4000, help="Output token limit per response")
+    parser.add_argument("--parallel", type=int, default=4, help="Requests the simulated server decodes at once")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Share of calls that fail")
+    parser.add_argument("--durations", default="4,8,12,26,52")
+    args = parser.parse_args()
+
+    os.environ["USE_AI_GENERATION"] = "true"
+    os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+    print(f"{args.tokens_per_second:.0f} tokens/s, max {args.max_tokens} output tokens, {args.parallel} parallel, "
+          f"{args.error_rate:.0%} errors, {args.rounds} plans per cell")
+    print(f"{'weeks':>6}{'mode':>10}{'mean latency':>15}{'LLM calls':>12}{'success':>10}")
+    for duration in [int(value) for value in args.durations.split(",")]:
+        for chunked in (False, True):
+            latency, calls, success = asyncio.run(measure(chunked, duration, args.rounds, args))
+            print(f"{duration:>6}{'chunked' if chunked else 'single':>10}{latency:>14.2f}s{calls:>12.1f}{success:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: study plan latency with learning goals in each goal generation mode.
+
+Drives `StudyPlanService.generate_plan(generate_goals=True)` against a stub
+provider whose calls sleep for a fixed latency, and reports the mean
+end-to-end latency and the number of LLM calls per plan for the
+"sequential", "concurrent" and "inline" modes.
+
+Usage:
+    python -m benchmarks.bench_goal_generation [--rounds 10] [--plan-latency 0.5] [--goals-latency 0.3]
+"""
+import os
+import time
+import asyncio
+import argparse
+
+from app.services.study_plan_service import StudyPlanService, GOAL_GENERATION_MODES
+
+
+class StubProvider:
+    """
+    Provider whose plan and goal calls take a fixed time; inline goals add a few output tokens
+    """
+    model = "stub"
+
+    def __init__(self, plan_latency: float, goals_latency: float):
+        self.plan_latency = plan_latency
+        self.goals_latency = goals_latency
+        self.calls = 0
+
+    async def create_study_plan(self, topic, research_data, duration_weeks=4, depth_level=3,
+                                learning_style=None, prior_knowledge=None, generate_goals=False,
+                                include_resources=True):
+        self.calls += 1
+        # Writing the goals inside the plan costs about as much as their share of the goals call's decode time
+        await asyncio.sleep(self.plan_latency + (self.goals_latency * 0.2 if generate_goals else 0.0))
+        plan = {
+            "topic": topic,
+            "summary": f"A plan for {topic}",
+            "duration_weeks": duration_weeks,
+            "learning_objectives": [f"Understand {topic}"],
+            "key_concepts": [topic],
+            "milestones": [],
+        }
+        if generate_goals:
+            plan["goals"] = [f"Build a project with {topic}"]
+        return plan
+
+    async def generate_learning_goals(self, topic, duration_weeks, prior_knowledge):
+        self.calls += 1
+        await asyncio.sleep(self.goals_latency)
+        return [f"Build a project with {topic}"]
+
+
+async def measure(mode: str, rounds: int, plan_latency: float, goals_latency: float):
+    os.environ["GOAL_GENERATION_MODE"] = mode
+    service = StudyPlanService()
+    provider = StubProvider(plan_latency, goals_latency)
+    started = time.perf_counter()
+    for i in range(rounds):
+        await service.generate_plan(
+            ai_service=provider,
+            topic=f"Topic {mode} {i}",
+            research_data={"sources": []},
+            generate_goals=True
+        )
+    return (time.perf_counter() - started) / rounds, provider.calls / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--plan-latency", type=float, default=0.5, help="Seconds per plan call")
+    parser.add_argument("--goals-latency", type=float, default=0.3, help="Seconds per goals call")
+    args = parser.parse_args()
+
+    os.environ["USE_AI_GENERATION"] = "true"
+    print(f"plan call {args.plan_latency:.2f}s, goals call {args.goals_latency:.2f}s, {args.rounds} plans per mode")
+    print(f"{'mode':<12}{'mean latency':>14}{'LLM calls':>12}")
+    for mode in ("sequential", "concurrent", "inline"):
+        assert mode in GOAL_GENERATION_MODES
+        latency, calls = asyncio.run(measure(mode, args.rounds, args.plan_latency, args.goals_latency))
+        print(f"{mode:<12}{latency * 1000:>12.1f}ms{calls:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: event-loop blocking caused by HTML parsing.
+
+Parses the recorded fixture pages concurrently with each executor mode and
+reports how long the event loop was blocked while doing so.
+
+Usage:
+    python -m benchmarks.bench_html_parsing [--rounds 50]
+"""
+import os
+import time
+import asyncio
+import argparse
+import glob
+
+from app.utils.html_parsing import (
+    run_parser, extract_page_text, shutdown_parse_executor, get_parser_backend
+)
+from app.utils.loop_monitor import EventLoopLagMonitor
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_pages():
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    return pages
+
+
+async def run_mode(mode: str, pages, rounds: int):
+    os.environ["HTML_PARSE_EXECUTOR"] = mode
+    shutdown_parse_executor()
+    monitor = EventLoopLagMonitor(interval=0.005, metric_name=f"bench.{mode}.lag")
+    monitor.start()
+    # Let the monitor take a baseline sample before the work starts
+    await asyncio.sleep(0.02)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_parser(extract_page_text, page, 5000)
+        for _ in range(rounds)
+        for page in pages
+    ))
+    elapsed = time.perf_counter() - started
+
+    await asyncio.sleep(0.02)
+    await monitor.stop()
+    shutdown_parse_executor()
+    return elapsed, monitor.max_lag, monitor.total_lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    pages = load_pages()
+    print(f"Parser backend: {get_parser_backend()}, {len(pages)} fixture pages x {args.rounds} rounds")
+    print(f"{'mode':<8} {'elapsed (s)':>12} {'max lag (ms)':>14} {'total lag (ms)':>16}")
+    for mode in ["inline", "thread", "process"]:
+        elapsed, max_lag, total_lag = asyncio.run(run_mode(mode, pages, args.rounds))
+        print(f"{mode:<8} {elapsed:>12.3f} {max_lag * 1000:>14.1f} {total_lag * 1000:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: prompt tokens Ollama prefills for a plan's follow-up calls.
+
+Drives `StudyPlanService.generate_plan` against OllamaService with a
+simulated Ollama server. Like llama.cpp, the simulated server keeps the KV
+cache of the last sequence it evaluated and only prefills the tokens after
+the prefix a new sequence shares with it. The plan response is cut short so a
+repair follow-up runs. For each OLLAMA_SESSION_REUSE mode it reports, per
+plan, the tokens of context the follow-ups saw, the tokens prefilled and
+reused, and the prefill time implied by --prefill-tokens-per-second. "chat,
+cold" clears the cache before each follow-up, as when the model was unloaded,
+which is what sending the same history costs without reuse.
+
+Usage:
+    python -m benchmarks.bench_ollama_session [--plans 5] [--weeks 8] [--prefill-tokens-per-second 150]
+"""
+import os
+import json
+import asyncio
+import argparse
+
+import httpx
+
+from benchmarks.bench_research_compression import load_research
+from app.services.http_client_registry import http_registry
+from app.services.ollama_service import OllamaService
+from app.services.study_plan_service import StudyPlanService
+from app.utils.token_budget import count_tokens
+
+TOPICS = ["machine learning", "python programming", "javascript", "data science", "statistics", "linear algebra"]
+
+
+def _plan(topic: str, weeks: int) -> dict:
+    return {"topic": topic, "summary": f"Learn {topic}", "duration_weeks": weeks,
+            "learning_objectives": [f"Apply {topic}"], "key_concepts": ["Basics"],
+            "milestones": [{"title": f"Week {week}: Part {week}", "description": "Study " + "detail " * 40,
+                            "week": week, "tasks": ["Read", "Practice"], "estimated_hours": 6}
+                           for week in range(1, weeks + 1)]}
+
+
+class SimulatedOllama:
+    """
+    Ollama server with a single KV cache slot that reuses the longest shared prefix
+    """
+
+    def __init__(self, weeks: int, cold_follow_ups: bool):
+        self.weeks = weeks
+        self.cold_follow_ups = cold_follow_ups
+        self.cache = ""
+        self.contexts = {}
+        self.follow_ups = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if request.url.path == "/api/chat":
+            sequence = "".join(message["content"] for message in body["messages"])
+            prompt = body["messages"][-1]["content"]
+        else:
+            sequence = self.contexts.get(tuple(body.get("context") or ()), "") + body["prompt"]
+            prompt = body["prompt"]
+        follow_up = request.url.path == "/api/chat" or "context" in body or "one milestone for each of weeks" in prompt
+        if follow_up and self.cold_follow_ups:
+            self.cache = ""
+        shared = os.path.commonprefix([self.cache, sequence])
+        evaluated = count_tokens(sequence[len(shared):])
+        if follow_up:
+            self.follow_ups.append((count_tokens(sequence), evaluated))
+
+        text = self._answer(prompt)
+        self.cache = sequence + text
+        context = [len(self.contexts)]
+        self.contexts[tuple(context)] = self.cache
+        usage = {"prompt_eval_count": evaluated, "eval_count": count_tokens(text), "done_reason": "stop",
+                 "prompt_eval_duration": 0, "context": context}
+        if request.url.path == "/api/chat":
+            return httpx.Response(200, json={"message": {"role": "assistant", "content": text}, **usage})
+        return httpx.Response(200, json={"response": text, **usage})
+
+    def _answer(self, prompt: str) -> str:
+        if "one milestone for each of weeks" in prompt:
+            return json.dumps({"milestones": _plan("topic", self.weeks)["milestones"][-2:]})
+        # Cut off inside the last two weeks, as a plan hitting its output limit would be
+        text = json.dumps(_plan("topic", self.weeks))
+        return text[:text.index(f'"week": {self.weeks - 1}')]
+
+
+async def run(mode: str, cold: bool, plans: int, weeks: int):
+    server = SimulatedOllama(weeks, cold)
+    http_registry.get_client = lambda upstream: httpx.AsyncClient(transport=httpx.MockTransport(server.handle))
+    os.environ["OLLAMA_SESSION_REUSE"] = mode
+    research_data = load_research()
+    for topic in TOPICS[:plans]:
+        await StudyPlanService().generate_plan(ai_service=OllamaService(), topic=topic, research_data=research_data,
+                                               duration_weeks=weeks)
+    return server.follow_ups
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plans", type=int, default=5)
+    parser.add_argument("--weeks", type=int, default=8)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=150.0,
+                        help="Prompt processing rate used to estimate prefill time (local CPU inference)")
+    args = parser.parse_args()
+
+    os.environ.update(USE_AI_GENERATION="true", GENERATION_CACHE_ENABLED="false",
+                      SEMANTIC_CACHE_ENABLED="false", CHUNKED_GENERATION_MIN_WEEKS="0")
+    print(f"{args.plans} plans of {args.weeks} weeks, prefill at {args.prefill_tokens_per_second:.0f} tokens/s")
+    print(f"{'mode':<14}{'follow-ups':>11}{'context':>9}{'prefilled':>11}{'reused':>8}{'est. prefill':>14}")
+    for label, mode, cold in (("off", "off", False), ("chat", "chat", False), ("context", "context", False),
+                              ("chat, cold", "chat", True)):
+        follow_ups = asyncio.run(run(mode, cold, args.plans, args.weeks))
+        context = sum(total for total, _ in follow_ups) / args.plans
+        prefilled = sum(evaluated for _, evaluated in follow_ups) / args.plans
+        print(f"{label:<14}{len(follow_ups) / args.plans:>11.1f}{context:>9.0f}{prefilled:>11.0f}"
+              f"{context - prefilled:>8.0f}{prefilled / args.prefill_tokens_per_second:>13.2f}s")
+
+
+if __name__ == "__main__":
+    main()
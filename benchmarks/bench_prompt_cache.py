@@ -0,0 +1,96 @@
+"""
+Benchmark: prompt prefill with the static prefix first versus the request first.
+
+Builds study plan prompts for several topics from the recorded fixture pages,
+once in the prefix-stable layout (instructions and JSON format first) and once
+with the request details first, as the prompts were laid out before. A
+KV-prefix cache such as llama.cpp's only evaluates the tokens after the part a
+prompt shares with the previous one; the benchmark reports those tokens and the
+prefill time implied by --prefill-tokens-per-second. With --live, it generates
+plans with the configured AI_PROVIDER and reports the prefill time and cached
+tokens the provider recorded for cached and uncached prompts.
+
+Usage:
+    python -m benchmarks.bench_prompt_cache [--prefill-tokens-per-second 150]
+    python -m benchmarks.bench_prompt_cache --live
+"""
+import os
+import asyncio
+import argparse
+
+from benchmarks.bench_research_compression import load_research
+from app.utils.metrics import metrics
+from app.utils.prompt_templates import build_study_plan_prompt, request_details, study_plan_prefix
+from app.utils.token_budget import count_tokens
+
+TOPICS = ["machine learning", "python programming", "javascript", "data science", "statistics", "linear algebra"]
+
+
+def request_first_prompt(topic, research_data):
+    return request_details(topic, research_data, 4, 3, None, None) + study_plan_prefix()
+
+
+def prefix_first_prompt(topic, research_data):
+    return build_study_plan_prompt(topic, research_data, 4, 3, None, None)
+
+
+def evaluated_tokens(prompts):
+    """
+    Tokens evaluated per prompt when each reuses the KV cache of the one before
+    """
+    evaluated, previous = [], ""
+    for prompt in prompts:
+        shared = os.path.commonprefix([previous, prompt])
+        evaluated.append(count_tokens(prompt[len(shared):]))
+        previous = prompt
+    return evaluated
+
+
+async def bench_live(research_data) -> None:
+    from app.services.ai_service_factory import get_ai_service
+
+    os.environ["GENERATION_CACHE_ENABLED"] = "false"
+    provider = os.getenv("AI_PROVIDER", "ollama")
+    service = get_ai_service()
+    metrics.reset()
+    for topic in TOPICS:
+        await service.create_study_plan(topic, research_data, duration_weeks=4)
+
+    observations = metrics.snapshot()["observations"]
+    print(f"\nLive generation with AI_PROVIDER={provider}, {len(TOPICS)} plans")
+    print(f"{'prompts':<12}{'calls':>7}{'mean prefill':>14}")
+    for label in ("uncached", "cached"):
+        stats = observations.get(f"prompt_cache.{provider}.prefill_seconds.{label}")
+        if stats:
+            print(f"{label:<12}{stats['count']:>7}{stats['avg']:>13.2f}s")
+        else:
+            print(f"{label:<12}{0:>7}{'-':>14}")
+    cached = observations.get(f"prompt_cache.{provider}.cached_tokens")
+    if cached:
+        print(f"mean cached prompt tokens: {cached['avg']:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=150.0,
+                        help="Prompt processing rate used to estimate prefill time (local CPU inference)")
+    parser.add_argument("--live", action="store_true", help="Also generate plans with the configured provider")
+    args = parser.parse_args()
+
+    research_data = load_research()
+    print(f"{len(TOPICS)} plan prompts, prefill at {args.prefill_tokens_per_second:.0f} tokens/s")
+    print(f"{'layout':<14}{'prompt tokens':>15}{'evaluated':>11}{'est. prefill':>14}")
+    for label, build in (("request first", request_first_prompt), ("prefix first", prefix_first_prompt)):
+        prompts = [build(topic, research_data) for topic in TOPICS]
+        total = sum(count_tokens(prompt) for prompt in prompts) / len(prompts)
+        # The first prompt always runs cold, so only the later ones show reuse
+        evaluated = evaluated_tokens(prompts)[1:]
+        mean = sum(evaluated) / len(evaluated)
+        print(f"{label:<14}{total:>15.0f}{mean:>11.0f}{mean / args.prefill_tokens_per_second:>13.2f}s")
+
+    if args.live:
+        asyncio.run(bench_live(research_data))
+
+
+if __name__ == "__main__":
+    main()
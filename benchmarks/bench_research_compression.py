@@ -0,0 +1,89 @@
+"""
+Benchmark: prompt size and generation latency with and without research compression.
+
+Builds research sources from the recorded fixture pages the way the research
+service does (page text cut to 1000 characters), then builds the study plan
+prompt from the raw sources (first 300 characters of five sources) and from the
+extractively compressed sources. Reports prompt tokens, compression time and
+the prefill time implied by --prefill-tokens-per-second. With --live, it also
+generates plans with the configured AI_PROVIDER from both prompts and reports
+the mean generation latency.
+
+Usage:
+    python -m benchmarks.bench_research_compression [--rounds 200] [--budget 200] [--prefill-tokens-per-second 150]
+    python -m benchmarks.bench_research_compression --live [--plans 3]
+"""
+import os
+import glob
+import time
+import asyncio
+import argparse
+
+from app.services.ollama_service import OllamaService
+from app.utils.extractive_summary import compress_research
+from app.utils.html_parsing import extract_page_text
+from app.utils.token_budget import count_tokens
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+TOPIC = "machine learning"
+
+
+def load_research():
+    sources = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html"))):
+        if os.path.basename(path).startswith("duckduckgo"):
+            continue
+        with open(path, encoding="utf-8") as f:
+            text = extract_page_text(f.read(), 5000)
+        sources.append({"title": os.path.basename(path)[:-len(".html")], "url": path, "summary": text[:1000]})
+    return {"sources": sources, "key_concepts": [], "related_topics": []}
+
+
+def build_prompt(research_data):
+    return OllamaService().build_study_plan_prompt(TOPIC, research_data, 4, 3, None, None)
+
+
+async def bench_live(raw, compressed, plans: int) -> None:
+    from app.services.ai_service_factory import get_ai_service
+
+    os.environ["GENERATION_CACHE_ENABLED"] = "false"
+    service = get_ai_service()
+    print(f"\nLive generation with AI_PROVIDER={os.getenv('AI_PROVIDER', 'ollama')}, {plans} plans per prompt")
+    print(f"{'research':<12}{'s/plan':>9}")
+    for label, research_data in (("raw", raw), ("compressed", compressed)):
+        started = time.perf_counter()
+        for _ in range(plans):
+            await service.create_study_plan(TOPIC, research_data, duration_weeks=4)
+        print(f"{label:<12}{(time.perf_counter() - started) / plans:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=200, help="Research context token budget")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=150.0,
+                        help="Prompt processing rate used to estimate prefill time (local CPU inference)")
+    parser.add_argument("--live", action="store_true", help="Also generate plans with the configured provider")
+    parser.add_argument("--plans", type=int, default=3, help="Plans generated per prompt with --live")
+    args = parser.parse_args()
+
+    os.environ["RESEARCH_COMPRESSION"] = "true"
+    raw = load_research()
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        compressed = compress_research(raw, TOPIC, args.budget)
+    compress_ms = (time.perf_counter() - started) / args.rounds * 1000
+
+    print(f"{len(raw['sources'])} fixture sources, budget {args.budget} tokens, "
+          f"prefill at {args.prefill_tokens_per_second:.0f} tokens/s")
+    print(f"{'research':<12}{'prompt tokens':>15}{'est. prefill':>14}{'compress':>11}")
+    for label, research_data, overhead in (("raw", raw, 0.0), ("compressed", compressed, compress_ms)):
+        tokens = count_tokens(build_prompt(research_data))
+        print(f"{label:<12}{tokens:>15}{tokens / args.prefill_tokens_per_second:>13.2f}s{overhead:>9.2f}ms")
+
+    if args.live:
+        asyncio.run(bench_live(raw, compressed, args.plans))
+
+
+if __name__ == "__main__":
+    main()
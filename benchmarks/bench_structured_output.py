@@ -0,0 +1,97 @@
+"""
+Benchmark: plan parse time and fallback rate for each structured-output mode.
+
+Offline, it parses a representative response for each mode: prompt-only
+responses ("off") wrap the JSON in prose and a code fence, JSON-mode responses
+("json", "schema") are the bare object. With --live, it also generates plans
+with the configured AI_PROVIDER in every mode and reports the fallback rate and
+mean parse time recorded by the providers.
+
+Usage:
+    python -m benchmarks.bench_structured_output [--rounds 2000] [--weeks 12]
+    python -m benchmarks.bench_structured_output --live [--plans 5]
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+
+from app.utils.json_stream import parse_study_plan_json
+from app.utils.metrics import metrics
+from app.utils.structured_output import STRUCTURED_OUTPUT_MODES
+
+TOPICS = ["Python programming", "Linear algebra", "Web accessibility", "Music theory", "Kubernetes"]
+
+
+def sample_plan(weeks: int):
+    return {
+        "topic": "Python programming",
+        "summary": "A structured path from syntax to packaging",
+        "duration_weeks": weeks,
+        "learning_objectives": [f"Objective {i}" for i in range(5)],
+        "key_concepts": [f"Concept {i}" for i in range(8)],
+        "milestones": [
+            {"title": f"Week {week}: Topic {week}", "description": f"Study block {week}", "week": week,
+             "tasks": [f"Task {week}.{i}" for i in range(4)], "estimated_hours": 8}
+            for week in range(1, weeks + 1)
+        ],
+        "resources": [{"title": f"Resource {i}", "url": f"https://example.com/{i}", "type": "article",
+                       "description": "Reference material"} for i in range(6)],
+        "recommendations": "Practice daily"
+    }
+
+
+def sample_response(mode: str, weeks: int) -> str:
+    body = json.dumps(sample_plan(weeks), indent=2)
+    if mode == "off":
+        return f"Sure! Here is a detailed study plan for you:\n```json\n{body}\n```\nGood luck with your studies!"
+    return body
+
+
+def bench_parse(rounds: int, weeks: int) -> None:
+    print(f"Parse time over {rounds} responses ({weeks}-week plan)")
+    print(f"{'mode':<10}{'bytes':>8}{'us/parse':>12}")
+    for mode in STRUCTURED_OUTPUT_MODES:
+        text = sample_response(mode, weeks)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            parse_study_plan_json(text)
+        elapsed = (time.perf_counter() - started) / rounds
+        print(f"{mode:<10}{len(text):>8}{elapsed * 1e6:>12.1f}")
+
+
+async def bench_live(plans: int) -> None:
+    from app.services.ai_service_factory import get_ai_service
+
+    os.environ["GENERATION_CACHE_ENABLED"] = "false"
+    print(f"\nLive generation with AI_PROVIDER={os.getenv('AI_PROVIDER', 'ollama')}, {plans} plans per mode")
+    print(f"{'mode':<10}{'fallback rate':>15}{'ms/parse':>10}{'s/plan':>9}")
+    for mode in STRUCTURED_OUTPUT_MODES:
+        os.environ["STRUCTURED_OUTPUT"] = mode
+        service = get_ai_service()
+        started = time.perf_counter()
+        for i in range(plans):
+            await service.create_study_plan(TOPICS[i % len(TOPICS)], {"sources": []}, duration_weeks=4)
+        elapsed = (time.perf_counter() - started) / plans
+        snapshot = metrics.snapshot()
+        fallbacks = snapshot["counters"].get(f"structured_output.{mode}.fallbacks", 0)
+        parse = snapshot["observations"].get(f"structured_output.{mode}.parse_seconds", {"avg": 0.0})
+        print(f"{mode:<10}{fallbacks / plans:>15.0%}{parse['avg'] * 1000:>10.2f}{elapsed:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--weeks", type=int, default=12)
+    parser.add_argument("--live", action="store_true", help="Also generate plans with the configured provider")
+    parser.add_argument("--plans", type=int, default=5, help="Plans generated per mode with --live")
+    args = parser.parse_args()
+
+    bench_parse(args.rounds, args.weeks)
+    if args.live:
+        asyncio.run(bench_live(args.plans))
+
+
+if __name__ == "__main__":
+    main()
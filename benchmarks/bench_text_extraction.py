@@ -0,0 +1,112 @@
+"""
+Benchmark: key-concept and related-topic extraction throughput.
+
+Runs the extraction engine over the text of the recorded fixture pages and the
+recorded search results page, next to the previous substring/set-based
+implementation, and reports documents per second.
+
+Usage:
+    python -m benchmarks.bench_text_extraction [--rounds 200]
+"""
+import os
+import time
+import glob
+import argparse
+
+from app.utils.html_parsing import extract_page_text, parse_search_results
+from app.utils.text_extraction import extract_key_concepts, find_related_topics
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+TOPIC = "machine learning"
+
+
+def load_fixtures():
+    texts = []
+    search_results = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        if os.path.basename(path).startswith("duckduckgo"):
+            search_results = parse_search_results(html, max_results=50)
+        else:
+            texts.append(extract_page_text(html, 5000))
+    return texts, search_results
+
+
+def legacy_key_concepts(summaries):
+    key_concepts = set()
+    for summary in summaries:
+        for sentence in summary.split('.'):
+            if any(phrase in sentence.lower() for phrase in [
+                ' is ', ' are ', ' refers to ', ' defined as ', ' means ',
+                ' consists of ', ' includes '
+            ]):
+                concept = sentence.strip()
+                if 30 < len(concept) < 200 and concept not in key_concepts:
+                    key_concepts.add(concept)
+    return sorted(list(key_concepts), key=len)[:10]
+
+
+def legacy_related_topics(main_topic, search_results):
+    related_topics = set()
+    main_words = set(main_topic.lower().split())
+    for result in search_results:
+        title_words = result.get('title', '').split()
+        for i in range(len(title_words) - 1):
+            if i < len(title_words) - 2:
+                phrase = f"{title_words[i]} {title_words[i+1]} {title_words[i+2]}"
+                if phrase.lower() not in main_topic.lower() and all(word.lower() not in main_words for word in phrase.split()):
+                    related_topics.add(phrase)
+            phrase = f"{title_words[i]} {title_words[i+1]}"
+            if phrase.lower() not in main_topic.lower() and all(word.lower() not in main_words for word in phrase.split()):
+                related_topics.add(phrase)
+    common_words = {'and', 'the', 'for', 'with', 'this', 'that', 'what', 'how', 'why'}
+    filtered_topics = []
+    for topic in related_topics:
+        words = topic.lower().split()
+        if (len(words) >= 2 and
+                not any(word in common_words for word in words) and
+                not all(c.isdigit() or c in '.,;:?!' for c in topic)):
+            filtered_topics.append(topic.strip('.,;:?!'))
+    return filtered_topics[:5]
+
+
+def measure(func, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    texts, search_results = load_fixtures()
+    cases = [
+        ("key concepts", len(texts),
+         lambda: legacy_key_concepts(texts),
+         lambda: extract_key_concepts(texts)),
+        ("related topics", len(search_results),
+         lambda: legacy_related_topics(TOPIC, search_results),
+         lambda: find_related_topics(TOPIC, search_results)),
+    ]
+
+    print(f"{len(texts)} fixture pages, {len(search_results)} search results, {args.rounds} rounds")
+    print(f"{'stage':<16} {'impl':<8} {'docs/sec':>12}")
+    for name, docs, legacy, current in cases:
+        for impl, func in (("legacy", legacy), ("engine", current)):
+            elapsed = measure(func, args.rounds)
+            print(f"{name:<16} {impl:<8} {docs * args.rounds / elapsed:>12.0f}")
+
+    print("\nTop key concepts:")
+    for concept in extract_key_concepts(texts)[:5]:
+        print(f"  - {concept}")
+    print("Related topics:")
+    for topic in find_related_topics(TOPIC, search_results):
+        print(f"  - {topic}")
+
+
+if __name__ == "__main__":
+    main()
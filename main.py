@@ -1,6 +1,7 @@
 import os
 import logging
 import sys
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
@@ -11,6 +12,13 @@ from dotenv import load_dotenv
 from app.api.router import router as api_router
 from app.api.settings_router import router as settings_router
 from app.api.facial_analysis_router import facial_analysis_router
+from app.api.admin_router import router as admin_router
+from app.services.http_client_registry import http_registry
+from app.services.generation_cache import bypass_generation_cache, wants_cache_bypass
+from app.services.provider_health import ProviderHealthProber
+from app.utils.circuit_breaker import breaker_states
+from app.utils.html_parsing import shutdown_parse_executor
+from app.utils.loop_monitor import EventLoopLagMonitor
 
 # Load environment variables
 load_dotenv()
@@ -48,11 +56,30 @@ else:
     logger.info("Using placeholder generation (no AI)")
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pooled HTTP clients are created lazily and closed when the app shuts down
+    logger.info(f"HTTP pool limits: {http_registry.stats()['limits']}, HTTP/2 enabled: {http_registry.http2_enabled}")
+    # Track event-loop blocking so regressions (e.g. parsing on the loop) show up in /api/admin/stats
+    loop_monitor = EventLoopLagMonitor()
+    loop_monitor.start()
+    # Close provider circuit breakers again once their health endpoints recover
+    health_prober = ProviderHealthProber()
+    health_prober.start()
+    yield
+    await health_prober.stop()
+    await loop_monitor.stop()
+    await http_registry.aclose()
+    shutdown_parse_executor()
+    logger.info("Closed pooled HTTP clients and parsing workers")
+
+
 # Create FastAPI app
 app = FastAPI(
     title="StudyplannerAI",
     description="AI-powered study plan generator based on research and user prompts",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -64,6 +91,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Let clients force a fresh LLM generation with "X-Bypass-Cache: true" or "Cache-Control: no-cache"
+@app.middleware("http")
+async def generation_cache_bypass(request: Request, call_next):
+    token = bypass_generation_cache.set(wants_cache_bypass(request.headers))
+    try:
+        return await call_next(request)
+    finally:
+        bypass_generation_cache.reset(token)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -74,6 +110,7 @@ templates = Jinja2Templates(directory="templates")
 app.include_router(api_router, prefix="/api")
 app.include_router(settings_router)
 app.include_router(facial_analysis_router, prefix="/api")
+app.include_router(admin_router, prefix="/api/admin")
 
 # Root route
 @app.get("/")
@@ -94,7 +131,7 @@ async def login(request: Request):
 # Health check
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "circuit_breakers": breaker_states()}
 
 if __name__ == "__main__":
     import uvicorn
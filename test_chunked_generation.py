@@ -0,0 +1,115 @@
+"""
+Tests for chunked (map-reduce) generation of long study plans
+"""
+import re
+import json
+import asyncio
+
+from app.models import StudyPlanResponse
+from app.services.chunked_generation import generate_chunked_plan, iter_chunked_plan, merge_milestones, week_chunks
+from app.services.study_plan_service import StudyPlanService
+
+
+def _milestone(week):
+    return {"title": f"Week {week}", "description": "Study", "week": week, "tasks": ["Read"], "estimated_hours": 5}
+
+
+class ChunkStub:
+    """
+    Provider answering outline and chunk prompts; chunks for `failing_weeks` fail
+    """
+    model = "stub"
+
+    def __init__(self, failing_weeks=(), outline_response=None):
+        self.failing_weeks = set(failing_weeks)
+        self.outline_response = outline_response
+        self.chunk_requests = []
+        self.single_calls = 0
+
+    async def generate_content(self, prompt, schema=None, max_tokens=None):
+        weeks = re.search(r"Write the milestones for weeks (\d+) to (\d+)", prompt)
+        if weeks is None:
+            if self.outline_response is not None:
+                return self.outline_response
+            duration = int(re.search(r"Duration: (\d+) weeks", prompt).group(1))
+            return json.dumps({"topic": "Go", "summary": "Learn Go", "learning_objectives": ["Write Go"],
+                               "key_concepts": ["Goroutines"],
+                               "weeks": [{"week": week, "theme": f"Theme {week}"} for week in range(1, duration + 1)]})
+        first, last = int(weeks.group(1)), int(weeks.group(2))
+        self.chunk_requests.append((first, last))
+        if first in self.failing_weeks:
+            return "Error: timed out"
+        # Chunks may stray outside their range; the merge drops those weeks
+        return json.dumps({"milestones": [_milestone(week) for week in range(first, last + 2)]})
+
+    async def create_study_plan(self, topic, research_data, duration_weeks=4, depth_level=3,
+                                learning_style=None, prior_knowledge=None, generate_goals=False,
+                                include_resources=True):
+        self.single_calls += 1
+        return {"topic": topic, "summary": "Single call", "duration_weeks": duration_weeks,
+                "learning_objectives": [], "key_concepts": [], "milestones": [_milestone(1)]}
+
+
+def test_week_chunks_cover_every_week_once():
+    assert week_chunks(10, 4) == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]]
+
+
+def test_merge_orders_weeks_and_reports_gaps():
+    milestones, missing = merge_milestones([[_milestone(5), _milestone(4)], [_milestone(1), _milestone(4), _milestone(9)]], 5)
+
+    assert [milestone["week"] for milestone in milestones] == [1, 4, 5]
+    assert missing == [2, 3]
+
+
+def test_chunks_run_in_parallel_and_merge_into_a_valid_plan(monkeypatch):
+    monkeypatch.setenv("CHUNKED_GENERATION_WEEKS_PER_CHUNK", "4")
+    provider = ChunkStub()
+
+    plan = asyncio.run(generate_chunked_plan(provider, "Go", {"sources": []}, 26))
+
+    assert sorted(provider.chunk_requests) == [(week, min(week + 3, 26)) for week in range(1, 27, 4)]
+    assert [milestone["week"] for milestone in plan["milestones"]] == list(range(1, 27))
+    StudyPlanResponse(**plan)
+
+
+def test_failed_chunks_are_retried_then_filled_from_the_outline(monkeypatch):
+    monkeypatch.setenv("CHUNKED_GENERATION_WEEKS_PER_CHUNK", "4")
+    provider = ChunkStub(failing_weeks={5})
+
+    events = asyncio.run(_collect(iter_chunked_plan(provider, "Go", {"sources": []}, 12)))
+
+    plan = events[-1][1]
+    assert (5, 8) in provider.chunk_requests
+    assert [milestone["week"] for milestone in plan["milestones"]] == list(range(1, 13))
+    assert plan["milestones"][4]["title"] == "Week 5: Theme 5"
+    assert sorted(value["week"] for kind, value in events if kind == "milestone") == list(range(1, 13))
+
+
+def test_outline_failure_falls_back_to_a_single_call(monkeypatch):
+    monkeypatch.setenv("USE_AI_GENERATION", "true")
+    monkeypatch.setenv("SEMANTIC_CACHE_ENABLED", "false")
+    monkeypatch.setenv("CHUNKED_GENERATION_MIN_WEEKS", "12")
+    provider = ChunkStub(outline_response="Error: down")
+
+    plan = asyncio.run(StudyPlanService().generate_plan(provider, "Go", {"sources": []}, duration_weeks=26))
+
+    assert provider.single_calls == 1 and provider.chunk_requests == []
+    assert "Single call" in plan["summary"]
+
+
+def test_plan_is_not_built_from_placeholders_when_every_chunk_fails(monkeypatch):
+    monkeypatch.setenv("USE_AI_GENERATION", "true")
+    monkeypatch.setenv("SEMANTIC_CACHE_ENABLED", "false")
+    monkeypatch.setenv("CHUNKED_GENERATION_MIN_WEEKS", "12")
+    monkeypatch.setenv("CHUNKED_GENERATION_WEEKS_PER_CHUNK", "4")
+    provider = ChunkStub(failing_weeks=set(range(1, 27)))
+
+    assert asyncio.run(generate_chunked_plan(provider, "Go", {"sources": []}, 26)) is None
+    plan = asyncio.run(StudyPlanService().generate_plan(provider, "Go", {"sources": []}, duration_weeks=26))
+
+    assert provider.single_calls == 1
+    assert "Single call" in plan["summary"]
+
+
+async def _collect(events):
+    return [event async for event in events]
@@ -0,0 +1,94 @@
+"""
+Tests for provider circuit breakers and background health probing
+"""
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.utils import circuit_breaker as circuit_breaker_module
+from app.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, get_breaker, guarded_generation
+from app.services.provider_health import ProviderHealthProber
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_fails_fast_and_recovers_through_half_open():
+    clock = _Clock()
+    breaker = CircuitBreaker("unit", failure_threshold=2, reset_timeout=30, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+
+    clock.now += 31
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    # Only one trial call while half-open
+    assert not breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now += 31
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow_request()
+
+
+def test_guarded_generation_skips_calls_while_open(monkeypatch):
+    monkeypatch.setattr(circuit_breaker_module, "_breakers", {})
+    monkeypatch.setenv("BREAKER_FAILURE_THRESHOLD", "2")
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        return "Error: Connection to Ollama timed out"
+
+    async def run():
+        return [await guarded_generation("flaky", failing) for _ in range(4)]
+
+    responses = asyncio.run(run())
+
+    assert len(calls) == 2
+    assert get_breaker("flaky").state == OPEN
+    assert responses[-1].startswith("Error: flaky is unavailable")
+
+
+def test_probe_closes_breaker_when_provider_is_healthy(monkeypatch):
+    monkeypatch.setattr(circuit_breaker_module, "_breakers", {})
+    healthy = {"value": False}
+
+    async def probe(timeout):
+        return healthy["value"]
+
+    prober = ProviderHealthProber(providers=["probed"], probes={"probed": probe})
+    breaker = get_breaker("probed")
+    breaker.trip()
+
+    asyncio.run(prober.probe_once())
+    assert breaker.state == OPEN
+
+    healthy["value"] = True
+    asyncio.run(prober.probe_once())
+    assert breaker.state == CLOSED
+
+
+def test_health_endpoint_reports_breaker_states(monkeypatch):
+    from main import app
+
+    monkeypatch.setattr(circuit_breaker_module, "_breakers", {})
+    get_breaker("reported").trip()
+
+    response = TestClient(app).get("/health")
+
+    assert response.status_code == 200
+    assert response.json()["circuit_breakers"]["reported"]["state"] == OPEN
@@ -0,0 +1,66 @@
+"""
+Tests for near-duplicate source elimination
+"""
+import asyncio
+
+from app.services.research_service import ResearchService
+from app.utils.dedup import near_duplicate_mask, simhash, similarity_matrix, simhash_many
+
+ARTICLE = (
+    "Machine learning is a field of study in artificial intelligence concerned with the development "
+    "and study of statistical algorithms that can learn from data and generalize to unseen data, and thus "
+    "perform tasks without explicit instructions. Advances in deep learning have allowed neural networks to "
+    "surpass many previous approaches in performance across vision, speech and language tasks."
+)
+MIRROR = ARTICLE.replace("Advances in deep learning", "Recent advances in deep learning")
+OTHER = (
+    "A closure is the combination of a function bundled together with references to its surrounding state. "
+    "Closures give a function access to its outer scope and are created every time a function is created."
+)
+
+
+def test_similar_texts_have_close_fingerprints():
+    fingerprints = simhash_many([ARTICLE, MIRROR, OTHER])
+    similarities = similarity_matrix(fingerprints)
+
+    assert simhash(ARTICLE).shape == (8,)
+    assert similarities[0, 0] == 1.0
+    assert similarities[0, 1] >= 0.85
+    assert similarities[0, 2] < 0.85
+
+
+def test_mask_keeps_highest_ranked_copy():
+    keep, _ = near_duplicate_mask([ARTICLE, OTHER, MIRROR, ARTICLE], threshold=0.85)
+    assert keep == [True, True, False, False]
+
+
+def test_research_backfills_dropped_duplicates(monkeypatch):
+    monkeypatch.setenv("RESEARCH_CACHE_ENABLED", "false")
+    monkeypatch.setenv("PAGE_CACHE_ENABLED", "false")
+    service = ResearchService()
+    pages = {
+        "https://a.example/ml": ARTICLE,
+        "https://mirror.example/ml": MIRROR,
+        "https://b.example/closures": OTHER,
+        "https://www.b.example/closures/": OTHER,
+        "https://c.example/regression": "Linear regression fits a straight line to data by minimizing squared error. "
+                                        "It is one of the simplest supervised learning models in statistics.",
+        "https://d.example/trees": "Decision trees split the feature space into regions using simple threshold "
+                                   "rules learned greedily from the training data.",
+    }
+
+    async def fake_search(query, max_results=10):
+        return [{'title': url, 'url': url, 'snippet': '', 'source': 'web'} for url in list(pages)[:max_results]]
+
+    async def fake_extract(url, *args, **kwargs):
+        return pages[url]
+
+    service._search_web = fake_search
+    service._extract_page_content = fake_extract
+
+    data = asyncio.run(service.research_topic("ML", depth=1, time_budget=5))
+
+    assert [source['url'] for source in data['sources']] == [
+        "https://a.example/ml", "https://b.example/closures", "https://c.example/regression"
+    ]
+    assert data['fetch_stats']['duplicates_dropped'] == 2
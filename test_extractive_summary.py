@@ -0,0 +1,56 @@
+"""
+Tests for extractive compression of research context
+"""
+import numpy as np
+
+from app.utils.extractive_summary import compress_research, format_sources, select_sentences, textrank
+from app.utils.token_budget import count_tokens
+
+RESEARCH = {
+    "sources": [
+        {"title": "Go basics", "summary": "Goroutines are lightweight threads managed by the Go runtime. "
+                                          "Channels let goroutines communicate safely without locks. "
+                                          "Subscribe to our newsletter for weekly updates on everything. "
+                                          "Goroutines and channels make concurrent programs simple to wri"},
+        {"title": "Go tour", "summary": "Goroutines are lightweight threads managed by the Go runtime. "
+                                        "The select statement waits on several channel operations at once."},
+    ],
+    "key_concepts": ["Goroutines"],
+    "related_topics": ["Rust"],
+}
+
+
+def test_textrank_favours_central_sentences():
+    vectors = np.array([[1.0, 0.0], [0.8, 0.6], [0.6, 0.8], [0.0, 1.0]])
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    scores = textrank(vectors)
+
+    assert abs(scores.sum() - 1.0) < 1e-6
+    assert scores[1] > scores[0] and scores[2] > scores[3]
+
+
+def test_selection_respects_the_budget_and_drops_duplicates():
+    picked = select_sentences(RESEARCH["sources"], "go concurrency goroutines", 30)
+    sentences = [sentence for source in picked for sentence in source]
+
+    assert sum(count_tokens(sentence) for sentence in sentences) <= 30
+    assert sentences.count("Goroutines are lightweight threads managed by the Go runtime.") <= 1
+    assert not any(sentence.endswith("wri") for sentence in sentences)
+
+
+def test_compressed_sources_are_formatted_whole(monkeypatch):
+    monkeypatch.setenv("RESEARCH_COMPRESSION", "true")
+
+    compressed = compress_research(RESEARCH, "go concurrency", 200)
+
+    assert compressed["compressed"] and compressed["key_concepts"] == ["Goroutines"]
+    assert "..." not in format_sources(compressed)
+    assert "..." in format_sources(RESEARCH)
+    assert compress_research(compressed, "go concurrency") is compressed
+
+
+def test_compression_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("RESEARCH_COMPRESSION", "false")
+
+    assert compress_research(RESEARCH, "go") is RESEARCH
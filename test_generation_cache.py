@@ -0,0 +1,116 @@
+"""
+Tests for the two-tier LLM generation cache
+"""
+import asyncio
+import threading
+
+from app.services import generation_cache as generation_cache_module
+from app.services.generation_cache import (
+    GenerationCache, bypass_generation_cache, cached_generation, cached_stream, wants_cache_bypass
+)
+
+
+def test_key_uses_canonical_prompt_and_sampling_params():
+    key = GenerationCache.make_key("ollama", "llama3", "Plan  for\nRust ", {"temperature": 0.7})
+
+    assert key == GenerationCache.make_key("ollama", "llama3", "Plan for Rust", {"temperature": 0.7})
+    assert key != GenerationCache.make_key("ollama", "llama3", "Plan for Rust", {"temperature": 0.2})
+    assert key != GenerationCache.make_key("ollama", "mistral", "Plan for Rust", {"temperature": 0.7})
+    assert key != GenerationCache.make_key("gemini", "llama3", "Plan for Rust", {"temperature": 0.7})
+
+
+def test_memory_tier_falls_back_to_disk_tier(tmp_path):
+    cache = GenerationCache(data_dir=str(tmp_path), memory_entries=1)
+    cache.set("tiers", "m", "a", "response a")
+    cache.set("tiers", "m", "b", "response b")
+
+    # "a" was pushed out of memory but is still on disk
+    assert list(cache._memory) == ["b"]
+    assert cache.get("tiers", "a") == "response a"
+    assert GenerationCache(data_dir=str(tmp_path)).get("tiers", "b") == "response b"
+
+    stats = cache.stats()["providers"]["tiers"]
+    assert stats["entries"] == 2
+    assert stats["disk_hits"] >= 2
+
+
+def test_entries_expire_after_their_ttl(tmp_path):
+    cache = GenerationCache(data_dir=str(tmp_path))
+    cache.set("ttl", "m", "short", "gone", ttl=-1)
+    cache.set("ttl", "m", "long", "kept", ttl=60)
+
+    assert cache.get("ttl", "short") is None
+    assert cache.get("ttl", "long") == "kept"
+
+
+def test_cached_generation_hits_bypasses_and_skips_errors(tmp_path, monkeypatch):
+    monkeypatch.setenv("GENERATION_CACHE_ENABLED", "true")
+    monkeypatch.setattr(generation_cache_module, "_generation_cache", GenerationCache(data_dir=str(tmp_path)))
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        return f"plan {len(calls)}"
+
+    async def failing():
+        calls.append(1)
+        return "Error: Connection to Ollama timed out"
+
+    async def run():
+        first = await cached_generation("flow", "m", "prompt", {}, generate)
+        second = await cached_generation("flow", "m", "prompt", {}, generate)
+        token = bypass_generation_cache.set(True)
+        try:
+            forced = await cached_generation("flow", "m", "prompt", {}, generate)
+        finally:
+            bypass_generation_cache.reset(token)
+        after_bypass = await cached_generation("flow", "m", "prompt", {}, generate)
+        await cached_generation("flow", "m", "other", {}, failing)
+        await cached_generation("flow", "m", "other", {}, failing)
+        return first, second, forced, after_bypass
+
+    first, second, forced, after_bypass = asyncio.run(run())
+
+    assert (first, second, forced, after_bypass) == ("plan 1", "plan 1", "plan 2", "plan 2")
+    assert len(calls) == 4
+    stats = generation_cache_module._generation_cache.stats()["providers"]["flow"]
+    assert stats["bypassed"] == 1
+    assert stats["hit_rate"] > 0
+
+
+def test_cache_reads_and_writes_run_off_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setenv("GENERATION_CACHE_ENABLED", "true")
+    cache = GenerationCache(data_dir=str(tmp_path))
+    monkeypatch.setattr(generation_cache_module, "_generation_cache", cache)
+    threads = []
+    for name in ("get", "set"):
+        method = getattr(cache, name)
+        monkeypatch.setattr(cache, name, lambda *args, method=method: threads.append(threading.current_thread()) or method(*args))
+
+    async def generate():
+        return "plan"
+
+    assert asyncio.run(cached_generation("threads", "m", "prompt", {}, generate)) == "plan"
+    assert len(threads) == 2 and threading.main_thread() not in threads
+
+
+def test_cached_stream_replays_a_hit_as_one_chunk(tmp_path, monkeypatch):
+    monkeypatch.setenv("GENERATION_CACHE_ENABLED", "true")
+    monkeypatch.setattr(generation_cache_module, "_generation_cache", GenerationCache(data_dir=str(tmp_path)))
+
+    async def stream():
+        for chunk in ["{\"a\"", ": 1}"]:
+            yield chunk
+
+    async def collect():
+        return [chunk async for chunk in cached_stream("streamed", "m", "prompt", {}, stream)]
+
+    assert asyncio.run(collect()) == ["{\"a\"", ": 1}"]
+    assert asyncio.run(collect()) == ["{\"a\": 1}"]
+
+
+def test_bypass_headers():
+    assert wants_cache_bypass({"x-bypass-cache": "true"})
+    assert wants_cache_bypass({"cache-control": "no-cache"})
+    assert not wants_cache_bypass({"cache-control": "max-age=0"})
+    assert not wants_cache_bypass({})
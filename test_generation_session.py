@@ -0,0 +1,124 @@
+"""
+Tests for reusing Ollama's evaluated plan prompt in follow-up calls
+"""
+import json
+import asyncio
+
+import httpx
+
+from app.services.generation_session import current_session, follow_up, generation_session
+from app.services.http_client_registry import http_registry
+from app.services.ollama_service import OllamaService
+from app.services.study_plan_service import StudyPlanService
+from app.utils import circuit_breaker as circuit_breaker_module
+from app.utils.metrics import metrics
+from app.utils.token_budget import count_tokens
+
+PLAN = {"topic": "Go", "summary": "Learn Go", "duration_weeks": 2, "learning_objectives": ["Write Go"],
+        "key_concepts": ["Goroutines"], "milestones": [{"title": "Week 1", "description": "Basics", "week": 1,
+                                                        "tasks": ["Tour of Go"], "estimated_hours": 5}]}
+WEEK_2 = {"milestones": [{"title": "Week 2", "description": "Channels", "week": 2, "tasks": ["Build a pipeline"],
+                          "estimated_hours": 5}]}
+
+
+def _ollama(monkeypatch, plan_text):
+    """
+    Mock Ollama server answering plan, goals and completion prompts on /api/generate and /api/chat
+    """
+    monkeypatch.setenv("GENERATION_CACHE_ENABLED", "false")
+    monkeypatch.setattr(circuit_breaker_module, "_breakers", {})
+    requests = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        requests.append((request.url.path, body))
+        prompt = body["messages"][-1]["content"] if request.url.path == "/api/chat" else body["prompt"]
+        usage = {"prompt_eval_count": 40, "prompt_eval_duration": 100_000_000, "eval_count": 50, "done_reason": "stop"}
+        if "learning goals" in prompt:
+            text = '["Build a CLI"]'
+        elif "one milestone for each of weeks" in prompt:
+            text = json.dumps(WEEK_2)
+        else:
+            text, usage = plan_text, {**usage, "prompt_eval_count": 900, "context": [1, 2, 3]}
+        if request.url.path == "/api/chat":
+            return httpx.Response(200, json={"message": {"role": "assistant", "content": text}, **usage})
+        return httpx.Response(200, json={"response": text, **usage})
+
+    monkeypatch.setattr(http_registry, "get_client", lambda upstream: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return requests
+
+
+def _generate(service):
+    return asyncio.run(StudyPlanService().generate_plan(
+        ai_service=service, topic="Go", research_data={"sources": []}, duration_weeks=1, generate_goals=True
+    ))
+
+
+def test_goals_stay_stateless_and_concurrent_by_default(monkeypatch):
+    monkeypatch.setenv("USE_AI_GENERATION", "true")
+    monkeypatch.setenv("SEMANTIC_CACHE_ENABLED", "false")
+    monkeypatch.delenv("GOAL_GENERATION_MODE", raising=False)
+    monkeypatch.delenv("OLLAMA_SESSION_REUSE", raising=False)
+    requests = _ollama(monkeypatch, json.dumps(PLAN))
+
+    plan = _generate(OllamaService())
+
+    assert [path for path, _ in requests] == ["/api/generate", "/api/generate"]
+    assert all("context" not in body for _, body in requests)
+    assert "Build a CLI" in plan["learning_objectives"]
+
+
+def test_repair_follow_up_continues_the_plan_conversation(monkeypatch):
+    truncated = json.dumps({**PLAN, "milestones": PLAN["milestones"] + [{"title": "Week 2"}]})
+    requests = _ollama(monkeypatch, truncated)
+    before = metrics.snapshot()["observations"].get("generation_session.prefill_tokens_saved", {}).get("count", 0)
+
+    async def create():
+        with generation_session():
+            return await OllamaService().create_study_plan("Go", {"sources": []}, duration_weeks=2)
+
+    plan = asyncio.run(create())
+
+    (plan_path, plan_body), (repair_path, repair_body) = requests
+    assert plan_path == "/api/generate" and repair_path == "/api/chat"
+    assert [message["role"] for message in repair_body["messages"]] == ["user", "assistant", "user"]
+    assert repair_body["messages"][0]["content"] == plan_body["prompt"]
+    assert repair_body["keep_alive"] == plan_body["keep_alive"] == "10m"
+    assert [milestone["week"] for milestone in plan["milestones"]] == [1, 2]
+    # Savings are measured against the stateless repair prompt, not the whole conversation
+    saved = metrics.snapshot()["observations"]["generation_session.prefill_tokens_saved"]
+    assert saved["count"] == before + 1
+    assert saved["last"] == count_tokens(repair_body["messages"][-1]["content"]) - 40
+
+
+def test_repair_follow_up_sends_the_returned_context(monkeypatch):
+    monkeypatch.setenv("OLLAMA_SESSION_REUSE", "context")
+    truncated = json.dumps({**PLAN, "milestones": PLAN["milestones"] + [{"title": "Week 2"}]})
+    requests = _ollama(monkeypatch, truncated)
+
+    async def create():
+        with generation_session():
+            return await OllamaService().create_study_plan("Go", {"sources": []}, duration_weeks=2)
+
+    plan = asyncio.run(create())
+
+    assert [milestone["week"] for milestone in plan["milestones"]] == [1, 2]
+    assert requests[1][0] == "/api/generate" and requests[1][1]["context"] == [1, 2, 3]
+
+
+def test_calls_outside_a_session_or_with_reuse_off_are_stateless(monkeypatch):
+    monkeypatch.setenv("OLLAMA_SESSION_REUSE", "off")
+    requests = _ollama(monkeypatch, json.dumps(PLAN))
+
+    async def plan_and_goals():
+        with generation_session():
+            await OllamaService().generate_content("Plan prompt")
+            with follow_up():
+                await OllamaService().generate_learning_goals("Go", 2, None)
+        with follow_up():
+            await OllamaService().generate_learning_goals("Go", 2, None)
+        return current_session()
+
+    assert asyncio.run(plan_and_goals()) is None
+    assert [path for path, _ in requests] == ["/api/generate"] * 3
+    assert all("context" not in body for _, body in requests)
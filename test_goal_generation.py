@@ -0,0 +1,81 @@
+"""
+Tests for generating learning goals alongside, or inside, the study plan
+"""
+import time
+import asyncio
+
+from app.services.study_plan_service import StudyPlanService
+
+PLAN = {"topic": "Go", "summary": "Learn Go", "duration_weeks": 2, "learning_objectives": ["Write Go"],
+        "key_concepts": ["Goroutines"], "milestones": []}
+
+
+class _SlowProvider:
+    model = "slow"
+
+    def __init__(self):
+        self.calls = []
+
+    async def create_study_plan(self, topic, research_data, duration_weeks=4, depth_level=3,
+                                learning_style=None, prior_knowledge=None, generate_goals=False,
+                                include_resources=True):
+        self.calls.append(("plan", generate_goals))
+        await asyncio.sleep(0.2)
+        plan = dict(PLAN)
+        if generate_goals:
+            plan["goals"] = ["Ship a CLI in Go"]
+        return plan
+
+    async def generate_learning_goals(self, topic, duration_weeks, prior_knowledge):
+        self.calls.append(("goals", None))
+        await asyncio.sleep(0.2)
+        return ["Write a web server"]
+
+
+def _generate(provider, topic):
+    return asyncio.run(StudyPlanService().generate_plan(
+        ai_service=provider, topic=topic, research_data={"sources": []}, duration_weeks=2, generate_goals=True
+    ))
+
+
+def test_concurrent_mode_overlaps_plan_and_goals_calls(monkeypatch):
+    monkeypatch.setenv("USE_AI_GENERATION", "true")
+    monkeypatch.setenv("GOAL_GENERATION_MODE", "concurrent")
+    provider = _SlowProvider()
+
+    started = time.perf_counter()
+    plan = _generate(provider, "Go concurrent")
+
+    assert time.perf_counter() - started < 0.35
+    assert sorted(provider.calls) == [("goals", None), ("plan", False)]
+    assert set(plan["learning_objectives"]) == {"Write Go", "Write a web server"}
+
+
+def test_inline_mode_makes_one_call_and_drops_goals_field(monkeypatch):
+    monkeypatch.setenv("USE_AI_GENERATION", "true")
+    monkeypatch.setenv("GOAL_GENERATION_MODE", "inline")
+    provider = _SlowProvider()
+
+    plan = _generate(provider, "Go inline")
+
+    assert provider.calls == [("plan", True)]
+    assert "goals" not in plan
+    assert set(plan["learning_objectives"]) == {"Write Go", "Ship a CLI in Go"}
+
+
+def test_sequential_mode_asks_for_goals_after_the_plan(monkeypatch):
+    monkeypatch.setenv("USE_AI_GENERATION", "true")
+    monkeypatch.setenv("GOAL_GENERATION_MODE", "sequential")
+    provider = _SlowProvider()
+
+    _generate(provider, "Go sequential")
+
+    assert provider.calls == [("plan", False), ("goals", None)]
+
+
+def test_inline_prompt_asks_for_goals_field():
+    from app.services.ollama_service import OllamaService
+
+    service = OllamaService()
+    assert '"goals"' in service.build_study_plan_prompt("Go", {}, 2, 3, None, None, include_goals=True)
+    assert '"goals"' not in service.build_study_plan_prompt("Go", {}, 2, 3, None, None)
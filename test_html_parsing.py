@@ -0,0 +1,49 @@
+"""
+Tests for HTML parsing helpers used by the research service
+"""
+import os
+import asyncio
+
+from app.utils.html_parsing import extract_page_text, parse_search_results, run_parser, shutdown_parse_executor
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "benchmarks", "fixtures")
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_parse_search_results_resolves_redirects():
+    results = parse_search_results(_fixture("duckduckgo_results.html"), max_results=3, backend="html.parser")
+
+    assert len(results) == 3
+    assert results[0]['url'] == "https://en.wikipedia.org/wiki/Machine_learning"
+    assert results[0]['title'] == "Machine learning - Wikipedia"
+    assert results[1]['url'] == "https://www.ibm.com/topics/machine-learning"
+    assert results[2]['source'] == "www.coursera.org/learn/machine-learning"
+
+
+def test_extract_page_text_drops_boilerplate_and_stops_early():
+    html = _fixture("machine_learning_wiki.html")
+
+    text = extract_page_text(html, backend="html.parser")
+    assert "Machine learning (ML) is a field of study" in text
+    assert "Random article" not in text
+    assert "RLQ" not in text
+    assert "last edited" not in text
+
+    short = extract_page_text(html, max_chars=300, backend="html.parser")
+    assert len(short) < len(text)
+    assert text.startswith(short)
+
+
+def test_run_parser_matches_inline_result(monkeypatch):
+    html = _fixture("python_tutorial.html")
+    expected = extract_page_text(html, 1000)
+
+    for mode in ["inline", "thread"]:
+        monkeypatch.setenv("HTML_PARSE_EXECUTOR", mode)
+        shutdown_parse_executor()
+        assert asyncio.run(run_parser(extract_page_text, html, 1000)) == expected
+    shutdown_parse_executor()
@@ -0,0 +1,89 @@
+"""
+Tests for the pooled HTTP client registry
+"""
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services.http_client_registry import HttpClientRegistry
+
+
+class _OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_registry_reuses_keepalive_connections():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OkHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    registry = HttpClientRegistry()
+
+    async def run():
+        client = registry.get_client("local", http2=False)
+        assert registry.get_client("local") is client
+        for _ in range(3):
+            response = await client.get(url)
+            assert response.status_code == 200
+        await registry.aclose()
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    stats = registry.stats()["upstreams"]["local"]
+    assert stats["requests"] == 3
+    assert stats["connections_opened"] == 1
+    assert stats["connections_reused"] == 2
+
+
+def test_registry_recreates_client_for_new_event_loop():
+    registry = HttpClientRegistry()
+
+    async def get():
+        return registry.get_client("local")
+
+    first = asyncio.run(get())
+    second = asyncio.run(get())
+
+    assert first is not second
+    assert registry.stats()["upstreams"]["local"]["clients_created"] == 2
+
+
+def test_replaced_client_is_closed():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OkHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    registry = HttpClientRegistry()
+
+    async def request():
+        client = registry.get_client("local", http2=False)
+        await client.get(url)
+        return client
+
+    async def replace():
+        client = registry.get_client("local", http2=False)
+        # Let the close of the previous loop's client run
+        await asyncio.sleep(0.1)
+        return client
+
+    try:
+        first = asyncio.run(request())
+        second = asyncio.run(replace())
+    finally:
+        server.shutdown()
+
+    assert first.is_closed and not second.is_closed
@@ -0,0 +1,97 @@
+"""
+Tests for JSON repair and partial study plan salvage
+"""
+import json
+import asyncio
+
+import pytest
+
+from app.models import StudyPlanResponse
+from app.services.plan_repair import complete_study_plan, salvage_study_plan
+from app.utils.json_repair import repair_json
+
+
+def _milestone(week):
+    return {"title": f"Week {week}", "description": "Study", "week": week, "tasks": ["Read"], "estimated_hours": 5}
+
+
+class FollowUpStub:
+    """
+    Provider stub recording follow-up prompts and answering with the given completion
+    """
+
+    def __init__(self, completion):
+        self.completion = completion
+        self.prompts = []
+
+    async def generate_content(self, prompt, schema=None, max_tokens=None):
+        self.prompts.append(prompt)
+        return json.dumps(self.completion)
+
+
+def test_repairs_common_llm_json_faults():
+    assert repair_json("```json\n{\"a\": [1, 2,],}\n```") == {"a": [1, 2]}
+    assert repair_json("Here you go: {'a': 'it\\'s \"x\"', 'b': True, 'c': None}") == {"a": "it's \"x\"", "b": True, "c": None}
+    assert repair_json('{"text": "line one\nline two"}') == {"text": "line one\nline two"}
+
+
+def test_closes_output_cut_off_by_the_token_limit():
+    assert repair_json('{"summary": "abc", "milestones": [{"week": 1, "tasks": ["a", "b"]}, {"week": 2, "tas') == \
+        {"summary": "abc", "milestones": [{"week": 1, "tasks": ["a", "b"]}, {"week": 2}]}
+    assert repair_json('{"topic": "Go", "summary": "Learn') == {"topic": "Go", "summary": "Learn"}
+
+
+def test_unrecoverable_text_raises():
+    with pytest.raises(ValueError):
+        repair_json("I could not generate a plan")
+
+
+def test_salvage_keeps_valid_milestones_and_reports_gaps():
+    data = {"summary": "Learn Go", "milestones": [_milestone(1), {"week": 2, "title": "Broken"}, _milestone(3)]}
+
+    plan, missing, missing_weeks = salvage_study_plan(data, "Go", 5)
+
+    assert [milestone["week"] for milestone in plan["milestones"]] == [1, 3]
+    assert missing == ["learning_objectives", "key_concepts"]
+    assert missing_weeks == [2, 4, 5]
+
+
+def test_truncated_plan_regenerates_only_missing_weeks():
+    text = json.dumps({"topic": "Go", "summary": "Learn Go", "duration_weeks": 3,
+                       "learning_objectives": ["Write Go"], "key_concepts": ["Goroutines"],
+                       "milestones": [_milestone(1), _milestone(2), _milestone(3)]})
+    truncated = text[:text.index('{"title": "Week 2"') + 30]
+    provider = FollowUpStub({"milestones": [_milestone(2), _milestone(3)]})
+
+    plan = asyncio.run(complete_study_plan(provider, truncated, "Go", 3))
+
+    assert len(provider.prompts) == 1 and "weeks 2, 3" in provider.prompts[0]
+    assert [milestone["week"] for milestone in plan["milestones"]] == [1, 2, 3]
+    StudyPlanResponse(**plan)
+
+
+def test_complete_plan_needs_no_follow_up(monkeypatch):
+    plan = {"topic": "Go", "summary": "Learn Go", "duration_weeks": 1, "learning_objectives": ["Write Go"],
+            "key_concepts": ["Goroutines"], "milestones": [_milestone(1)]}
+    provider = FollowUpStub({})
+
+    assert asyncio.run(complete_study_plan(provider, json.dumps(plan) + ",", "Go", 1)) == plan
+    assert provider.prompts == []
+
+
+def test_salvage_without_follow_up_fills_defaults(monkeypatch):
+    monkeypatch.setenv("PLAN_REPAIR_FOLLOWUP", "false")
+    provider = FollowUpStub({})
+
+    plan = asyncio.run(complete_study_plan(provider, '{"milestones": [' + json.dumps(_milestone(1)), "Go", 2))
+
+    assert provider.prompts == []
+    assert plan["summary"] and plan["learning_objectives"] == []
+    StudyPlanResponse(**plan)
+
+
+def test_errors_and_plans_without_milestones_are_not_salvaged():
+    provider = FollowUpStub({"summary": "Learn Go"})
+
+    assert asyncio.run(complete_study_plan(provider, "Error: timeout {", "Go", 2)) is None
+    assert asyncio.run(complete_study_plan(provider, '{"summary": "Learn', "Go", 2)) is None
@@ -0,0 +1,63 @@
+"""
+Tests for the incremental study plan JSON parser
+"""
+import json
+
+import pytest
+
+from app.utils.json_stream import IncrementalJSONParser, parse_study_plan_json, FIELD, ITEM
+from test_streaming import PLAN, RESPONSE
+
+
+def test_events_arrive_as_soon_as_values_close():
+    parser = IncrementalJSONParser()
+    events = []
+    for i, char in enumerate(RESPONSE):
+        events.extend((kind, key, i) for kind, key, _ in parser.feed(char))
+
+    milestone_positions = [i for kind, key, i in events if kind == ITEM and key == "milestones"]
+    assert len(milestone_positions) == 2
+    # The first milestone is available long before the document is complete
+    assert milestone_positions[0] < RESPONSE.index('"Week 2: Ownership"')
+    assert [key for kind, key, _ in events if kind == FIELD] == list(PLAN)
+    assert parser.close() == PLAN
+
+
+def test_tolerates_prose_fences_and_trailing_commas():
+    text = 'Here you go:\n```json\n{"a": [1, 2,], "b": 3.5, "c": true, "d": {"x": "}"}, "e": "q\\"}",}\n```\nEnjoy!'
+    assert parse_study_plan_json(text) == {"a": [1, 2], "b": 3.5, "c": True, "d": {"x": "}"}, "e": 'q"}'}
+
+
+def test_partial_plan_before_generation_finishes():
+    parser = IncrementalJSONParser()
+    parser.feed('{"topic": "Go", "milestones": [{"week": 1}, {"week"')
+
+    assert parser.partial() == {"topic": "Go", "milestones": [{"week": 1}]}
+    assert not parser.done
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_rejects_missing_or_malformed_json():
+    with pytest.raises(ValueError):
+        parse_study_plan_json("I cannot help with that.")
+    with pytest.raises(ValueError):
+        parse_study_plan_json('{"topic": tru}')
+
+
+def test_matches_json_loads_on_chunked_input():
+    text = json.dumps(PLAN)
+    for size in (1, 3, 7, 64):
+        parser = IncrementalJSONParser()
+        for i in range(0, len(text), size):
+            parser.feed(text[i:i + size])
+        assert parser.close() == json.loads(text)
+
+
+def test_malformed_array_item_is_skipped_but_fails_close():
+    parser = IncrementalJSONParser()
+    events = parser.feed('{"milestones": [{"week": 1}, {"week" 2}, {"week": 3}], "topic": "Go"}')
+
+    assert [value for kind, key, value in events if kind == ITEM] == [{"week": 1}, {"week": 3}]
+    with pytest.raises(ValueError, match="milestones item"):
+        parser.close()
@@ -0,0 +1,109 @@
+"""
+Tests for the local BM25 research index and the local/web/hybrid research modes
+"""
+import asyncio
+
+from app.services.local_index import LocalSearchIndex, main
+from app.services.page_cache import PageContentCache
+from app.services.research_service import ResearchService
+
+PAGES = [
+    ("https://a.example/rust", "Rust ownership",
+     "Rust ownership rules decide when memory is freed. The borrow checker enforces ownership at compile time."),
+    ("https://b.example/rust-borrow", "Borrowing in Rust",
+     "Borrowing lets Rust code use a value without taking ownership of it. References are checked by the borrow checker."),
+    ("https://c.example/gc", "Garbage collection",
+     "Garbage collection frees memory automatically at run time, unlike ownership in Rust."),
+    ("https://d.example/python", "Python lists",
+     "Python lists are dynamic arrays that grow as items are appended."),
+]
+
+
+def _index(tmp_path):
+    index = LocalSearchIndex(data_dir=str(tmp_path))
+    for url, title, content in PAGES:
+        index.add_document(url, title, content, source="web")
+    return index
+
+
+def test_bm25_ranks_matching_pages(tmp_path):
+    index = _index(tmp_path)
+
+    results = index.search("rust ownership borrow checker")
+
+    assert [result['url'] for result in results][:2] == ["https://a.example/rust", "https://b.example/rust-borrow"]
+    assert results[0]['score'] > results[-1]['score']
+    assert results[0]['coverage'] == 1.0
+    assert all(result['url'] != "https://d.example/python" for result in results)
+    assert index.search("haskell") == []
+
+
+def test_reindexing_replaces_old_postings(tmp_path):
+    index = _index(tmp_path)
+
+    assert index.add_document(*PAGES[3]) is False
+    assert index.add_document("https://d.example/python", "Python lists", "Python lists support slicing.") is True
+
+    assert index.search("dynamic arrays") == []
+    assert index.search("slicing")[0]['url'] == "https://d.example/python"
+    assert index.stats()['documents'] == 4
+
+
+def test_rebuild_includes_page_cache(tmp_path, monkeypatch, capsys):
+    index = _index(tmp_path)
+    page_cache = PageContentCache(data_dir=str(tmp_path))
+    page_cache.set("https://e.example/go", "Go channels\nGoroutines communicate over channels.")
+
+    assert index.rebuild(page_cache=page_cache) == 5
+    assert index.search("goroutines channels")[0]['title'] == "Go channels"
+
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("PAGE_CACHE_ENABLED", "false")
+    assert main(["stats"]) == 0
+    assert '"documents": 5' in capsys.readouterr().out
+
+
+def test_research_modes(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESEARCH_CACHE_ENABLED", "false")
+    monkeypatch.setenv("PAGE_CACHE_ENABLED", "false")
+    service = ResearchService(local_index=_index(tmp_path))
+    service.local_min_results = 2
+    web_calls = []
+
+    async def fake_live(topic, depth, time_budget=None):
+        web_calls.append(topic)
+        return {'topic': topic, 'sources': [], 'key_concepts': [], 'related_topics': [],
+                'research_completeness': {'mode': 'web', 'complete': True}}
+
+    service._research_live = fake_live
+
+    local = asyncio.run(service.research_topic("rust ownership", depth=1, mode="local"))
+    assert local['research_completeness']['mode'] == "local"
+    assert local['research_completeness']['complete'] is True
+    assert "https://d.example/python" not in {source['url'] for source in local['sources']}
+    assert local['sources'][0]['url'] == "https://a.example/rust"
+
+    hybrid = asyncio.run(service.research_topic("rust ownership", depth=1, mode="hybrid"))
+    assert hybrid['research_completeness']['mode'] == "local"
+    assert web_calls == []
+
+    # Only one page mentions both terms, so hybrid falls back to the web
+    fallback = asyncio.run(service.research_topic("python arrays", depth=1, mode="hybrid"))
+    assert fallback['research_completeness']['mode'] == "web"
+    assert web_calls == ["python arrays"]
+
+
+def test_fetched_pages_are_indexed(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESEARCH_CACHE_ENABLED", "false")
+    monkeypatch.setenv("PAGE_CACHE_ENABLED", "false")
+    index = LocalSearchIndex(data_dir=str(tmp_path))
+    service = ResearchService(local_index=index)
+
+    async def fake_extract(url, *args, **kwargs):
+        return "Tail recursion is a recursive call in tail position."
+
+    service._extract_page_content = fake_extract
+    results = [{'title': "Tail calls", 'url': "https://f.example/tail", 'snippet': '', 'source': 'web'}]
+    asyncio.run(service._fetch_sources(results))
+
+    assert index.search("tail recursion")[0]['url'] == "https://f.example/tail"
@@ -0,0 +1,96 @@
+"""
+Tests for the per-URL page content cache and conditional revalidation
+"""
+import os
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services.http_client_registry import http_registry
+from app.services.page_cache import PageContentCache
+from app.services.research_service import ResearchService
+
+PAGE = b"<html><body><h1>Binary search</h1><p>Binary search is a divide and conquer algorithm.</p></body></html>"
+
+
+class _EtagHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    full_responses = 0
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        type(self).full_responses += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_store_compresses_and_evicts_lru(tmp_path):
+    cache = PageContentCache(data_dir=str(tmp_path), max_bytes=10_000)
+    text = "repetitive text " * 1000
+    cache.set("https://a.example/", text, etag='"a"')
+
+    entry = cache.get("https://a.example/")
+    assert entry['content'] == text
+    assert cache.conditional_headers(entry) == {'If-None-Match': '"a"'}
+    assert cache.stats()['stored_bytes'] < len(text)
+
+    # Random hex barely compresses, so each of these pages takes roughly 6 KB
+    cache.set("https://b.example/", os.urandom(6000).hex())
+    cache.set("https://c.example/", os.urandom(6000).hex())
+    assert cache.get("https://a.example/") is None
+    assert cache.get("https://b.example/") is None
+    assert cache.get("https://c.example/") is not None
+    assert cache.stats()['stored_bytes'] <= 10_000
+
+
+def test_unchanged_page_is_revalidated_with_304(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESEARCH_CACHE_ENABLED", "false")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _EtagHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/page"
+    _EtagHandler.full_responses = 0
+
+    service = ResearchService(page_cache=PageContentCache(data_dir=str(tmp_path)))
+
+    async def run():
+        first = await service._extract_page_content(url)
+        second = await service._extract_page_content(url)
+        await http_registry.aclose()
+        return first, second
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    assert "Binary search is a divide and conquer algorithm." in first
+    assert second == first
+    assert _EtagHandler.full_responses == 1
+
+
+def test_running_size_tracks_replacements_and_purges(tmp_path):
+    cache = PageContentCache(data_dir=str(tmp_path), max_bytes=100_000)
+    cache.set("https://a.example/", os.urandom(2000).hex())
+    cache.set("https://a.example/", os.urandom(1000).hex())
+    cache.set("https://b.example/", os.urandom(1000).hex())
+
+    with cache._connect() as conn:
+        summed = conn.execute("SELECT SUM(size) FROM page_cache").fetchone()[0]
+    assert cache.stats()['stored_bytes'] == summed
+
+    cache.purge()
+    assert cache.stats()['stored_bytes'] == 0
+    # Reopening an existing database keeps the counter
+    assert PageContentCache(data_dir=str(tmp_path)).stats()['stored_bytes'] == 0
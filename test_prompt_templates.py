@@ -0,0 +1,94 @@
+"""
+Tests for the prefix-stable prompt layout and provider prompt caching
+"""
+import json
+import asyncio
+
+import httpx
+
+from app.services.http_client_registry import http_registry
+from app.services.gemini_service import GeminiService
+from app.services.ollama_service import OllamaService
+from app.services.openrouter_service import OpenRouterService
+from app.utils import circuit_breaker as circuit_breaker_module
+from app.utils.metrics import metrics
+from app.utils.prompt_templates import build_study_plan_prompt, split_cacheable_prefix, study_plan_prefix
+
+PLAN = {"topic": "Go", "summary": "Learn Go", "duration_weeks": 1, "learning_objectives": ["Write Go"],
+        "key_concepts": ["Goroutines"], "milestones": [{"title": "Week 1", "description": "Basics", "week": 1,
+                                                        "tasks": ["Tour of Go"], "estimated_hours": 5}]}
+RESEARCH = {"sources": [{"title": "Tour", "summary": "Goroutines are lightweight threads."}],
+            "key_concepts": ["Goroutines"], "related_topics": ["Rust"]}
+
+
+def _capture(monkeypatch, handler):
+    monkeypatch.setenv("GENERATION_CACHE_ENABLED", "false")
+    monkeypatch.setenv("STRUCTURED_OUTPUT", "schema")
+    monkeypatch.setattr(circuit_breaker_module, "_breakers", {})
+    requests = []
+
+    def record(request):
+        requests.append(request)
+        return handler(request)
+
+    monkeypatch.setattr(http_registry, "get_client", lambda upstream: httpx.AsyncClient(transport=httpx.MockTransport(record)))
+    return requests
+
+
+def test_prompts_for_different_requests_share_the_static_prefix():
+    go = build_study_plan_prompt("Go", RESEARCH, 4, 3, None, None)
+    rust = build_study_plan_prompt("Rust", {}, 8, 2, "visual", "beginner")
+
+    prefix, rest = split_cacheable_prefix(go)
+    assert prefix == study_plan_prefix() and rust.startswith(prefix)
+    assert "Go" not in prefix and "Goroutines are lightweight threads." in rest
+    assert "Duration: 4 weeks" in rest
+    assert split_cacheable_prefix("Unrelated prompt") == ("", "Unrelated prompt")
+
+
+def test_openrouter_marks_the_prefix_for_caching(monkeypatch):
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    requests = _capture(monkeypatch, lambda request: httpx.Response(200, json={
+        "choices": [{"message": {"content": json.dumps(PLAN)}}],
+        "usage": {"prompt_tokens": 500, "completion_tokens": 100, "prompt_tokens_details": {"cached_tokens": 420}}}))
+    before = metrics.snapshot()["observations"].get("prompt_cache.openrouter.cached_tokens", {}).get("count", 0)
+
+    asyncio.run(OpenRouterService().create_study_plan("Go", RESEARCH, duration_weeks=1))
+
+    content = json.loads(requests[0].content)["messages"][1]["content"]
+    assert content[0]["cache_control"] == {"type": "ephemeral"}
+    assert content[0]["text"] == study_plan_prefix()
+    assert content[1]["text"].lstrip().startswith("REQUEST:")
+    assert metrics.snapshot()["observations"]["prompt_cache.openrouter.cached_tokens"]["count"] == before + 1
+
+
+def test_gemini_records_implicitly_cached_tokens(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    requests = _capture(monkeypatch, lambda request: httpx.Response(200, json={
+        "candidates": [{"content": {"parts": [{"text": json.dumps(PLAN)}]}}],
+        "usageMetadata": {"promptTokenCount": 500, "cachedContentTokenCount": 420}}))
+    before = metrics.snapshot()["observations"].get("prompt_cache.gemini.cached_tokens", {}).get("count", 0)
+
+    asyncio.run(GeminiService().create_study_plan("Go", RESEARCH, duration_weeks=1))
+
+    body = json.loads(requests[0].content)
+    assert "cachedContent" not in body
+    assert body["contents"][0]["parts"][0]["text"].startswith(study_plan_prefix())
+    assert metrics.snapshot()["observations"]["prompt_cache.gemini.cached_tokens"]["count"] == before + 1
+
+
+def test_ollama_records_prefill_for_reused_prefixes(monkeypatch):
+    responses = iter([{"prompt_eval_count": 600, "prompt_eval_duration": 4_000_000_000},
+                      {"prompt_eval_count": 120, "prompt_eval_duration": 800_000_000}])
+    _capture(monkeypatch, lambda request: httpx.Response(200, json={"response": json.dumps(PLAN), "eval_count": 100,
+                                                                    "done_reason": "stop", **next(responses)}))
+    before = metrics.snapshot()["observations"]
+
+    asyncio.run(OllamaService().create_study_plan("Go", RESEARCH, duration_weeks=1))
+    asyncio.run(OllamaService().create_study_plan("Rust", RESEARCH, duration_weeks=1))
+
+    after = metrics.snapshot()["observations"]
+    for label in ("uncached", "cached"):
+        name = f"prompt_cache.ollama.prefill_seconds.{label}"
+        assert after[name]["count"] == before.get(name, {}).get("count", 0) + 1
+    assert after["prompt_cache.ollama.prefill_seconds.cached"]["last"] == 0.8
@@ -0,0 +1,85 @@
+"""
+Tests for the persistent research cache
+"""
+import asyncio
+import time
+
+from app.services.research_cache import ResearchCache, FRESH, STALE, MISS
+from app.services.research_service import ResearchService
+
+
+def _research(topic):
+    return {'topic': topic, 'sources': [{'title': 't', 'url': 'https://example.com', 'summary': 's', 'source': 'web'}],
+            'key_concepts': [], 'related_topics': []}
+
+
+def test_normalized_topics_share_an_entry(tmp_path):
+    cache = ResearchCache(data_dir=str(tmp_path), ttl=60, stale_ttl=60, max_entries=10)
+    cache.set("Machine Learning", 3, _research("Machine Learning"))
+
+    data, status = cache.get("  machine   learning!", 3)
+    assert status == FRESH
+    assert data['topic'] == "Machine Learning"
+
+    _, status = cache.get("machine learning", 2)
+    assert status == MISS
+
+
+def test_entries_go_stale_then_expire(tmp_path):
+    cache = ResearchCache(data_dir=str(tmp_path), ttl=0.05, stale_ttl=0.1, max_entries=10)
+    cache.set("Python", 3, _research("Python"))
+
+    time.sleep(0.07)
+    _, status = cache.get("Python", 3)
+    assert status == STALE
+    assert cache.claim_refresh("Python", 3) is True
+    assert cache.claim_refresh("Python", 3) is False
+
+    time.sleep(0.1)
+    _, status = cache.get("Python", 3)
+    assert status == MISS
+
+    stats = cache.stats()
+    assert stats['stale_hits'] == 1
+    assert stats['misses'] == 1
+
+
+def test_lru_bound_and_purge(tmp_path):
+    cache = ResearchCache(data_dir=str(tmp_path), ttl=60, stale_ttl=60, max_entries=2)
+    cache.set("a", 3, _research("a"))
+    cache.set("b", 3, _research("b"))
+    time.sleep(0.01)
+    cache.get("a", 3)
+    cache.set("c", 3, _research("c"))
+
+    assert cache.get("b", 3)[1] == MISS
+    assert cache.get("a", 3)[1] == FRESH
+    assert cache.stats()['entries'] == 2
+    assert cache.purge() == 2
+
+
+def test_cache_is_shared_across_instances(tmp_path):
+    ResearchCache(data_dir=str(tmp_path)).set("Rust", 3, _research("Rust"))
+    data, status = ResearchCache(data_dir=str(tmp_path)).get("rust", 3)
+    assert status == FRESH
+    assert data['topic'] == "Rust"
+
+
+def test_research_topic_serves_from_cache(tmp_path):
+    cache = ResearchCache(data_dir=str(tmp_path), ttl=60, stale_ttl=60)
+    service = ResearchService(cache=cache)
+    calls = []
+
+    async def fake_live(topic, depth, time_budget=None):
+        calls.append(topic)
+        return _research(topic)
+
+    service._research_live = fake_live
+
+    async def run():
+        await service.research_topic("Go", 3)
+        return await service.research_topic("go", 3)
+
+    data = asyncio.run(run())
+    assert data['topic'] == "Go"
+    assert calls == ["Go"]
@@ -0,0 +1,161 @@
+"""
+Tests for the research service page fetching pipeline
+"""
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services.http_client_registry import http_registry
+from app.services.research_service import ResearchService
+
+
+def _make_results(urls):
+    return [{'title': f"Result {i}", 'url': url, 'snippet': '', 'source': 'web'} for i, url in enumerate(urls)]
+
+
+def test_fetch_sources_keeps_rank_order_and_bounds_concurrency(monkeypatch):
+    monkeypatch.setenv("RESEARCH_CACHE_ENABLED", "false")
+    service = ResearchService()
+    service.max_concurrency = 3
+    service.per_host_limit = 1
+
+    active = {'total': 0, 'peak': 0, 'per_host': {}, 'host_peak': 0}
+    delays = {'a': 0.05, 'b': 0.01, 'c': 0.03, 'd': 0.02, 'e': 0.01}
+
+    async def fake_extract(url, *args, **kwargs):
+        host = url.split('/')[2]
+        active['total'] += 1
+        active['per_host'][host] = active['per_host'].get(host, 0) + 1
+        active['peak'] = max(active['peak'], active['total'])
+        active['host_peak'] = max(active['host_peak'], active['per_host'][host])
+        await asyncio.sleep(delays[url.rsplit('/', 1)[1]])
+        active['total'] -= 1
+        active['per_host'][host] -= 1
+        return f"content of {url}"
+
+    service._extract_page_content = fake_extract
+    urls = [
+        "https://one.example/a",
+        "https://two.example/b",
+        "https://one.example/c",
+        "https://three.example/d",
+        "https://four.example/e",
+    ]
+
+    sources, stats = asyncio.run(service._fetch_sources(_make_results(urls)))
+
+    assert [source['url'] for source in sources] == urls
+    assert active['peak'] <= 3
+    assert active['host_peak'] == 1
+    assert stats['pages_attempted'] == 5
+    assert stats['pages_fetched'] == 5
+    assert stats['sequential_estimate_seconds'] >= stats['wall_clock_seconds']
+    assert stats['time_saved_seconds'] > 0
+
+
+def test_fetch_sources_skips_failed_pages(monkeypatch):
+    monkeypatch.setenv("RESEARCH_CACHE_ENABLED", "false")
+    service = ResearchService()
+
+    async def fake_extract(url, *args, **kwargs):
+        if url.endswith('bad'):
+            raise RuntimeError("boom")
+        if url.endswith('empty'):
+            return None
+        return "text"
+
+    service._extract_page_content = fake_extract
+    urls = ["https://x.example/ok", "https://x.example/bad", "https://x.example/empty", "https://y.example/ok"]
+
+    sources, stats = asyncio.run(service._fetch_sources(_make_results(urls)))
+
+    assert [source['url'] for source in sources] == ["https://x.example/ok", "https://y.example/ok"]
+    assert stats['pages_fetched'] == 2
+
+
+class _ContentHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/doc.pdf":
+            body = b"%PDF-1.4" + b"0" * 50_000
+            content_type = "application/pdf"
+        else:
+            body = b"<html><body>" + b"<p>Graph theory studies networks of nodes.</p>" * 5000 + b"</body></html>"
+            content_type = "text/html; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_page_downloads_are_capped_and_gated_by_content_type(monkeypatch):
+    monkeypatch.setenv("RESEARCH_CACHE_ENABLED", "false")
+    monkeypatch.setenv("PAGE_CACHE_ENABLED", "false")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ContentHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    service = ResearchService()
+    service.max_page_bytes = 16 * 1024
+    service.max_text_chars = 500
+    stats = {'bytes_downloaded': 0, 'bytes_skipped': 0}
+
+    async def run():
+        html = await service._extract_page_content(f"{base}/big.html", stats=stats)
+        pdf = await service._extract_page_content(f"{base}/doc.pdf", stats=stats)
+        await http_registry.aclose()
+        return html, pdf
+
+    try:
+        html, pdf = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    assert pdf is None
+    assert html.startswith("Graph theory studies networks of nodes.")
+    assert len(html) <= 600
+    assert stats['bytes_downloaded'] < 100_000
+    # The rest of the HTML page and the whole PDF were never read
+    assert stats['bytes_skipped'] > 50_000 + 100_000
+
+
+def test_research_returns_partial_results_when_budget_runs_out(monkeypatch):
+    monkeypatch.setenv("RESEARCH_CACHE_ENABLED", "false")
+    monkeypatch.setenv("PAGE_CACHE_ENABLED", "false")
+    service = ResearchService()
+    cancelled = []
+
+    async def fake_search(query, max_results=10):
+        return _make_results([f"https://site{i}.example/page" for i in range(max_results)])
+
+    async def fake_extract(url, *args, **kwargs):
+        delay = 1.0 if url.startswith("https://site1.") else 0.01
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+        return f"content of {url}"
+
+    service._search_web = fake_search
+    service._extract_page_content = fake_extract
+
+    data = asyncio.run(service.research_topic("Networking", depth=2, time_budget=0.2))
+
+    completeness = data['research_completeness']
+    assert completeness['sources_requested'] == 6
+    assert completeness['sources_fetched'] == 5
+    assert completeness['sources_cancelled'] == 1
+    assert completeness['complete'] is False
+    assert cancelled == ["https://site1.example/page"]
+    assert [source['url'] for source in data['sources']] == [
+        f"https://site{i}.example/page" for i in [0, 2, 3, 4, 5]
+    ]
@@ -0,0 +1,111 @@
+"""
+Tests for latency-aware routing across LLM providers
+"""
+import json
+import asyncio
+
+from app.services import router_service as router_module
+from app.services.router_service import ProviderStats, RouterService
+
+PLAN = {"topic": "SQL", "summary": "Learn SQL", "duration_weeks": 1, "learning_objectives": [],
+        "key_concepts": [], "milestones": [{"title": "Week 1", "description": "Queries", "week": 1,
+                                            "tasks": ["SELECT"], "estimated_hours": 5}]}
+
+
+class _FakeProvider:
+    model = "fake"
+
+    def __init__(self, name, delay=0.0, response=None):
+        self.name = name
+        self.delay = delay
+        self.response = response if response is not None else json.dumps(PLAN)
+        self.calls = 0
+
+    async def generate_content(self, prompt, schema=None, max_tokens=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.response
+
+    def build_study_plan_prompt(self, *args, **kwargs):
+        return "prompt"
+
+    def _generate_fallback_plan(self, topic, duration_weeks, is_disabled=False):
+        return {"topic": topic, "summary": "[FALLBACK TEMPLATE] plan", "milestones": []}
+
+
+def _router(monkeypatch, *providers, hedge=False):
+    monkeypatch.setattr(router_module, "_provider_stats", {})
+    monkeypatch.setenv("ROUTER_HEDGE", "true" if hedge else "false")
+    return RouterService({provider.name: provider for provider in providers})
+
+
+def test_stats_track_ewma_latency_errors_and_p90():
+    stats = ProviderStats(alpha=0.5)
+    for latency in [1.0, 1.0, 1.0, 1.0, 3.0]:
+        stats.record(latency, True)
+    stats.record(9.0, False)
+
+    assert stats.latency == 2.0
+    assert stats.error_rate == 0.5
+    assert stats.p90() == 3.0
+    assert stats.snapshot()["errors"] == 1
+
+
+def test_error_rate_decays_so_a_recovered_provider_is_retried(monkeypatch):
+    now = [0.0]
+    router = _router(monkeypatch, _FakeProvider("slow"), _FakeProvider("flaky"))
+    router_module._provider_stats["flaky"] = ProviderStats(alpha=0.5, error_half_life=60.0, clock=lambda: now[0])
+    router_module.get_provider_stats("slow").record(2.0, True)
+    for _ in range(3):
+        router_module.get_provider_stats("flaky").record(0.1, False)
+    assert router.rank() == ["slow", "flaky"]
+
+    # No calls reach it while it ranks last, but after two half-lives its rate is back under the limit
+    now[0] = 120.0
+    assert router_module.get_provider_stats("flaky").current_error_rate() == 0.875 / 4
+    assert router.rank() == ["flaky", "slow"]
+
+
+def test_routes_to_the_fastest_healthy_provider(monkeypatch):
+    slow, fast = _FakeProvider("slow", delay=0.05), _FakeProvider("fast", delay=0.0)
+    router = _router(monkeypatch, slow, fast)
+    router_module.get_provider_stats("slow").record(2.0, True)
+    router_module.get_provider_stats("fast").record(0.5, True)
+
+    assert asyncio.run(router.generate_content("hi")) == json.dumps(PLAN)
+    assert (slow.calls, fast.calls) == (0, 1)
+
+    # A fast provider that keeps failing drops behind the slow one
+    for _ in range(5):
+        router_module.get_provider_stats("fast").record(0.1, False)
+    assert router.rank() == ["slow", "fast"]
+
+
+def test_fails_over_to_the_next_provider(monkeypatch):
+    broken, backup = _FakeProvider("broken", response="Error: timed out"), _FakeProvider("backup")
+    router = _router(monkeypatch, broken, backup)
+
+    plan = asyncio.run(router.create_study_plan("SQL", {}, duration_weeks=1))
+
+    assert plan["summary"] == "Learn SQL"
+    assert (broken.calls, backup.calls) == (1, 1)
+    assert router_module.get_provider_stats("broken").errors == 1
+
+
+def test_every_provider_failing_returns_the_fallback_plan(monkeypatch):
+    router = _router(monkeypatch, _FakeProvider("a", response="not json"), _FakeProvider("b", response="Error: down"))
+
+    plan = asyncio.run(router.create_study_plan("SQL", {}, duration_weeks=1))
+
+    assert plan["summary"].startswith("[FALLBACK TEMPLATE]")
+
+
+def test_hedges_after_the_primary_passes_its_p90(monkeypatch):
+    primary, secondary = _FakeProvider("primary", delay=1.0, response="primary"), _FakeProvider("secondary", response="secondary")
+    router = _router(monkeypatch, primary, secondary, hedge=True)
+    for _ in range(5):
+        router_module.get_provider_stats("primary").record(0.05, True)
+        router_module.get_provider_stats("secondary").record(0.5, True)
+
+    assert asyncio.run(router.generate_content("hi")) == "secondary"
+    assert (primary.calls, secondary.calls) == (1, 1)
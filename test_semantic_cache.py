@@ -0,0 +1,145 @@
+"""
+Tests for the semantic study plan cache
+"""
+import asyncio
+
+import numpy as np
+
+from app.services import semantic_cache as semantic_cache_module
+from app.services.semantic_cache import HashingEmbedder, SemanticPlanCache, describe_request
+from app.services.study_plan_service import StudyPlanService
+from app.utils import circuit_breaker as circuit_breaker_module
+from app.utils.circuit_breaker import get_breaker
+
+PLAN = {"topic": "Machine learning", "summary": "[Generated using: FakeProvider] Learn ML", "duration_weeks": 4,
+        "learning_objectives": ["Train a model"], "key_concepts": ["Regression"], "milestones": []}
+
+
+def test_hashing_embedder_matches_paraphrased_topics():
+    embedder = HashingEmbedder()
+    ml = embedder.embed("Machine Learning for beginners")
+
+    assert float(ml @ embedder.embed("machine learning basics")) > 0.95
+    assert float(ml @ embedder.embed("Intro to ML")) > float(ml @ embedder.embed("Deep learning"))
+    assert float(ml @ embedder.embed("Medieval history")) < 0.3
+    assert abs(float(np.linalg.norm(ml)) - 1.0) < 1e-5
+
+
+def test_lookup_requires_threshold_duration_depth_and_params(tmp_path):
+    cache = SemanticPlanCache(data_dir=str(tmp_path), embedder="hashing", threshold=0.9)
+    embedder = cache.hashing_embedder
+    key = cache.params_key(provider="fake")
+    cache.store(embedder.name, embedder.embed("machine learning basics"), "machine learning basics", 4, 3, key, PLAN)
+    cache.store(embedder.name, embedder.embed("medieval history"), "medieval history", 4, 3, key, {"topic": "History"})
+
+    plan, similarity = cache.lookup(embedder.name, embedder.embed("Machine Learning for beginners"), 4, 3, key)
+    assert plan["topic"] == "Machine learning"
+    assert similarity >= 0.9
+
+    assert cache.lookup(embedder.name, embedder.embed("Machine Learning"), 8, 3, key) is None
+    assert cache.lookup(embedder.name, embedder.embed("Machine Learning"), 4, 5, key) is None
+    assert cache.lookup(embedder.name, embedder.embed("Machine Learning"), 4, 3, cache.params_key(provider="other")) is None
+    assert cache.lookup(embedder.name, embedder.embed("Organic chemistry"), 4, 3, key) is None
+
+    # Vectors survive a restart through the memory-mapped matrix
+    reopened = SemanticPlanCache(data_dir=str(tmp_path), embedder="hashing", threshold=0.9)
+    assert reopened.lookup(embedder.name, embedder.embed("machine learning basics"), 4, 3, key) is not None
+    assert reopened.stats()["embedders"][embedder.name]["vectors"] == 2
+
+    assert reopened.purge() == 2
+    assert reopened.lookup(embedder.name, embedder.embed("machine learning basics"), 4, 3, key) is None
+
+
+def test_top_k_orders_rows_by_similarity(tmp_path):
+    cache = SemanticPlanCache(data_dir=str(tmp_path), embedder="hashing", top_k=2)
+    matrix = np.eye(4, dtype=np.float32)
+    vector = np.array([0.1, 0.8, 0.0, 0.6], dtype=np.float32)
+
+    rows, similarities = cache.top_k_similar(matrix, vector, np.arange(4))
+
+    assert rows.tolist() == [1, 3]
+    assert similarities.tolist() == [np.float32(0.8), np.float32(0.6)]
+
+
+def test_study_plan_service_reuses_plans_and_skips_fallbacks(tmp_path, monkeypatch):
+    monkeypatch.setenv("SEMANTIC_CACHE_ENABLED", "true")
+    monkeypatch.setattr(semantic_cache_module, "_semantic_cache",
+                        SemanticPlanCache(data_dir=str(tmp_path), embedder="hashing"))
+    service = StudyPlanService()
+
+    class FakeProvider:
+        model = "fake"
+
+    def find(topic):
+        return service.find_similar_plan(FakeProvider(), topic, 3, 4, True, None, None, None, False, None)
+
+    async def run():
+        miss, handle = await find("machine learning basics")
+        await service.remember_plan(handle, {"topic": "x", "summary": "[FALLBACK TEMPLATE] Plan", "milestones": []})
+        still_miss, _ = await find("machine learning basics")
+        # A plan that fails validation (milestone without tasks) is not cached either
+        await service.remember_plan(handle, dict(PLAN, milestones=[{"title": "Week 1", "week": 1}]))
+        still_miss_invalid, _ = await find("machine learning basics")
+        await service.remember_plan(handle, dict(PLAN, research_completeness={"complete": True}))
+        hit, _ = await find("Machine Learning for beginners")
+        return miss, still_miss, still_miss_invalid, hit
+
+    miss, still_miss, still_miss_invalid, hit = asyncio.run(run())
+    assert miss is None and still_miss is None and still_miss_invalid is None
+    assert hit["topic"] == "Machine Learning for beginners"
+    assert "research_completeness" not in hit
+
+
+def test_request_description_includes_free_text_preferences():
+    text = describe_request("Rust", goals=["Write a CLI"], additional_context="Weekends only")
+
+    assert text == "Rust. goals Write a CLI. Weekends only"
+
+
+def test_fallback_lookups_find_plans_stored_with_ollama_embeddings(tmp_path, monkeypatch):
+    monkeypatch.setattr(circuit_breaker_module, "_breakers", {})
+    cache = SemanticPlanCache(data_dir=str(tmp_path), embedder="ollama", threshold=0.9)
+    key = cache.params_key(provider="fake")
+    ollama_vector = np.eye(4, dtype=np.float32)[0]
+    cache.store(cache.ollama_embedder.name, ollama_vector, "machine learning basics", 4, 3, key, PLAN)
+
+    # Ollama is down: the open breaker skips the embeddings call and the hashing copy answers
+    get_breaker("ollama").trip()
+    embedder, vector = asyncio.run(cache.embed("Machine Learning for beginners"))
+    assert embedder == cache.hashing_embedder.name
+    assert cache.lookup(embedder, vector, 4, 3, key)[0]["topic"] == "Machine learning"
+
+    # A plan stored during the outage is found once Ollama embeddings are back
+    cache.store(embedder, cache.hashing_embedder.embed("medieval history"), "medieval history", 4, 3, key,
+                {"topic": "History"})
+    other = np.eye(4, dtype=np.float32)[1]
+    assert cache.lookup(cache.ollama_embedder.name, other, 4, 3, key) is None
+    assert cache.lookup(cache.ollama_embedder.name, other, 4, 3, key, "Medieval history")[0]["topic"] == "History"
+
+
+def test_embedder_defaults_to_hashing_unless_ollama_generates(tmp_path, monkeypatch):
+    monkeypatch.delenv("SEMANTIC_CACHE_EMBEDDER", raising=False)
+    monkeypatch.setenv("AI_PROVIDER", "openrouter")
+    assert SemanticPlanCache(data_dir=str(tmp_path)).ollama_embedder is None
+    monkeypatch.setenv("AI_PROVIDER", "ollama")
+    assert SemanticPlanCache(data_dir=str(tmp_path)).ollama_embedder is not None
+
+
+def test_expired_rows_are_reused_instead_of_growing_the_matrix(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache_module.time, "time", lambda: now[0])
+    cache = SemanticPlanCache(data_dir=str(tmp_path), embedder="hashing", ttl=60)
+    embedder = cache.hashing_embedder
+    key = cache.params_key(provider="fake")
+    for topic in ("rust", "go", "zig"):
+        cache.store(embedder.name, embedder.embed(topic), topic, 4, 3, key, {"topic": topic})
+
+    # Once the first plans expire, new plans fill their rows before the matrix grows
+    now[0] += 120
+    for topic in ("ocaml", "elixir"):
+        cache.store(embedder.name, embedder.embed(topic), topic, 4, 3, key, {"topic": topic})
+
+    assert cache.stats()["embedders"][embedder.name] == {"dim": embedder.dim, "vectors": 3, "plans": 2}
+    assert (tmp_path / "semantic_vectors_hashing_512.f32").stat().st_size == 3 * embedder.dim * 4
+    assert cache.lookup(embedder.name, embedder.embed("elixir"), 4, 3, key)[0]["topic"] == "elixir"
+    assert cache.lookup(embedder.name, embedder.embed("rust"), 4, 3, key) is None
@@ -0,0 +1,128 @@
+"""
+Tests for single-flight coalescing of research and plan requests
+"""
+import asyncio
+
+import pytest
+
+from app.services.study_plan_service import StudyPlanService
+from app.utils.metrics import metrics
+from app.utils.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight("test_share")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"items": [1, 2]}
+
+    async def run():
+        return await asyncio.gather(*(flights.do("key", work) for _ in range(5)))
+
+    before = metrics.get_counter("single_flight.test_share.coalesced")
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(result == {"items": [1, 2]} for result in results)
+    # Every caller gets its own copy
+    results[0]["items"].append(3)
+    assert results[1]["items"] == [1, 2]
+    assert metrics.get_counter("single_flight.test_share.coalesced") - before == 4
+    assert flights.in_flight() == 0
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    flights = SingleFlight("test_cancel_one")
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.05)
+        finished.append(True)
+        return "done"
+
+    async def run():
+        first = asyncio.create_task(flights.do("key", work))
+        second = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
+    assert finished == [True]
+
+
+def test_shared_task_cancelled_when_every_caller_leaves():
+    flights = SingleFlight("test_cancel_all")
+    state = {"cancelled": False}
+
+    async def work():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def run():
+        callers = [asyncio.create_task(flights.do("key", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert state["cancelled"] is True
+    assert flights.in_flight() == 0
+
+
+def test_errors_reach_every_caller():
+    flights = SingleFlight("test_errors")
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def run():
+        return await asyncio.gather(*(flights.do("key", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+class _SlowProvider:
+    model = "stub"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def create_study_plan(self, topic, research_data, duration_weeks=4, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        return {"topic": topic, "summary": "Plan", "duration_weeks": duration_weeks,
+                "learning_objectives": ["a"], "key_concepts": ["b"], "milestones": []}
+
+
+def test_identical_plan_requests_are_coalesced(monkeypatch):
+    monkeypatch.setenv("USE_AI_GENERATION", "true")
+    monkeypatch.setenv("RESEARCH_CACHE_ENABLED", "false")
+    monkeypatch.setenv("PAGE_CACHE_ENABLED", "false")
+    provider = _SlowProvider()
+    service = StudyPlanService()
+    research = {'sources': [], 'key_concepts': [], 'related_topics': []}
+
+    async def run():
+        return await asyncio.gather(
+            service.generate_plan(provider, "Machine Learning", research),
+            service.generate_plan(provider, "machine  learning", research),
+            service.generate_plan(provider, "Machine Learning", research, duration_weeks=8),
+        )
+
+    plans = asyncio.run(run())
+    assert provider.calls == 2
+    assert plans[0] == plans[1]
+    assert plans[2]["duration_weeks"] == 8
@@ -0,0 +1,176 @@
+"""
+Tests for streaming study plan generation over Server-Sent Events
+"""
+import json
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+from main import app
+from app.api.router import get_research_service
+from app.services.ai_service_factory import get_ai_service
+from app.services.http_client_registry import http_registry
+from app.services.ollama_service import OllamaService
+from app.services.openrouter_service import OpenRouterService
+from app.utils.metrics import metrics
+
+PLAN = {
+    "topic": "Rust",
+    "summary": "Learn {ownership} and \"borrowing\"",
+    "duration_weeks": 2,
+    "learning_objectives": ["Write safe code"],
+    "key_concepts": ["Ownership"],
+    "milestones": [
+        {"title": "Week 1: Basics", "description": "Syntax, {braces} and [brackets]", "week": 1,
+         "tasks": ["Install rustup"], "estimated_hours": 5},
+        {"title": "Week 2: Ownership", "description": "Moves and borrows", "week": 2,
+         "tasks": ["Read chapter 4", "Fix borrow errors"], "estimated_hours": 6},
+    ],
+    "resources": [{"title": "The Book", "url": "https://doc.rust-lang.org/book/", "type": "book"}],
+    "recommendations": "Practice daily"
+}
+RESPONSE = "Sure! Here is your plan:\n```json\n" + json.dumps(PLAN, indent=2) + "\n```"
+
+
+class _FakeResearch:
+    async def research_topic(self, topic, depth=3, time_budget=None, mode=None):
+        return {'topic': topic, 'sources': [], 'key_concepts': [], 'related_topics': [],
+                'research_completeness': {'mode': 'web', 'complete': True}}
+
+
+class _StreamingProvider:
+    model = "fake"
+
+    def build_study_plan_prompt(self, *args, **kwargs):
+        return "prompt"
+
+    async def stream_content(self, prompt, schema=None, max_tokens=None):
+        for i in range(0, len(RESPONSE), 16):
+            yield RESPONSE[i:i + 16]
+
+
+def _events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_endpoint_sends_progress_milestones_and_plan(monkeypatch):
+    monkeypatch.setenv("USE_AI_GENERATION", "true")
+    monkeypatch.setenv("SEMANTIC_CACHE_ENABLED", "false")
+    app.dependency_overrides[get_research_service] = _FakeResearch
+    app.dependency_overrides[get_ai_service] = _StreamingProvider
+    try:
+        response = TestClient(app).post("/api/generate-study-plan/stream", json={"topic": "Rust", "duration_weeks": 2})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response.text)
+    assert [data["stage"] for event, data in events if event == "progress"] == [
+        "research_started", "research_done", "generation_started"
+    ]
+    assert [data["week"] for event, data in events if event == "milestone"] == [1, 2]
+    assert [data["title"] for event, data in events if event == "resource"] == ["The Book"]
+    assert {"topic", "summary", "duration_weeks", "recommendations"} <= {
+        data["name"] for event, data in events if event == "field"
+    }
+    assert events[-1][0] == "plan"
+    assert events[-1][1]["summary"].endswith(PLAN["summary"])
+    assert len(events[-1][1]["milestones"]) == 2
+    assert metrics.snapshot()["observations"]["study_plan.stream.time_to_first_milestone_seconds"]["count"] >= 1
+
+
+def _mock_client(monkeypatch, body, content_type):
+    monkeypatch.setenv("GENERATION_CACHE_ENABLED", "false")
+
+    def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, content=body, headers={"content-type": content_type})
+
+    monkeypatch.setattr(http_registry, "get_client", lambda upstream: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+
+def _collect(provider):
+    async def run():
+        return [chunk async for chunk in provider.stream_content("prompt")]
+
+    return asyncio.run(run())
+
+
+def test_ollama_stream_reads_ndjson(monkeypatch):
+    lines = [{"response": "{\"a\": "}, {"response": "1}"}, {"response": "", "done": True}]
+    _mock_client(monkeypatch, "\n".join(json.dumps(line) for line in lines).encode(), "application/x-ndjson")
+
+    assert _collect(OllamaService()) == ["{\"a\": ", "1}"]
+
+
+def test_openrouter_stream_reads_sse(monkeypatch):
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    body = (
+        ": OPENROUTER PROCESSING\n\n"
+        "data: " + json.dumps({"choices": [{"delta": {"content": "{\"a\""}}]}) + "\n\n"
+        "data: " + json.dumps({"choices": [{"delta": {"content": ": 1}"}}]}) + "\n\n"
+        "data: [DONE]\n\n"
+    )
+    _mock_client(monkeypatch, body.encode(), "text/event-stream")
+
+    assert _collect(OpenRouterService()) == ["{\"a\"", ": 1}"]
+
+
+def test_streamed_plan_with_an_invalid_milestone_is_repaired(monkeypatch):
+    monkeypatch.setenv("USE_AI_GENERATION", "true")
+    monkeypatch.setenv("SEMANTIC_CACHE_ENABLED", "false")
+    broken = dict(PLAN, milestones=[PLAN["milestones"][0], {"title": "Week 2: Ownership", "week": 2}])
+    week_2 = {"milestones": [PLAN["milestones"][1]]}
+
+    class _Provider(_StreamingProvider):
+        async def stream_content(self, prompt, schema=None, max_tokens=None):
+            yield json.dumps(broken)
+
+        async def generate_content(self, prompt, max_tokens=None):
+            assert "one milestone for each of weeks 2" in prompt
+            return json.dumps(week_2)
+
+    app.dependency_overrides[get_research_service] = _FakeResearch
+    app.dependency_overrides[get_ai_service] = _Provider
+    try:
+        response = TestClient(app).post("/api/generate-study-plan/stream", json={"topic": "Rust", "duration_weeks": 2})
+    finally:
+        app.dependency_overrides.clear()
+
+    event, plan = _events(response.text)[-1]
+    assert event == "plan"
+    assert [milestone["tasks"] for milestone in plan["milestones"]] == [["Install rustup"],
+                                                                       ["Read chapter 4", "Fix borrow errors"]]
+
+
+def test_streamed_plan_with_a_malformed_milestone_regenerates_the_gap(monkeypatch):
+    monkeypatch.setenv("USE_AI_GENERATION", "true")
+    monkeypatch.setenv("SEMANTIC_CACHE_ENABLED", "false")
+    text = json.dumps(PLAN).replace('"week": 2,', '"week": 2')
+    requested = []
+
+    class _Provider(_StreamingProvider):
+        async def stream_content(self, prompt, schema=None, max_tokens=None):
+            yield text
+
+        async def generate_content(self, prompt, max_tokens=None):
+            requested.append(prompt)
+            return json.dumps({"milestones": [PLAN["milestones"][1]]})
+
+    app.dependency_overrides[get_research_service] = _FakeResearch
+    app.dependency_overrides[get_ai_service] = _Provider
+    try:
+        response = TestClient(app).post("/api/generate-study-plan/stream", json={"topic": "Rust", "duration_weeks": 2})
+    finally:
+        app.dependency_overrides.clear()
+
+    event, plan = _events(response.text)[-1]
+    assert event == "plan"
+    assert "one milestone for each of weeks 2" in requested[0]
+    assert [milestone["week"] for milestone in plan["milestones"]] == [1, 2]
@@ -0,0 +1,98 @@
+"""
+Tests for native structured-output modes of the LLM providers
+"""
+import json
+import asyncio
+
+import httpx
+
+from app.services.http_client_registry import http_registry
+from app.services.ollama_service import OllamaService
+from app.services.openrouter_service import OpenRouterService
+from app.services.gemini_service import GeminiService
+from app.utils import circuit_breaker as circuit_breaker_module
+from app.utils.metrics import metrics
+from app.utils.structured_output import gemini_schema, study_plan_schema
+
+PLAN = {"topic": "Go", "summary": "Learn Go", "duration_weeks": 1, "learning_objectives": ["Write Go"],
+        "key_concepts": ["Goroutines"], "milestones": [{"title": "Week 1", "description": "Basics", "week": 1,
+                                                        "tasks": ["Tour of Go"], "estimated_hours": 5}]}
+
+
+def _capture(monkeypatch, response_body):
+    monkeypatch.setenv("GENERATION_CACHE_ENABLED", "false")
+    monkeypatch.setattr(circuit_breaker_module, "_breakers", {})
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=response_body)
+
+    monkeypatch.setattr(http_registry, "get_client", lambda upstream: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return requests
+
+
+def test_schema_is_derived_from_the_response_model():
+    schema = study_plan_schema()
+
+    assert "$defs" not in json.dumps(schema) and "$ref" not in json.dumps(schema)
+    assert "research_completeness" not in schema["properties"]
+    assert "title" in schema["properties"]["milestones"]["items"]["properties"]
+    assert {"topic", "summary", "milestones"} <= set(schema["required"])
+    assert schema["properties"]["milestones"]["items"]["properties"]["week"] == {"type": "integer"}
+    assert schema["properties"]["resources"]["type"] == "array"
+    assert "goals" in study_plan_schema(include_goals=True)["required"]
+
+    converted = gemini_schema(schema)
+    assert converted["type"] == "OBJECT"
+    assert converted["properties"]["milestones"]["items"]["properties"]["tasks"]["items"] == {"type": "STRING"}
+
+
+def test_ollama_sends_format_for_each_mode(monkeypatch):
+    requests = _capture(monkeypatch, {"response": json.dumps(PLAN)})
+    formats = {}
+    for mode in ["off", "json", "schema"]:
+        monkeypatch.setenv("STRUCTURED_OUTPUT", mode)
+        plan = asyncio.run(OllamaService().create_study_plan("Go", {}, duration_weeks=1))
+        assert plan["topic"] == "Go"
+        formats[mode] = json.loads(requests[-1].content).get("format")
+
+    assert formats["off"] is None
+    assert formats["json"] == "json"
+    assert formats["schema"]["properties"]["milestones"]["type"] == "array"
+    assert metrics.get_counter("structured_output.schema.parsed") >= 1
+
+
+def test_learning_goals_stay_free_text(monkeypatch):
+    monkeypatch.setenv("STRUCTURED_OUTPUT", "schema")
+    requests = _capture(monkeypatch, {"response": "[\"Write a CLI\"]"})
+
+    assert asyncio.run(OllamaService().generate_learning_goals("Go", 1, None)) == ["Write a CLI"]
+    assert "format" not in json.loads(requests[-1].content)
+
+
+def test_openrouter_sends_json_schema_response_format(monkeypatch):
+    monkeypatch.setenv("STRUCTURED_OUTPUT", "schema")
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    requests = _capture(monkeypatch, {"choices": [{"message": {"content": json.dumps(PLAN)}}]})
+
+    plan = asyncio.run(OpenRouterService().create_study_plan("Go", {}, duration_weeks=1))
+
+    response_format = json.loads(requests[-1].content)["response_format"]
+    assert plan["milestones"][0]["week"] == 1
+    assert response_format["type"] == "json_schema"
+    assert response_format["json_schema"]["schema"]["required"] == study_plan_schema()["required"]
+
+
+def test_gemini_uses_rest_response_schema(monkeypatch):
+    monkeypatch.setenv("STRUCTURED_OUTPUT", "schema")
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    requests = _capture(monkeypatch, {"candidates": [{"content": {"parts": [{"text": json.dumps(PLAN)}]}}]})
+
+    plan = asyncio.run(GeminiService().create_study_plan("Go", {}, duration_weeks=1))
+
+    body = json.loads(requests[-1].content)
+    assert plan["summary"] == "Learn Go"
+    assert requests[-1].url.path.endswith(":generateContent")
+    assert body["generationConfig"]["responseMimeType"] == "application/json"
+    assert body["generationConfig"]["responseSchema"]["type"] == "OBJECT"
@@ -0,0 +1,61 @@
+"""
+Tests for key-concept and related-topic extraction
+"""
+import asyncio
+
+from app.services.research_service import ResearchService
+from app.utils.text_extraction import extract_key_concepts, find_related_topics, split_sentences
+
+SOURCES = [
+    "Supervised learning is a paradigm where models learn from labeled training data. "
+    "The weather is nice today and everyone is outside. "
+    "Training data consists of labeled examples used to fit the model.",
+    "Overfitting means that a model memorizes its training data instead of generalizing. "
+    "Labeled training data is expensive to collect for many tasks.",
+]
+
+RESULTS = [
+    {"title": "Neural Networks and Deep Learning for Beginners", "snippet": "Gradient descent explained."},
+    {"title": "Gradient Descent Explained: Neural Networks", "snippet": "Backpropagation in neural networks."},
+    {"title": "Python Machine Learning - Neural Networks", "snippet": "Neural networks with scikit-learn."},
+    {"title": "What is Python? 2024 Edition", "snippet": ""},
+]
+
+
+def test_split_sentences_keeps_terminal_punctuation():
+    assert split_sentences("First one. Second one!\nThird") == ["First one.", "Second one!", "Third"]
+
+
+def test_key_concepts_ranked_by_relevance():
+    concepts = extract_key_concepts(SOURCES)
+
+    # The off-topic sentence shares no recurring terms and ranks last
+    assert concepts[-1].startswith("The weather is nice")
+    assert "training data" in concepts[0].lower()
+    assert len(concepts) == len(set(concepts))
+    assert extract_key_concepts(list(reversed(SOURCES))) == concepts
+
+
+def test_key_concepts_respect_length_and_limit():
+    assert extract_key_concepts(["Short is short."]) == []
+    assert len(extract_key_concepts(SOURCES, limit=2)) == 2
+
+
+def test_related_topics_are_ranked_and_deterministic():
+    topics = find_related_topics("Python", RESULTS)
+
+    assert topics[0] == "Neural Networks"
+    assert "Gradient Descent Explained" in topics
+    for topic in topics:
+        assert "python" not in topic.lower()
+        assert not topic.lower().startswith("what")
+    assert find_related_topics("Python", list(reversed(RESULTS))) == topics
+
+
+def test_research_service_delegates_to_engine():
+    service = ResearchService()
+    concepts = asyncio.run(service._extract_key_concepts([{"summary": text} for text in SOURCES]))
+    topics = asyncio.run(service._find_related_topics("Python", RESULTS))
+
+    assert concepts == extract_key_concepts(SOURCES)
+    assert topics == find_related_topics("Python", RESULTS, limit=5)
@@ -0,0 +1,83 @@
+"""
+Tests for output-token budgeting and context-window trimming
+"""
+import json
+import asyncio
+
+import httpx
+
+from app.services.http_client_registry import http_registry
+from app.services.ollama_service import OllamaService
+from app.utils import circuit_breaker as circuit_breaker_module
+from app.utils.metrics import metrics
+from app.utils.token_budget import budget_study_plan_prompt, count_tokens, estimate_plan_tokens, fit_research_data
+
+PLAN = {"topic": "Go", "summary": "Learn Go", "duration_weeks": 1, "learning_objectives": ["Write Go"],
+        "key_concepts": ["Goroutines"], "milestones": [{"title": "Week 1", "description": "Basics", "week": 1,
+                                                        "tasks": ["Tour of Go"], "estimated_hours": 5}]}
+
+
+def _research(sources):
+    return {"sources": [{"title": f"Source {i}", "summary": "word " * 300} for i in range(sources)],
+            "key_concepts": ["Concurrency"], "related_topics": ["Rust"]}
+
+
+def test_token_count_approximates_bpe_tokenizers():
+    assert count_tokens("The quick brown fox") == 4
+    assert count_tokens('{"week": 12}') == 7
+    assert 1 < count_tokens("internationalization") <= 5
+
+
+def test_budget_grows_with_weeks_depth_and_resources():
+    small = estimate_plan_tokens(1, depth_level=1, include_resources=False)
+    large = estimate_plan_tokens(12, depth_level=5)
+
+    assert small == 512
+    assert estimate_plan_tokens(4, 3) < estimate_plan_tokens(8, 3) < large
+    assert estimate_plan_tokens(4, 3, include_resources=False) < estimate_plan_tokens(4, 3)
+    assert large % 64 == 0 and large <= 8192
+
+
+def test_research_is_trimmed_to_the_context_window():
+    def build(data):
+        return "Plan about Go. " + " ".join(source["summary"] for source in data["sources"])
+
+    full, full_tokens = fit_research_data(build, _research(5), 10000)
+    trimmed, tokens = fit_research_data(build, _research(5), 700)
+
+    assert full_tokens > 1000 and tokens <= 700
+    assert trimmed.startswith("Plan about Go.")
+
+
+def test_plan_prompt_leaves_room_for_the_output(monkeypatch):
+    monkeypatch.setenv("OLLAMA_CONTEXT_WINDOW", "3000")
+    service = OllamaService()
+
+    prompt, max_tokens = budget_study_plan_prompt(service, "Go", _research(5), 8, 3, None, None)
+
+    assert max_tokens == estimate_plan_tokens(8, 3)
+    assert count_tokens(prompt) + max_tokens <= 3000
+    assert '"resources"' in prompt
+    assert '"resources"' not in budget_study_plan_prompt(service, "Go", {}, 8, 3, None, None, include_resources=False)[0]
+
+
+def test_plan_call_sends_the_budget_and_records_usage(monkeypatch):
+    monkeypatch.setenv("GENERATION_CACHE_ENABLED", "false")
+    monkeypatch.setattr(circuit_breaker_module, "_breakers", {})
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json={"response": json.dumps(PLAN), "prompt_eval_count": 400,
+                                         "eval_count": 120, "done_reason": "stop"})
+
+    monkeypatch.setattr(http_registry, "get_client", lambda upstream: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    before = metrics.snapshot()["observations"].get("token_budget.ollama.output_utilization", {}).get("count", 0)
+
+    plan = asyncio.run(OllamaService().create_study_plan("Go", {}, duration_weeks=1, depth_level=1, include_resources=False))
+
+    assert plan["summary"] == "Learn Go"
+    options = requests[0]["options"]
+    assert options["num_predict"] == estimate_plan_tokens(1, 1, include_resources=False)
+    assert options["num_ctx"] == OllamaService().context_window
+    assert metrics.snapshot()["observations"]["token_budget.ollama.output_utilization"]["count"] == before + 1